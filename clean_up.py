@@ -1,6 +1,11 @@
+import argparse
 import os
 import sys
 from django.apps import apps
+from django.db import connection, transaction
+
+# Rows removed per DELETE statement by purge() on databases without TRUNCATE
+PURGE_BATCH_SIZE = 10000
 
 def setup_django(project_name):
     """Setup Django environment"""
@@ -9,7 +14,166 @@ def setup_django(project_name):
     import django
     django.setup()
 
-def main():
+def project_models(app_labels=None):
+    """Models of the project's own apps (or of `app_labels`)"""
+    models = []
+    for app_config in apps.get_app_configs():
+        if app_config.name.startswith('django.'):
+            continue
+        if app_labels and app_config.label not in app_labels:
+            continue
+        models.extend(app_config.get_models())
+    return models
+
+def purge_order(models):
+    """`models` plus every model that references them, dependents first.
+
+    Deleting a table's rows deletes (or, for TRUNCATE, empties) every
+    table pointing at it, so those are part of any purge.
+    """
+    referencing = {}
+    for model in apps.get_models(include_auto_created=True):
+        for field in model._meta.concrete_fields:
+            if field.is_relation and field.remote_field.model is not model:
+                referencing.setdefault(field.remote_field.model._meta.concrete_model, set()).add(model)
+
+    ordered, seen = [], set()
+
+    def visit(model):
+        if model in seen:
+            return
+        seen.add(model)
+        for dependent in sorted(referencing.get(model, ()), key=lambda m: m._meta.label):
+            visit(dependent)
+        ordered.append(model)
+
+    for model in models:
+        visit(model._meta.concrete_model)
+    return ordered
+
+def count_rows(models):
+    """{model: row count} for all `models` in a single query"""
+    if not models:
+        return {}
+    qn = connection.ops.quote_name
+    sql = ' UNION ALL '.join(
+        f'SELECT {i}, COUNT(*) FROM {qn(model._meta.db_table)}' for i, model in enumerate(models)
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql)
+        counts = dict(cursor.fetchall())
+    return {model: counts[i] for i, model in enumerate(models)}
+
+def purge(models, batch_size=PURGE_BATCH_SIZE):
+    """Empty `models` and their dependents without loading any rows.
+
+    PostgreSQL truncates every table in one TRUNCATE ... CASCADE; other
+    databases delete in batches, dependents first. Either way it happens
+    in one transaction and no per-object signals are sent, only
+    post_bulk_change per model. Returns {model: rows deleted}.
+    """
+    from records.signals import post_bulk_change
+
+    ordered = purge_order(models)
+    qn = connection.ops.quote_name
+    with transaction.atomic():
+        deleted = count_rows(ordered)
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute(
+                    f"TRUNCATE {', '.join(qn(m._meta.db_table) for m in ordered)} CASCADE"
+                )
+            else:
+                for model in ordered:
+                    table, pk = qn(model._meta.db_table), qn(model._meta.pk.column)
+                    if connection.vendor == 'mysql':
+                        sql = f'DELETE FROM {table} LIMIT {batch_size}'
+                    else:
+                        sql = f'DELETE FROM {table} WHERE {pk} IN (SELECT {pk} FROM {table} LIMIT {batch_size})'
+                    while True:
+                        cursor.execute(sql)
+                        if cursor.rowcount < batch_size:
+                            break
+        for model in ordered:
+            post_bulk_change.send(sender=model, objs=None)
+    return deleted
+
+def delete_records(model):
+    """Delete every row of `model` without prompting; returns the row count"""
+    deleted, per_model = model.objects.all().delete()
+    return per_model.get(model._meta.label, 0)
+
+def print_summary(counts):
+    width = max(len(model._meta.label) for model in counts)
+    for model, count in counts.items():
+        print(f"  {model._meta.label:<{width}} {count:>12}")
+    print(f"  {'total':<{width}} {sum(counts.values()):>12}")
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description='Delete data from the project database. Without arguments it runs interactively.'
+    )
+    parser.add_argument('--project', help='Django project name (default: DJANGO_SETTINGS_MODULE)')
+    scope = parser.add_mutually_exclusive_group()
+    scope.add_argument('--all', action='store_true', help="Every model of the project's own apps")
+    scope.add_argument('--app', action='append', metavar='LABEL', help='App label, repeatable')
+    scope.add_argument('--model', action='append', metavar='APP.MODEL', help='Model label, repeatable')
+    parser.add_argument('--purge', action='store_true',
+                        help='Fast mode: TRUNCATE ... CASCADE on PostgreSQL, batched raw DELETEs elsewhere')
+    parser.add_argument('--dry-run', action='store_true', help='Only print what would be deleted')
+    parser.add_argument('--yes', action='store_true', help='Do not ask for confirmation')
+    return parser.parse_args(argv)
+
+def run(args):
+    """Non-interactive clean up; returns the process exit code"""
+    if args.all or args.app:
+        models = project_models(args.app)
+        if args.app and not models:
+            print(f"No models found in apps: {', '.join(args.app)}")
+            return 1
+    else:
+        try:
+            models = [apps.get_model(label) for label in args.model]
+        except (LookupError, ValueError) as e:
+            print(f"Error: {e}")
+            return 1
+
+    # Deleting a model also removes the rows that reference it
+    affected = purge_order(models)
+    counts = count_rows(affected)
+    print("Rows to delete:")
+    print_summary(counts)
+    if args.dry_run:
+        return 0
+    if not sum(counts.values()):
+        print("Nothing to delete")
+        return 0
+    if not args.yes and input("\nDelete these records? (y/n): ").lower() != 'y':
+        print("Cancelled")
+        return 1
+
+    if args.purge:
+        deleted = purge(models)
+    else:
+        with transaction.atomic():
+            deleted = {model: delete_records(model) for model in affected}
+    print(f"Deleted {sum(deleted.values())} records from {len(affected)} tables")
+    return 0
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv:
+        args = parse_args(argv)
+        if not (args.all or args.app or args.model):
+            print("Choose what to delete with --all, --app or --model")
+            sys.exit(2)
+        project_name = args.project or os.environ.get('DJANGO_SETTINGS_MODULE', '').split('.')[0]
+        if not project_name:
+            print("Project name is required! Pass --project or set DJANGO_SETTINGS_MODULE")
+            sys.exit(1)
+        setup_django(project_name)
+        sys.exit(run(args))
+
     project_name = input("Enter your Django project name: ").strip()
     if not project_name:
         print("Project name is required!")
@@ -67,28 +231,26 @@ def main():
             model_choice = int(input("\nSelect model number: ")) - 1
             selected_model = models[model_choice]
             
-            count = selected_model.objects.count()
+            count = count_rows([selected_model])[selected_model]
             if count == 0:
                 print(f"No records found in {selected_model.__name__}")
             else:
                 print(f"Found {count} records in {selected_model.__name__}")
                 if input("Delete these records? (y/n): ").lower() == 'y':
-                    selected_model.objects.all().delete()
-                    print(f"Deleted {count} records")
+                    print(f"Deleted {delete_records(selected_model)} records")
                     
         except (ValueError, IndexError):
             print("Invalid selection")
 
 def clean_app(app_config):
-    for model in app_config.get_models():
-        count = model.objects.count()
+    # One query counts every table instead of a count() per model
+    for model, count in count_rows(list(app_config.get_models())).items():
         if count == 0:
             continue
-            
+
         print(f"Found {count} records in {model.__name__}")
         if input(f"Delete these records? (y/n): ").lower() == 'y':
-            model.objects.all().delete()
-            print(f"Deleted {count} records")
+            print(f"Deleted {delete_records(model)} records")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,17 +1,320 @@
 import os
 import sys
 import csv
+import gzip
+import time
+import mmap
+import argparse
+import json
+import hashlib
+import tempfile
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import date
+from itertools import islice
+import multiprocessing
 from django.apps import apps
-from django.db import models
-from django.db.models.fields import DateField, IntegerField, BooleanField
+from django.db import DatabaseError, connection, connections, transaction
+from django.core.management.color import no_style
+from django.core.validators import MaxValueValidator, MinValueValidator
+from django.db.models import Q, UniqueConstraint
+from django.db.models.constants import LOOKUP_SEP
+from django.db.models.fields import DateField, DateTimeField, IntegerField, BooleanField
 from importlib import import_module
 from django.core.exceptions import ValidationError
+from records.signals import post_bulk_change
+from clean_up import project_models, purge
+
+# Rows per bulk_create/transaction; bounds memory use of an import
+CHUNK_SIZE = 5000
+# Rows per COPY batch and transaction when importing with COPY
+COPY_CHUNK_SIZE = 100000
+# Bytes of the file parsed per task in parallel imports (see split_ranges)
+PARALLEL_RANGE_SIZE = 4 * 1024 * 1024
+
+# Export writer buffer size and gzip level (1 favours speed over size)
+EXPORT_BUFFER_SIZE = 1024 * 1024
+EXPORT_GZIP_LEVEL = 1
+
+# Placeholder for a cell that failed conversion
+INVALID = object()
+
+BOOLEAN_VALUES = {
+    'True': True, 'true': True, 't': True, '1': True,
+    'False': False, 'false': False, 'f': False, '0': False,
+}
+
+
+def integer_limits(field):
+    """The tightest (low, high) bounds of the field's min/max validators"""
+    # Not every backend reports a range for positive integer columns
+    low = 0 if field.get_internal_type().startswith('Positive') else None
+    high = None
+    for validator in field.validators:
+        limit = validator.limit_value
+        if callable(limit):
+            continue
+        if isinstance(validator, MinValueValidator):
+            low = limit if low is None else max(low, limit)
+        elif isinstance(validator, MaxValueValidator):
+            high = limit if high is None else min(high, limit)
+    return low, high
+
+
+def value_converter(field):
+    """A function turning a CSV string into a value for `field`.
+
+    Everything about the field (type, choices, bounds) is looked up here,
+    once, so the returned function does no dispatch of its own. It raises
+    ValueError for values the database or the model would reject.
+    """
+    if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False):
+        # Filled in by pre_save whatever the file says
+        return lambda value: value
+
+    if field.choices:
+        allowed = {str(key): field.to_python(key) for key, _ in field.flatchoices}
+        expected = ', '.join(allowed)
+
+        def convert_choice(value):
+            try:
+                return allowed[value]
+            except KeyError:
+                raise ValueError(f"'{value}' is not one of {expected}") from None
+        return convert_choice
+
+    if isinstance(field, BooleanField):
+        def convert_boolean(value):
+            try:
+                return BOOLEAN_VALUES[value]
+            except KeyError:
+                raise ValueError(f"'{value}' is not a boolean") from None
+        return convert_boolean
+
+    if isinstance(field, IntegerField):
+        low, high = integer_limits(field)
+        low = float('-inf') if low is None else low
+        high = float('inf') if high is None else high
+
+        def convert_integer(value):
+            try:
+                number = int(value)
+            except ValueError:
+                raise ValueError(f"'{value}' is not an integer") from None
+            if not low <= number <= high:
+                raise ValueError(f'{number} is outside {low}-{high}')
+            return number
+        return convert_integer
+
+    if isinstance(field, DateField) and not isinstance(field, DateTimeField):
+        def convert_date(value):
+            try:
+                return date.fromisoformat(value)
+            except ValueError:
+                raise ValueError(f"'{value}' is not a YYYY-MM-DD date") from None
+        return convert_date
+
+    if field.get_internal_type() == 'CharField' and field.max_length:
+        max_length = field.max_length
+
+        def convert_text(value):
+            if len(value) > max_length:
+                raise ValueError(f"'{value}' is longer than {max_length} characters")
+            return value
+        return convert_text
+
+    def convert(value):
+        try:
+            return field.to_python(value)
+        except ValidationError as e:
+            raise ValueError('; '.join(e.messages)) from None
+    return convert
+
+
+def field_converter(field):
+    """value_converter for a model field; FKs convert the key of their target
+    field, and nullable fields read empty cells as None"""
+    convert = value_converter(field.target_field if field.is_relation else field)
+    if not field.null:
+        return convert
+
+    def convert_nullable(value):
+        return None if value == '' else convert(value)
+    return convert_nullable
+
+
+class ImportFileError(Exception):
+    """A file cannot be imported, or its import cannot be resumed"""
+
+
+def file_hash(file_path):
+    """SHA-256 of a file, read in blocks"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(EXPORT_BUFFER_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ImportSource:
+    """A CSV file read as bytes, yielding (line number, row dict) pairs.
+
+    `offset` and `line` always point just past the last row handed out, so
+    they can be stored as a checkpoint after a chunk commits and passed
+    back in to continue with the next row. Rows spanning several lines
+    (quoted newlines) are handled by the csv module as usual.
+    """
+
+    def __init__(self, file_path, offset=None, line=None, end=None):
+        self.file = open(file_path, 'rb')
+        self.fieldnames = next(csv.reader([self.file.readline().decode('utf-8-sig')]), [])
+        if offset is None:
+            offset, line = self.file.tell(), 1
+        self.file.seek(offset)
+        self.offset = offset
+        self.line = line
+        # Stop at this byte offset instead of the end of the file
+        self.end = end
+
+    def lines(self):
+        while self.end is None or self.offset < self.end:
+            raw = self.file.readline()
+            if not raw:
+                return
+            self.offset += len(raw)
+            self.line += 1
+            yield raw.decode('utf-8')
+
+    def __iter__(self):
+        for row in csv.DictReader(self.lines(), fieldnames=self.fieldnames):
+            yield self.line, row
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def split_ranges(file_path, offset, line, size=PARALLEL_RANGE_SIZE):
+    """Yield (start, end, line) byte ranges of about `size` bytes covering
+    `file_path` from `offset`, `line` being the line number before `start`.
+
+    Ranges end just after a newline, and never inside a quoted field: a
+    newline only ends a record when an even number of quote characters
+    precede it (CSV escapes quotes by doubling them).
+    """
+    with open(file_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size <= offset:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            length = len(data)
+            start = offset
+            while start < length:
+                end = min(start + size, length)
+                quotes = data[start:end].count(b'"')
+                while end < length and (data[end - 1] != ord('\n') or quotes % 2):
+                    newline = data.find(b'\n', end)
+                    following = length if newline == -1 else newline + 1
+                    quotes += data[end:following].count(b'"')
+                    end = following
+                yield start, end, line
+                line += data[start:end].count(b'\n')
+                start = end
+
+
+# The DataManager and plan of a parallel import worker process
+_worker = {}
+
+
+def _init_worker(model_label, model_fields):
+    import django
+    if not apps.ready:
+        django.setup()
+    dm = DataManager()
+    dm.Model = apps.get_model(model_label)
+    _worker['dm'] = dm
+    _worker['plan'] = dm.compile_plan(model_fields, {})
+
+
+def _convert_range(file_path, start, end, line):
+    """Parse and convert one byte range in a worker process; returns the
+    chunks of the range as (chunk, converted, offset, line) like
+    DataManager.converted_chunks.
+
+    Only rejected rows keep their row dict, the converted values are all
+    the writer needs of the others, which keeps the pickled results small.
+    """
+    dm, plan = _worker['dm'], _worker['plan']
+    chunks = []
+    with ImportSource(file_path, start, line, end) as source:
+        for chunk in dm.iter_chunks(source):
+            columns, errors = dm.convert_chunk(chunk, plan)
+            chunk = [
+                (row_line, row if index in errors else None)
+                for index, (row_line, row) in enumerate(chunk)
+            ]
+            chunks.append((chunk, (columns, errors), source.offset, source.line))
+    return chunks
+
+
+class ErrorReport:
+    """CSV of rejected rows: their line number, the reasons, then the row as
+    it was read, so a fixed copy of the report can be imported again.
+
+    Written next to the imported file and only created once a row is
+    rejected. A report left by an earlier import of the file is removed,
+    unless the import resumes that earlier one.
+    """
+
+    def __init__(self, path, header, resume=False):
+        self.path = path
+        self.header = header
+        self.file = None
+        self.writer = None
+        if not resume and os.path.exists(path):
+            os.remove(path)
+
+    def add(self, rejected):
+        """Write (line, row, messages) triples"""
+        if not rejected:
+            return
+        if self.file is None:
+            new = not os.path.exists(self.path)
+            self.file = open(self.path, 'a', newline='', buffering=EXPORT_BUFFER_SIZE)
+            self.writer = csv.writer(self.file)
+            if new:
+                self.writer.writerow(['line', 'errors', *self.header])
+        for line, row, messages in rejected:
+            self.writer.writerow([line, '; '.join(messages), *(row.get(name) for name in self.header)])
+
+    def flush(self):
+        if self.file is not None:
+            self.file.flush()
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
 
 class DataManager:
     def __init__(self):
         self.project_name = None
         self.app_name = None
         self.Model = None
+        # 'auto' uses COPY on PostgreSQL and the ORM elsewhere
+        self.backend = 'auto'
+        # Processes parsing the file; 1 parses in this process
+        self.workers = 1
     
     def setup_django(self, project_name):
         """Setup Django environment"""
@@ -92,27 +395,641 @@ class DataManager:
             if field.is_relation and not field.auto_created:
                 fk_fields[field.name] = {
                     'model': field.remote_field.model,
-                    'lookup_field': field.target_field.name
+                    'lookup_field': field.target_field.name,
+                    'target_field': field.target_field,
+                    'attname': field.attname,
+                    'null': field.null,
                 }
         return fk_fields
     
-    def convert_field_value(self, field, value):
-        """Convert input values to proper field types"""
-        if isinstance(field, (DateField)):
-            # Add date parsing logic here if needed
-            return value
-        elif isinstance(field, (IntegerField, BooleanField)):
-            return field.to_python(value)
-        return value
+    def data_fields(self, Model):
+        """Concrete fields carried in CSV files.
+
+        Non-editable fields are derived columns maintained by the app (e.g.
+        StudentProfile.current_form_class) and are left out, except for
+        auto_now/auto_now_add timestamps.
+        """
+        return [
+            field for field in Model._meta.fields
+            if not field.auto_created and (
+                field.editable
+                or getattr(field, 'auto_now', False)
+                or getattr(field, 'auto_now_add', False)
+            )
+        ]
+    
+    def compile_plan(self, model_fields, fk_fields):
+        """[(CSV column, model attname, converter)] for the imported fields,
+        built once per file"""
+        opts = self.Model._meta
+        plan = []
+        for name in model_fields:
+            field = opts.get_field(name)
+            plan.append((name, field.attname, field_converter(field)))
+        return plan
+
+    def error_report_path(self, file_path):
+        root, _ = os.path.splitext(file_path)
+        return f'{root}.errors.csv'
+
+    def count_rows(self, file_path):
+        """Count data rows without loading the file into memory"""
+        with open(file_path, 'rb') as f:
+            return max(sum(1 for _ in f) - 1, 0)
+
+    def iter_chunks(self, rows, size=CHUNK_SIZE):
+        """Yield lists of at most `size` (line number, row) pairs"""
+        rows = iter(rows)
+        while True:
+            chunk = list(islice(rows, size))
+            if not chunk:
+                return
+            yield chunk
+
+    def convert_column(self, values, convert, name, errors):
+        """Convert one column of a chunk, adding messages for bad cells to
+        `errors` ({row index: [message]}) and INVALID in their place"""
+        try:
+            # All cells are valid in the common case; map() keeps that at C speed
+            return list(map(convert, values))
+        except (TypeError, ValueError):
+            pass
+        converted = []
+        for index, value in enumerate(values):
+            if value is None:
+                # Missing from a short row, reported by validate_chunk
+                converted.append(INVALID)
+                continue
+            try:
+                converted.append(convert(value))
+            except (TypeError, ValueError) as e:
+                converted.append(INVALID)
+                errors.setdefault(index, []).append(f'{name}: {e}')
+        return converted
+
+    def check_foreign_keys(self, name, info, keys, errors):
+        """Flag keys in a converted FK column whose target doesn't exist,
+        with one query for the whole column"""
+        wanted = {key for key in keys if key is not None and key is not INVALID}
+        lookup = info['lookup_field']
+        existing = set(
+            info['model'].objects.filter(**{f'{lookup}__in': wanted})
+            .values_list(lookup, flat=True)
+        ) if wanted else set()
+        model_name = info['model'].__name__
+        for index, key in enumerate(keys):
+            if key is not None and key is not INVALID and key not in existing:
+                errors.setdefault(index, []).append(f"{name}: {model_name} '{key}' not found")
+
+    def convert_chunk(self, chunk, plan):
+        """Apply the import plan to a chunk column by column, without
+        touching the database. Returns (columns, errors) for validate_chunk.
+        """
+        errors = {}
+        for index, (_, row) in enumerate(chunk):
+            # csv.DictReader fills short rows with None and puts extra cells under None
+            if None in row or None in row.values():
+                errors[index] = [f'expected {len(row) - (None in row)} columns']
+
+        columns = [
+            self.convert_column([row[name] for _, row in chunk], convert, name, errors)
+            for name, _, convert in plan
+        ]
+        return columns, errors
+
+    def validate_chunk(self, chunk, plan, fk_fields, converted=None, claimed=None):
+        """Apply the import plan to a chunk, then check its foreign keys.
+
+        `converted` is the chunk's convert_chunk() result if it was already
+        converted elsewhere. `claimed`, kept across the chunks of a file,
+        enables check_unique(). Returns (valid, rejected): valid is
+        [(line, row, {attname: value})], rejected is [(line, row, messages)].
+        """
+        columns, errors = converted or self.convert_chunk(chunk, plan)
+        for (name, _, _), column in zip(plan, columns):
+            if name in fk_fields:
+                self.check_foreign_keys(name, fk_fields[name], column, errors)
+
+        attnames = [attname for _, attname, _ in plan]
+        valid, rejected = [], []
+        for index, ((line, row), values) in enumerate(zip(chunk, zip(*columns))):
+            if index not in errors:
+                valid.append((line, row, dict(zip(attnames, values))))
+            elif row is not None:
+                rejected.append((line, row, errors[index]))
+            else:
+                # Converted in a worker process, which kept no row; every
+                # value converted, so they print as they were read
+                row = {name: '' if value is None else str(value)
+                       for (name, _, _), value in zip(plan, values)}
+                rejected.append((line, row, errors[index]))
+        if claimed is not None:
+            valid = self.check_unique(valid, rejected, claimed)
+        return valid, rejected
+
+    def conditional_unique(self, attnames):
+        """[(constraint, key attnames, {attname: value})] for the model's
+        UniqueConstraints limited to rows matching field=value conditions,
+        such as one is_current class history row per student, whose
+        fields are all among `attnames`"""
+        opts = self.Model._meta
+        checks = []
+        for constraint in opts.constraints:
+            condition = getattr(constraint, 'condition', None)
+            if not isinstance(constraint, UniqueConstraint) or condition is None or not constraint.fields:
+                continue
+            if condition.negated or condition.connector != Q.AND or not all(
+                isinstance(child, tuple) and LOOKUP_SEP not in child[0] for child in condition.children
+            ):
+                continue
+            fields = [opts.get_field(name).attname for name in constraint.fields]
+            values = {opts.get_field(name).attname: value for name, value in condition.children}
+            if set(fields) | set(values) <= set(attnames):
+                checks.append((constraint, fields, values))
+        return checks
+
+    def check_unique(self, valid, rejected, claimed):
+        """Move rows to `rejected` that match a conditional unique key an
+        earlier row of the file already holds, e.g. a second is_current
+        class for a student. A later row with the same natural key is a
+        merge duplicate, not a clash. `claimed` is {constraint name:
+        {key: (natural key, line)}}, shared by the chunks of a file.
+        Returns the rows still valid."""
+        if not valid:
+            return valid
+        checks = self.conditional_unique(valid[0][2])
+        if not checks:
+            return valid
+        key_fields = [field.attname for field in self.natural_key(self.Model)]
+        kept = []
+        for line, row, values in valid:
+            if all(name in values for name in key_fields):
+                natural = tuple(values[name] for name in key_fields)
+            else:
+                natural = line
+            messages = []
+            for constraint, fields, condition in checks:
+                if any(values[name] != value for name, value in condition.items()):
+                    continue
+                key = tuple(values[name] for name in fields)
+                holders = claimed.setdefault(constraint.name, {})
+                if key in holders and holders[key][0] != natural:
+                    matching = ', '.join(f'{name}={value}' for name, value in constraint.condition.children)
+                    messages.append(
+                        f"{'/'.join(constraint.fields)} '{'/'.join(map(str, key))}' already has "
+                        f"a row with {matching} on line {holders[key][1]}"
+                    )
+                else:
+                    holders[key] = (natural, line)
+            if messages:
+                rejected.append((line, row, messages))
+            else:
+                kept.append((line, row, values))
+        return kept
+
+    def release_unique(self, instances, attnames):
+        """Clear the flag of existing rows that `instances` would clash
+        with on a conditional unique constraint, as apply_promotions does
+        for is_current: the imported row wins. Only boolean conditions can
+        be released; other clashes still fail the chunk. In COPY merges a
+        released row the file sets the same way counts as unchanged."""
+        key_fields = [field.attname for field in self.natural_key(self.Model)]
+        if not set(key_fields) <= set(attnames):
+            return
+        for _, fields, condition in self.conditional_unique(attnames):
+            if not all(isinstance(value, bool) for value in condition.values()):
+                continue
+            claiming = [
+                obj for obj in instances
+                if all(getattr(obj, name) == value for name, value in condition.items())
+            ]
+            if not claiming:
+                continue
+            keys = {tuple(getattr(obj, name) for name in fields) for obj in claiming}
+            incoming = {tuple(getattr(obj, name) for name in key_fields) for obj in claiming}
+            existing = self.Model.objects.filter(**condition, **{
+                f'{name}__in': {key[i] for key in keys} for i, name in enumerate(fields)
+            }).values_list('pk', *fields, *key_fields)
+            stale = [
+                pk for pk, *values in existing
+                if tuple(values[:len(fields)]) in keys and tuple(values[len(fields):]) not in incoming
+            ]
+            if stale:
+                self.Model.objects.filter(pk__in=stale).update(
+                    **{name: not value for name, value in condition.items()}
+                )
+
+    def converted_chunks(self, source, plan, model_fields):
+        """Yield (chunk, converted, offset, line) for the rest of `source`, in
+        file order: each chunk, its convert_chunk() result and the source
+        position just past it.
+
+        With more than one worker, the file is split into byte ranges that
+        a pool of processes parses and converts, a few ranges ahead of the
+        caller, who stays the only one writing to the database.
+        """
+        if self.workers <= 1:
+            for chunk in self.iter_chunks(source):
+                yield chunk, self.convert_chunk(chunk, plan), source.offset, source.line
+            return
+
+        ranges = split_ranges(source.file.name, source.offset, source.line)
+        # Spawned rather than forked, so workers share no database connection
+        with ProcessPoolExecutor(
+            self.workers, mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker, initargs=(self.model_label(), model_fields),
+        ) as pool:
+            pending = deque()
+            for start, end, line in ranges:
+                pending.append(pool.submit(_convert_range, source.file.name, start, end, line))
+                # Bounds memory when parsing outpaces the database
+                if len(pending) > self.workers * 2:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+
+    def build_instances(self, chunk, plan, fk_fields, report, converted=None, claimed=None):
+        """Build unsaved model instances for a chunk; rejected rows go to `report`"""
+        valid, rejected = self.validate_chunk(chunk, plan, fk_fields, converted, claimed)
+        report.add(rejected)
+        return [self.Model(**values) for _, _, values in valid]
+
+    def parse_file(self, file_path):
+        """Parse and convert a whole file without touching the database and
+        return the number of rows; the parsing half of an import"""
+        model_fields = [field.name for field in self.data_fields(self.Model)]
+        plan = self.compile_plan(model_fields, {})
+        with ImportSource(file_path) as source:
+            return sum(len(chunk) for chunk, _, _, _ in self.converted_chunks(source, plan, model_fields))
+
+    def natural_key(self, Model):
+        """Fields identifying a row across imports: unique_together, else the PK"""
+        opts = Model._meta
+        if opts.unique_together:
+            return [opts.get_field(name) for name in opts.unique_together[0]]
+        return [opts.pk]
+
+    def merge_fields(self, Model, model_fields):
+        """Fields a merge may overwrite: everything but the key, PK and auto dates"""
+        key = self.natural_key(Model)
+        return [
+            field for field in (Model._meta.get_field(name) for name in model_fields)
+            if field not in key and not field.primary_key
+            and not getattr(field, 'auto_now', False)
+            and not getattr(field, 'auto_now_add', False)
+        ]
+
+    def row_signature(self, fields, values):
+        """Normalised field values, comparable between CSV and database rows"""
+        return tuple(field.to_python(value) for field, value in zip(fields, values))
+
+    def merge_chunk(self, instances, key, update_fields, stats):
+        """Upsert a chunk on its natural key, skipping rows that haven't changed"""
+        rows = {}
+        for instance in instances:
+            signature = self.row_signature(key, [getattr(instance, f.attname) for f in key])
+            if signature in rows:
+                stats['duplicate'] += 1
+            rows[signature] = instance  # Last occurrence in the file wins
+
+        key_columns = [f.attname for f in key]
+        lookup = {
+            f'{field.attname}__in': {signature[i] for signature in rows}
+            for i, field in enumerate(key)
+        }
+        existing = {}
+        for values in self.Model.objects.filter(**lookup).order_by().values_list(
+            *key_columns, *[f.attname for f in update_fields]
+        ):
+            existing[self.row_signature(key, values[:len(key)])] = \
+                self.row_signature(update_fields, values[len(key):])
+
+        changed = []
+        for signature, instance in rows.items():
+            if signature not in existing:
+                stats['inserted'] += 1
+            elif existing[signature] != self.row_signature(
+                update_fields, [getattr(instance, f.attname) for f in update_fields]
+            ):
+                stats['updated'] += 1
+                if self.Model._meta.pk not in key:
+                    # Let the natural key conflict pick the existing row
+                    instance.pk = None
+            else:
+                stats['unchanged'] += 1
+                continue
+            changed.append(instance)
+
+        if changed:
+            self.release_unique(changed, [field.attname for field in key + update_fields])
+            self.Model.objects.bulk_create(
+                changed,
+                update_conflicts=bool(update_fields),
+                ignore_conflicts=not update_fields,
+                unique_fields=[f.name for f in key] if update_fields else None,
+                update_fields=[f.name for f in update_fields] if update_fields else None,
+            )
+        return changed
+
+    def checkpoint(self, job, offset, line, stats):
+        """Record that everything before byte `offset` / after `line` is
+        committed; called inside the transaction of the chunk it follows"""
+        job.byte_offset = offset
+        job.line = line
+        job.stats = dict(stats)
+        job.save(update_fields=['byte_offset', 'line', 'stats', 'updated_at'])
+
+    def import_rows(self, source, model_fields, fk_fields, report, job, stats, merge=False):
+        """Import rows chunk by chunk, committing each chunk on its own.
+
+        Only one chunk is held in memory at a time, so memory stays flat
+        regardless of the file size. Rows failing the import plan are
+        written to `report` instead. Each chunk commits together with its
+        checkpoint in `job`. With `merge`, rows are upserted on the
+        model's natural key. Counts inserted/updated/unchanged/duplicate/
+        skipped rows into `stats`.
+        """
+        key = self.natural_key(self.Model)
+        update_fields = self.merge_fields(self.Model, model_fields)
+        plan = self.compile_plan(model_fields, fk_fields)
+        attnames = [attname for _, attname, _ in plan]
+        claimed = {}
+        for chunk, converted, offset, line in self.converted_chunks(source, plan, model_fields):
+            instances = self.build_instances(chunk, plan, fk_fields, report, converted, claimed)
+            with transaction.atomic():
+                if merge:
+                    changed = self.merge_chunk(instances, key, update_fields, stats)
+                else:
+                    self.release_unique(instances, attnames)
+                    changed = self.Model.objects.bulk_create(instances)
+                    stats['inserted'] += len(instances)
+                post_bulk_change.send(sender=self.Model, objs=changed)
+                stats['skipped'] += len(chunk) - len(instances)
+                self.checkpoint(job, offset, line, stats)
+            report.flush()
+            print(f"  ... {sum(stats.values())} rows processed", end='\r', flush=True)
+        print()
     
+    def use_copy(self):
+        """Whether to move data with PostgreSQL COPY instead of the ORM"""
+        if self.backend == 'orm':
+            return False
+        return connection.vendor == 'postgresql'
+
+    def copy_select_list(self, fields, alias='s'):
+        """Cast staging text columns to the column types of `fields`"""
+        qn = connection.ops.quote_name
+        select = []
+        for field in fields:
+            if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False):
+                # Same as bulk_create, which fills these in through pre_save
+                select.append('now()')
+                continue
+            value = f'{alias}.{qn(field.name)}'
+            if field.get_internal_type() in ('CharField', 'TextField') and not field.null:
+                # COPY reads empty CSV fields as NULL
+                value = f"COALESCE({value}, '')"
+            select.append(f'{value}::{field.db_type(connection)}')
+        return select
+
+    def group_chunks(self, chunks, size):
+        """Group consecutive converted_chunks() items into lists of at least `size` rows"""
+        group, rows = [], 0
+        for item in chunks:
+            group.append(item)
+            rows += len(item[0])
+            if rows >= size:
+                yield group
+                group, rows = [], 0
+        if group:
+            yield group
+
+    def copy_rows(self, source, model_fields, fk_fields, report, job, stats, merge=False):
+        """The COPY counterpart of import_rows: rows passing the import plan
+        are loaded COPY_CHUNK_SIZE at a time, each batch committing with its
+        checkpoint"""
+        plan = self.compile_plan(model_fields, fk_fields)
+        attnames = [attname for _, attname, _ in plan]
+        claimed = {}
+        chunks = self.converted_chunks(source, plan, model_fields)
+        for batch in self.group_chunks(chunks, COPY_CHUNK_SIZE):
+            with tempfile.TemporaryFile('w+', newline='') as f, transaction.atomic():
+                # Converted values, in model_fields order; None is written
+                # as an empty field, which COPY reads as NULL
+                writer = csv.writer(f)
+                writer.writerow(model_fields)
+                skipped = 0
+                # Unsaved instances of the loaded rows, for release_unique
+                # and the post_bulk_change receivers
+                instances = []
+                for chunk, converted, _, _ in batch:
+                    valid, rejected = self.validate_chunk(chunk, plan, fk_fields, converted, claimed)
+                    report.add(rejected)
+                    skipped += len(rejected)
+                    writer.writerows(values.values() for _, _, values in valid)
+                    instances.extend(self.Model(**values) for _, _, values in valid)
+                f.seek(0)
+                self.release_unique(instances, attnames)
+                stats.update(self.copy_import(f, model_fields, model_fields, merge=merge, objs=instances))
+                stats['skipped'] += skipped
+                _, _, offset, line = batch[-1]
+                self.checkpoint(job, offset, line, stats)
+            report.flush()
+            print(f"  ... {sum(stats.values())} rows processed", end='\r', flush=True)
+        print()
+
+    def copy_import(self, f, header, model_fields, merge=False, objs=None):
+        """Import CSV file `f` with COPY FROM into a staging table, then insert set-based.
+
+        The staging table is all text so COPY never rejects a row; rows whose
+        foreign keys don't exist are filtered out by the INSERT ... SELECT.
+        With `merge`, rows are upserted on the natural key and rows whose
+        content is unchanged are left alone. Runs in one transaction, so a
+        value that can't be cast aborts the whole file; import_file() only
+        passes rows that passed the import plan. `objs` are the rows as
+        unsaved instances, if known, for post_bulk_change. Returns a Counter
+        like import_rows.
+        """
+        qn = connection.ops.quote_name
+        opts = self.Model._meta
+        fields = [opts.get_field(name) for name in model_fields]
+        staging = qn(f'{opts.db_table}_staging')
+
+        conditions = []
+        for field in fields:
+            if not field.is_relation:
+                continue
+            target = field.target_field
+            check = (
+                f'EXISTS (SELECT 1 FROM {qn(target.model._meta.db_table)} r '
+                f'WHERE r.{qn(target.column)} = s.{qn(field.name)}::{field.db_type(connection)})'
+            )
+            if field.null:
+                check = f'(s.{qn(field.name)} IS NULL OR {check})'
+            conditions.append(check)
+
+        columns = ', '.join(qn(field.column) for field in fields)
+        select_list = self.copy_select_list(fields)
+        select = ', '.join(select_list)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        insert = f'INSERT INTO {qn(opts.db_table)} ({columns}) SELECT '
+
+        if merge:
+            key = self.natural_key(self.Model)
+            update_fields = self.merge_fields(self.Model, model_fields)
+            key_exprs = ', '.join(select_list[fields.index(field)] for field in key)
+            target = qn(opts.db_table)
+            if update_fields:
+                assignments = ', '.join(
+                    f'{qn(f.column)} = EXCLUDED.{qn(f.column)}' for f in update_fields
+                )
+                current = ', '.join(f'{target}.{qn(f.column)}' for f in update_fields)
+                incoming = ', '.join(f'EXCLUDED.{qn(f.column)}' for f in update_fields)
+                conflict = (
+                    f'DO UPDATE SET {assignments} '
+                    f'WHERE ROW({current}) IS DISTINCT FROM ROW({incoming})'
+                )
+            else:
+                conflict = 'DO NOTHING'
+            # DISTINCT ON keeps the last line per key; ON CONFLICT can't hit a row twice
+            insert = (
+                f'WITH upserted AS ({insert} DISTINCT ON ({key_exprs}) {select} '
+                f'FROM {staging} s {where} ORDER BY {key_exprs}, s._line DESC '
+                f"ON CONFLICT ({', '.join(qn(f.column) for f in key)}) {conflict} "
+                f'RETURNING (xmax = 0) AS inserted) '
+                f'SELECT count(*) FILTER (WHERE inserted), count(*) FILTER (WHERE NOT inserted) '
+                f'FROM upserted'
+            )
+        else:
+            insert = f'{insert}{select} FROM {staging} s {where}'
+
+        stats = Counter()
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE TEMP TABLE {staging} (_line bigserial, "
+                f"{', '.join(f'{qn(name)} text' for name in header)}) ON COMMIT DROP"
+            )
+            cursor.copy_expert(
+                f"COPY {staging} ({', '.join(qn(name) for name in header)}) "
+                f"FROM STDIN WITH (FORMAT csv, HEADER true)", f
+            )
+            cursor.execute(f'SELECT count(*) FROM {staging}')
+            total = cursor.fetchone()[0]
+            if merge:
+                cursor.execute(
+                    f'SELECT count(*), count(DISTINCT ROW({key_exprs})) FROM {staging} s {where}'
+                )
+                valid, distinct = cursor.fetchone()
+                stats['duplicate'] = valid - distinct
+                cursor.execute(insert)
+                stats['inserted'], stats['updated'] = cursor.fetchone()
+                stats['unchanged'] = distinct - stats['inserted'] - stats['updated']
+            else:
+                cursor.execute(insert)
+                stats['inserted'] = cursor.rowcount
+            if opts.pk in fields:
+                # Explicit ids were loaded, move the sequence past them
+                for sql in connection.ops.sequence_reset_sql(no_style(), [self.Model]):
+                    cursor.execute(sql)
+            # ON COMMIT DROP only fires at the outermost commit; inside a
+            # caller's transaction (batch --atomic, benchmarks) the next
+            # batch would find the table still there
+            cursor.execute(f'DROP TABLE {staging}')
+            post_bulk_change.send(sender=self.Model, objs=objs)
+
+            # Whatever the FK check dropped
+            stats['skipped'] = total - sum(stats.values())
+        return stats
+
+    def model_label(self):
+        return self.Model._meta.label
+
+    def unfinished_job(self, file_path):
+        """The latest import job of `file_path` into the model, if it didn't finish"""
+        from records.models import ImportJob
+        job = ImportJob.objects.filter(
+            model=self.model_label(), file_path=os.path.abspath(file_path)
+        ).order_by('-pk').first()
+        if job is None or job.status == ImportJob.FINISHED:
+            return None
+        return job
+
+    def import_file(self, file_path, merge=False, resume=False):
+        """Import a CSV file without prompting and return the stats Counter.
+
+        The import runs as an ImportJob that is checkpointed after every
+        committed chunk. With `resume`, the last unfinished job of the file
+        continues after its checkpoint, in the merge mode it started with;
+        the file must not have changed since. Rows that fail validation are
+        skipped and listed, with their line numbers, in the file's error
+        report (see error_report_path).
+        """
+        from records.models import ImportJob
+        from records.summaries import deferred_refresh
+
+        file_path = os.path.abspath(file_path)
+        job = None
+        if resume:
+            job = self.unfinished_job(file_path)
+            if job is None:
+                raise ImportFileError(f"No unfinished import of {file_path} into {self.model_label()}")
+            if job.file_size != os.path.getsize(file_path) or job.file_hash != file_hash(file_path):
+                raise ImportFileError(f"{file_path} changed since import job {job.pk} started")
+            merge = job.merge
+
+        model_fields = [field.name for field in self.data_fields(self.Model)]
+        source = ImportSource(file_path, *((job.byte_offset, job.line) if job else ()))
+        missing = set(model_fields) - set(source.fieldnames)
+        if missing:
+            source.close()
+            raise ImportFileError(f"Missing required fields: {', '.join(sorted(missing))}")
+
+        with source, ErrorReport(self.error_report_path(file_path), source.fieldnames, resume) as report:
+            if job is None:
+                job = ImportJob.objects.create(
+                    model=self.model_label(), file_path=file_path,
+                    file_hash=file_hash(file_path), file_size=os.path.getsize(file_path),
+                    merge=merge, byte_offset=source.offset, line=source.line,
+                )
+            else:
+                self.set_job_status(job, ImportJob.RUNNING)
+
+            stats = Counter(job.stats)
+            fk_fields = self.handle_relationships(self.Model)
+            import_rows = self.copy_rows if self.use_copy() else self.import_rows
+            try:
+                # Summaries are refreshed once, after the last chunk
+                with deferred_refresh():
+                    import_rows(source, model_fields, fk_fields, report, job, stats, merge=merge)
+            except BaseException as e:
+                # Also on Ctrl-C; a killed process leaves the job running
+                try:
+                    self.set_job_status(job, ImportJob.FAILED, f'{type(e).__name__}: {e}')
+                except DatabaseError:
+                    # Lost connection, or inside a caller's broken transaction
+                    pass
+                raise
+            self.set_job_status(job, ImportJob.FINISHED)
+        return stats
+
+    def set_job_status(self, job, status, error=''):
+        job.status = status
+        job.error = error
+        job.save(update_fields=['status', 'error', 'updated_at'])
+
+    def export_file(self, file_path):
+        """Export the table to `file_path` and return the number of rows"""
+        if self.use_copy():
+            return self.copy_export(file_path)
+        return self.export_rows(file_path)
+
     def import_data(self):
         file_path = self.get_input_path("\nEnter CSV file path (relative or absolute): ")
         
         try:
-            with open(file_path, 'r') as f:
+            with open(file_path, 'r', newline='') as f:
                 reader = csv.DictReader(f)
-                model_fields = [f.name for f in self.Model._meta.fields if not f.auto_created]
-                fk_fields = self.handle_relationships(self.Model)
+                model_fields = [f.name for f in self.data_fields(self.Model)]
                 
                 # Validate CSV fields
                 missing = set(model_fields) - set(reader.fieldnames)
@@ -124,55 +1041,105 @@ class DataManager:
                 if extra:
                     print(f"Ignoring extra fields: {', '.join(extra)}")
 
+                # Offer to continue an import of this file that didn't finish
+                job = self.unfinished_job(file_path)
+                if job and input(
+                    f"\nAn import of this file stopped after line {job.line} "
+                    f"({sum(job.stats.values())} rows done). Resume it? (y/n): "
+                ).lower() == 'y':
+                    stats = self.import_file(file_path, resume=True)
+                    self.print_import_stats(stats, job.merge, file_path)
+                    return
+
                 # Handle existing data
-                action = 'merge'
+                action = 'insert'
                 if self.Model.objects.exists():
                     action = input("\nExisting data. [R]eplace, [M]erge, or [C]ancel? ").lower()
-                    if action == 'r':
-                        self.Model.objects.all().delete()
-                        print("Existing data deleted.")
-                    elif action not in ('m', ''):
+                    if action not in ('r', 'm', ''):
                         print("Import cancelled.")
                         return
 
-                # Process records
-                records = []
-                for i, row in enumerate(reader, 2):  # Start from line 2 (1-based)
-                    try:
-                        instance_data = {}
-                        for field in model_fields:
-                            value = row[field]
-                            
-                            # Handle relationships
-                            if field in fk_fields:
-                                related_model = fk_fields[field]['model']
-                                lookup_field = fk_fields[field]['lookup_field']
-                                try:
-                                    instance_data[field] = related_model.objects.get(**{lookup_field: value})
-                                except related_model.DoesNotExist:
-                                    print(f"Line {i}: Related {field} with {lookup_field} '{value}' not found")
-                                    raise ValidationError
-                                except Exception as e:
-                                    print(f"Line {i}: Error with {field} '{value}' - {str(e)}")
-                                    raise ValidationError
-                            else:
-                                # Convert data types
-                                model_field = self.Model._meta.get_field(field)
-                                instance_data[field] = self.convert_field_value(model_field, value)
-                                
-                        records.append(self.Model(**instance_data))
-                    
-                    except ValidationError:
-                        continue
-                        
                 # Confirm and import
-                if records and input(f"\nImport {len(records)} records? (y/n): ").lower() == 'y':
-                    self.Model.objects.bulk_create(records)
-                    print(f"Successfully imported {len(records)} records")
+                total = self.count_rows(file_path)
+                if not total or input(f"\nImport {total} records? (y/n): ").lower() != 'y':
+                    return
+
+                if action == 'r':
+                    self.Model.objects.all().delete()
+                    print("Existing data deleted.")
+
+                merge = action in ('m', '')
+                stats = self.import_file(file_path, merge=merge)
+                self.print_import_stats(stats, merge, file_path)
         
         except Exception as e:
             print(f"Error: {str(e)}")
+
+    def print_import_stats(self, stats, merge, file_path):
+        if merge:
+            print(f"Merged: {stats['inserted']} inserted, {stats['updated']} updated, "
+                  f"{stats['unchanged']} unchanged")
+            if stats['duplicate']:
+                print(f"Superseded {stats['duplicate']} duplicate rows (last one wins)")
+        else:
+            print(f"Successfully imported {stats['inserted']} records")
+        if stats['skipped']:
+            print(f"Skipped {stats['skipped']} invalid records, "
+                  f"see {self.error_report_path(file_path)}")
     
+    def print_export_stats(self, count, file_path, elapsed):
+        print(f"Exported {count} records to {file_path} "
+              f"in {elapsed:.2f}s ({count / max(elapsed, 1e-6):,.0f} rows/sec)")
+
+    def open_export_file(self, file_path):
+        """Open a buffered text writer, gzip-compressed for *.gz paths"""
+        if file_path.endswith('.gz'):
+            return gzip.open(file_path, 'wt', newline='', compresslevel=EXPORT_GZIP_LEVEL)
+        return open(file_path, 'w', newline='', buffering=EXPORT_BUFFER_SIZE)
+
+    def export_rows(self, file_path):
+        """Stream the table to `file_path` and return the number of rows.
+
+        Rows come from a server-side cursor via values_list, with FK columns
+        read as raw ids, so no model instances or related objects are built.
+        """
+        concrete = self.data_fields(self.Model)
+        fields = [f.name for f in concrete]
+        # FKs store the target field value in attname (e.g. student_id)
+        columns = [f.attname for f in concrete]
+        rows = self.Model.objects.order_by('pk').values_list(*columns).iterator(
+            chunk_size=CHUNK_SIZE
+        )
+
+        count = 0
+        with self.open_export_file(file_path) as f:
+            writer = csv.writer(f)
+            writer.writerow(fields)
+            for values in rows:
+                writer.writerow([str(value) for value in values])
+                count += 1
+        return count
+
+    def copy_export(self, file_path):
+        """Export the table with COPY TO and return the number of rows"""
+        qn = connection.ops.quote_name
+        opts = self.Model._meta
+        select = []
+        for field in self.data_fields(self.Model):
+            column = qn(field.column)
+            if field.get_internal_type() == 'BooleanField':
+                # Match the ORM path, which writes str(value)
+                column = f"CASE WHEN {column} THEN 'True' ELSE 'False' END"
+            select.append(f'{column} AS {qn(field.name)}')
+
+        with self.open_export_file(file_path) as f, connection.cursor() as cursor:
+            cursor.copy_expert(
+                f"COPY (SELECT {', '.join(select)} FROM {qn(opts.db_table)} "
+                f"ORDER BY {qn(opts.pk.column)}) TO STDOUT WITH (FORMAT csv, HEADER true)",
+                f,
+            )
+            return cursor.rowcount
+
     def export_data(self):
         default_path = os.path.join(
             os.path.dirname(os.path.abspath(__file__)),
@@ -180,7 +1147,7 @@ class DataManager:
         )
         
         file_path = self.get_input_path(
-            f"\nEnter destination CSV path (or press Enter for default: {default_path}): ",
+            f"\nEnter destination CSV path, ending in .gz to compress (or press Enter for default: {default_path}): ",
             default=default_path,
             file_type='new_file'  # Changed from 'file' to 'new_file'
         )
@@ -189,33 +1156,295 @@ class DataManager:
             print("No data to export")
             return
         
-        fields = [f.name for f in self.Model._meta.fields if not f.auto_created]
-        
         try:
             # Create directory if it doesn't exist
             os.makedirs(os.path.dirname(file_path), exist_ok=True)
             
-            with open(file_path, 'w', newline='') as f:
-                writer = csv.DictWriter(f, fieldnames=fields)
-                writer.writeheader()
-                
-                for obj in self.Model.objects.all():
-                    row = {}
-                    for field in fields:
-                        field_value = getattr(obj, field)
-                        if isinstance(field_value, models.Model):
-                            related_field = self.Model._meta.get_field(field).target_field.name
-                            row[field] = getattr(field_value, related_field)
-                        else:
-                            row[field] = str(field_value)
-                    writer.writerow(row)
-            
-            print(f"Exported {self.Model.objects.count()} records to {file_path}")
+            start = time.perf_counter()
+            count = self.export_file(file_path)
+            self.print_export_stats(count, file_path, time.perf_counter() - start)
         
         except Exception as e:
             print(f"Export Error: {str(e)}")
 
-def main():
+def model_dependencies(models):
+    """{model: the other `models` it has a foreign key to}"""
+    selected = set(models)
+    return {
+        model: {
+            field.related_model for field in model._meta.concrete_fields
+            if field.is_relation and field.related_model in selected and field.related_model is not model
+        }
+        for model in models
+    }
+
+def import_levels(models):
+    """`models` grouped into levels, each referencing only models of the
+    levels before it, so each level can load once those are in"""
+    pending = model_dependencies(models)
+    levels = []
+    while pending:
+        level = [model for model in models if model in pending and not pending[model] & pending.keys()]
+        if not level:
+            labels = ', '.join(sorted(model._meta.label for model in pending))
+            raise ImportFileError(f"Foreign keys form a cycle between {labels}")
+        levels.append(level)
+        for model in level:
+            del pending[model]
+    return levels
+
+def batch_entries(path):
+    """[(model, CSV path, merge or None)] for a batch import.
+
+    `path` is either a directory of <model_name>.csv or
+    <model_name>_import.csv files, or a JSON manifest listing
+    {"model": "app.Model", "file": ..., "merge": bool} objects, with files
+    relative to the manifest.
+    """
+    path = os.path.abspath(path)
+    entries = []
+    if os.path.isdir(path):
+        names = {model._meta.model_name: model for model in project_models()}
+        for name in sorted(os.listdir(path)):
+            stem, ext = os.path.splitext(name)
+            if ext.lower() != '.csv':
+                continue
+            model = names.get(stem.lower().removesuffix('_import'))
+            if model is None:
+                print(f"Skipping {name}: no model of that name")
+                continue
+            entries.append((model, os.path.join(path, name), None))
+    else:
+        try:
+            with open(path) as f:
+                manifest = json.load(f)
+            for item in manifest:
+                entries.append((
+                    apps.get_model(item['model']),
+                    os.path.join(os.path.dirname(path), item['file']),
+                    item.get('merge'),
+                ))
+        except OSError as e:
+            raise ImportFileError(f"Cannot read {path}: {e}")
+        except (ValueError, LookupError, TypeError) as e:
+            raise ImportFileError(f"Invalid manifest {path}: {e!r}")
+
+    seen = {}
+    for model, file_path, _ in entries:
+        if model in seen:
+            raise ImportFileError(f"Both {seen[model]} and {file_path} are for {model._meta.label}")
+        seen[model] = file_path
+        if not os.path.exists(file_path):
+            raise ImportFileError(f"File not found at {file_path}")
+    return entries
+
+def import_batch(entries, merge=False, replace=False, atomic=False, backend='auto', workers=1):
+    """Import the files of several models in foreign key order.
+
+    Returns {model: stats Counter, or the exception that stopped it};
+    models depending on one that failed are not loaded. With `replace` the
+    models, and everything referencing them, are emptied first.
+
+    With `atomic` everything, the delete included, runs in one transaction
+    with a savepoint per model, one model after another; any failure rolls
+    it all back and is raised. Otherwise each model is its own checkpointed
+    import (see DataManager.import_file) and the models of a level load
+    concurrently, each on its own connection, except on SQLite, which has a
+    single writer. Either way the summaries are refreshed once, by this
+    thread, after the last model.
+    """
+    from records.summaries import deferred_refresh, pop_pending, schedule_refresh
+
+    models = [model for model, _, _ in entries]
+    files = {model: (file_path, merge if entry_merge is None else entry_merge)
+             for model, file_path, entry_merge in entries}
+
+    def load(model):
+        dm = DataManager()
+        dm.Model = model
+        dm.app_name = model._meta.app_label
+        dm.backend = backend
+        dm.workers = workers
+        file_path, model_merge = files[model]
+        return dm.import_file(file_path, merge=model_merge)
+
+    handed_over = []
+
+    def load_in_thread(model):
+        # Hand the summary changes to the calling thread, so models loading
+        # side by side never refresh the same summaries concurrently
+        try:
+            with deferred_refresh():
+                try:
+                    return load(model)
+                finally:
+                    handed_over.append(pop_pending())
+        finally:
+            connections.close_all()
+
+    levels = import_levels(models)
+    results = {}
+    if atomic:
+        with transaction.atomic(), deferred_refresh():
+            if replace:
+                purge(models)
+            for level in levels:
+                for model in level:
+                    with transaction.atomic():
+                        results[model] = load(model)
+        return results
+
+    dependencies = model_dependencies(models)
+    with deferred_refresh():
+        if replace:
+            purge(models)
+        for level in levels:
+            ready = []
+            for model in level:
+                failed = [dep for dep in dependencies[model] if isinstance(results[dep], Exception)]
+                if failed:
+                    results[model] = ImportFileError(f"Not loaded, {failed[0]._meta.label} failed")
+                else:
+                    ready.append(model)
+            if len(ready) > 1 and connection.vendor != 'sqlite':
+                with ThreadPoolExecutor(len(ready)) as pool:
+                    futures = {model: pool.submit(load_in_thread, model) for model in ready}
+                for model, future in futures.items():
+                    try:
+                        results[model] = future.result()
+                    except Exception as e:
+                        results[model] = e
+                for changes in handed_over:
+                    schedule_refresh(changes)
+                handed_over.clear()
+            else:
+                for model in ready:
+                    try:
+                        results[model] = load(model)
+                    except Exception as e:
+                        results[model] = e
+    return results
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description='Import or export the rows of one model as CSV, or import several models '
+                    'at once. Without arguments it runs interactively.'
+    )
+    parser.add_argument('--project', help='Django project name (default: DJANGO_SETTINGS_MODULE)')
+    parser.add_argument('--model', metavar='APP.MODEL',
+                        help='Model label, e.g. records.AcademicRecord')
+    direction = parser.add_mutually_exclusive_group(required=True)
+    direction.add_argument('--import', dest='import_path', metavar='CSV', help='CSV file to import')
+    direction.add_argument('--export', dest='export_path', metavar='CSV',
+                           help='Destination file, ending in .gz to compress')
+    direction.add_argument('--batch', dest='batch_path', metavar='PATH',
+                           help='Directory of <model_name>[_import].csv files, or a JSON manifest, '
+                                'to import in foreign key order')
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--merge', action='store_true', help='Upsert rows on their natural key')
+    mode.add_argument('--replace', action='store_true', help='Delete the existing rows first')
+    mode.add_argument('--resume', action='store_true',
+                      help="Continue the file's last unfinished import after its checkpoint")
+    parser.add_argument('--atomic', action='store_true',
+                        help='With --batch, import everything in one transaction')
+    parser.add_argument('--backend', choices=('auto', 'orm'), default='auto',
+                        help='auto uses COPY on PostgreSQL')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Processes parsing the CSV in parallel (default 1, in this process)')
+    args = parser.parse_args(argv)
+    if args.batch_path:
+        if args.model:
+            parser.error('--model cannot be used with --batch')
+        if args.resume:
+            parser.error('--resume works on one file; resume a failed model with --model and --import')
+    else:
+        if not args.model:
+            parser.error('--model is required with --import and --export')
+        if args.atomic:
+            parser.error('--atomic only applies to --batch')
+    return args
+
+def run_batch(args):
+    """Non-interactive batch import; returns the process exit code"""
+    start = time.perf_counter()
+    try:
+        entries = batch_entries(args.batch_path)
+        if not entries:
+            print(f"Error: Nothing to import in {args.batch_path}")
+            return 1
+        results = import_batch(entries, merge=args.merge, replace=args.replace, atomic=args.atomic,
+                               backend=args.backend, workers=args.workers)
+    except (ImportFileError, DatabaseError) as e:
+        # With --atomic the first failure is raised, after the rollback
+        print(f"Error: {e}")
+        return 1
+
+    files = {model: (file_path, merge) for model, file_path, merge in entries}
+    failures = 0
+    for model, result in results.items():
+        file_path, merge = files[model]
+        print(f"{model._meta.label} ({os.path.basename(file_path)}):")
+        if isinstance(result, Exception):
+            failures += 1
+            print(f"Error: {result}")
+            continue
+        dm = DataManager()
+        dm.print_import_stats(result, args.merge if merge is None else merge, file_path)
+    print(f"Finished in {time.perf_counter() - start:.2f}s")
+    return 1 if failures else 0
+
+def run(args):
+    """Non-interactive import or export; returns the process exit code"""
+    if args.batch_path:
+        return run_batch(args)
+    dm = DataManager()
+    try:
+        dm.Model = apps.get_model(args.model)
+    except (LookupError, ValueError) as e:
+        print(f"Error: {e}")
+        return 1
+    dm.app_name = dm.Model._meta.app_label
+    dm.backend = args.backend
+    dm.workers = args.workers
+
+    start = time.perf_counter()
+    if args.export_path:
+        file_path = os.path.abspath(args.export_path)
+        count = dm.export_file(file_path)
+        dm.print_export_stats(count, file_path, time.perf_counter() - start)
+        return 0
+
+    file_path = os.path.abspath(args.import_path)
+    if not os.path.exists(file_path):
+        print(f"Error: File not found at {file_path}")
+        return 1
+    merge = args.merge
+    if args.resume:
+        job = dm.unfinished_job(file_path)
+        merge = job.merge if job else merge
+    elif args.replace:
+        dm.Model.objects.all().delete()
+        print("Existing data deleted.")
+    try:
+        stats = dm.import_file(file_path, merge=merge, resume=args.resume)
+    except ImportFileError as e:
+        print(f"Error: {e}")
+        return 1
+    dm.print_import_stats(stats, merge, file_path)
+    print(f"Finished in {time.perf_counter() - start:.2f}s")
+    return 0
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv:
+        args = parse_args(argv)
+        project_name = args.project or os.environ.get('DJANGO_SETTINGS_MODULE', '').split('.')[0]
+        if not project_name:
+            print("Project name is required! Pass --project or set DJANGO_SETTINGS_MODULE")
+            sys.exit(1)
+        DataManager().setup_django(project_name)
+        sys.exit(run(args))
+
     dm = DataManager()
     
     # Get project name
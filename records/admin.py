@@ -1,5 +1,7 @@
-from django.contrib import admin
-from .models import StudentProfile, AcademicRecord, StudentClassHistory
+from django.contrib import admin, messages
+from .models import StudentProfile, AcademicRecord, StudentClassHistory, ImportJob
+from .exports import export_response
+from .search import search_filter
 
 class StudentClassHistoryInline(admin.TabularInline):
     model = StudentClassHistory
@@ -12,16 +14,13 @@ class CurrentClassFilter(admin.SimpleListFilter):
     parameter_name = 'current_class'
 
     def lookups(self, request, model_admin):
-        return StudentClassHistory.objects.filter(
-            is_current=True
-        ).values_list('form_class', 'form_class').distinct()
+        return StudentProfile.objects.exclude(
+            current_form_class=''
+        ).values_list('current_form_class', 'current_form_class').distinct().order_by('current_form_class')
 
     def queryset(self, request, queryset):
         if self.value():
-            return queryset.filter(
-                class_history__form_class=self.value(),
-                class_history__is_current=True
-            )
+            return queryset.filter(current_form_class=self.value())
 
 class AcademicYearFilter(admin.SimpleListFilter):
     title = 'academic year'
@@ -45,13 +44,49 @@ class StudentProfileAdmin(admin.ModelAdmin):
     list_filter = (CurrentClassFilter, AcademicYearFilter)
     search_fields = ('student_id', 'first_name', 'last_name')
 
+    def get_search_results(self, request, queryset, search_term):
+        # Indexed search (see records.search) instead of OR-ed icontains per field
+        if not search_term.strip():
+            return queryset, False
+        return queryset.filter(search_filter(search_term)), False
+
     def current_class_display(self, obj):
-        current = obj.class_history.filter(is_current=True).first()
-        return f"{current.form_class} ({current.academic_year})" if current else "N/A"
+        if not obj.current_form_class:
+            return "N/A"
+        return f"{obj.current_form_class} ({obj.current_academic_year})"
     current_class_display.short_description = 'Current Class'
 
 @admin.register(AcademicRecord)
 class AcademicRecordAdmin(admin.ModelAdmin):
     list_display = ('student', 'academic_year', 'semester', 'Chinese', 'English', 'Mathematics', 'Science', 'conduct')
     list_filter = ('semester', 'conduct', 'academic_year')
-    search_fields = ('student__student_id', 'student__first_name', 'student__last_name')
\ No newline at end of file
+    search_fields = ('student__student_id', 'student__first_name', 'student__last_name')
+    actions = ['download_csv', 'download_xlsx']
+
+    @admin.action(description='Download selected records as CSV')
+    def download_csv(self, request, queryset):
+        return export_response(queryset, 'csv')
+
+    @admin.action(description='Download selected records as XLSX')
+    def download_xlsx(self, request, queryset):
+        try:
+            return export_response(queryset, 'xlsx')
+        except ImportError:
+            self.message_user(request, 'XLSX export needs openpyxl installed.', messages.ERROR)
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        return queryset.filter(search_filter(search_term, prefix='student__')), False
+
+@admin.register(ImportJob)
+class ImportJobAdmin(admin.ModelAdmin):
+    # Written by data_manager.py only; resume with its --resume flag
+    list_display = ('model', 'file_path', 'status', 'line', 'started_at', 'updated_at')
+    list_filter = ('status', 'model')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,116 @@
+"""Subject score aggregates computed in the database.
+
+All statistics for every group come from one grouped query: academic
+records are LEFT JOINed to the student's class history row for the same
+academic year to get the form class.
+"""
+from django.db import connection
+from django.db.models import (
+    Aggregate, Avg, Count, F, FilteredRelation, FloatField, Max, Min, Q, StdDev,
+)
+
+from .cache import cache_timeout, records_cache, versioned_key
+from .models import AcademicRecord
+
+SUBJECTS = ['Chinese', 'English', 'Mathematics', 'Science']
+PASS_MARK = 50
+# (band, lowest score, highest score)
+GRADE_BANDS = [
+    ('A', 85, 100),
+    ('B', 70, 84),
+    ('C', 55, 69),
+    ('D', 40, 54),
+    ('E', 0, 39),
+]
+PERCENTILES = [25, 50, 75, 90]
+GROUP_FIELDS = ['academic_year', 'semester', 'form_class']
+
+
+class PercentileCont(Aggregate):
+    """PostgreSQL's continuous percentile ordered-set aggregate"""
+    function = 'PERCENTILE_CONT'
+    name = 'PercentileCont'
+    output_field = FloatField()
+    template = '%(function)s(%(percentile)s) WITHIN GROUP (ORDER BY %(expressions)s)'
+
+    def __init__(self, expression, percentile, **extra):
+        super().__init__(expression, percentile=float(percentile), **extra)
+
+
+def aggregate_expressions():
+    """{alias: aggregate} for every statistic of every subject"""
+    expressions = {'count': Count('id')}
+    for subject in SUBJECTS:
+        expressions[f'{subject}__mean'] = Avg(subject)
+        expressions[f'{subject}__stddev'] = StdDev(subject)
+        expressions[f'{subject}__min'] = Min(subject)
+        expressions[f'{subject}__max'] = Max(subject)
+        expressions[f'{subject}__passed'] = Count('id', filter=Q(**{f'{subject}__gte': PASS_MARK}))
+        for band, low, high in GRADE_BANDS:
+            expressions[f'{subject}__band_{band}'] = Count(
+                'id', filter=Q(**{f'{subject}__range': (low, high)})
+            )
+        if connection.vendor == 'postgresql':
+            # Other backends have no percentile aggregate; those stay None
+            for percentile in PERCENTILES:
+                expressions[f'{subject}__p{percentile}'] = PercentileCont(
+                    subject, percentile / 100
+                )
+    return expressions
+
+
+def subject_statistics(academic_year=None, semester=None, form_class=None, group_by=None):
+    """Per-group subject statistics, cached until the records change.
+
+    `group_by` is a subset of GROUP_FIELDS (all of them by default).
+    """
+    group_by = [field for field in GROUP_FIELDS if field in (group_by or GROUP_FIELDS)]
+    key = versioned_key('analytics', academic_year, semester, form_class, ','.join(group_by))
+    cache = records_cache()
+    statistics = cache.get(key)
+    if statistics is None:
+        statistics = _subject_statistics(academic_year, semester, form_class, group_by)
+        cache.set(key, statistics, cache_timeout())
+    return statistics
+
+
+def _subject_statistics(academic_year, semester, form_class, group_by):
+    records = AcademicRecord.objects.annotate(
+        year_class=FilteredRelation(
+            'student__class_history',
+            condition=Q(student__class_history__academic_year=F('academic_year')),
+        ),
+        form_class=F('year_class__form_class'),
+    )
+    if academic_year:
+        records = records.filter(academic_year=academic_year)
+    if semester:
+        records = records.filter(semester=semester)
+    if form_class:
+        records = records.filter(form_class=form_class)
+
+    rows = records.values(*group_by).annotate(**aggregate_expressions()).order_by(*group_by)
+    return [_format_group(row, group_by) for row in rows]
+
+
+def _format_group(row, group_by):
+    count = row['count']
+    group = {field: row[field] for field in group_by}
+    group['count'] = count
+    group['subjects'] = {}
+    for subject in SUBJECTS:
+        mean = row[f'{subject}__mean']
+        stddev = row[f'{subject}__stddev']
+        group['subjects'][subject] = {
+            'mean': round(mean, 2) if mean is not None else None,
+            'stddev': round(stddev, 2) if stddev is not None else None,
+            'min': row[f'{subject}__min'],
+            'max': row[f'{subject}__max'],
+            'pass_rate': round(row[f'{subject}__passed'] / count, 4) if count else None,
+            'percentiles': {
+                f'p{percentile}': row.get(f'{subject}__p{percentile}')
+                for percentile in PERCENTILES
+            },
+            'bands': {band: row[f'{subject}__band_{band}'] for band, _, _ in GRADE_BANDS},
+        }
+    return group
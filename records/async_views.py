@@ -0,0 +1,94 @@
+"""Async versions of the read views, routed in place of the sync ones when
+settings.RECORDS_ASYNC_VIEWS is on (studentrecords/asgi.py turns it on).
+
+The querysets are the same ones the sync views build. Independent queries
+(the page, the filter choices) are awaited together. With
+RECORDS_ASYNC_PARALLEL_QUERIES each runs on its own worker thread and
+database connection, so their round trips overlap; otherwise they go
+through the async ORM, which runs them one after another on the request's
+database thread.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.shortcuts import render
+
+from .cache import cache_response
+from .models import AcademicRecord, StudentProfile
+from .pagination import build_page, page_queryset
+from .routers import use_replica
+from .views import RECORD_ORDERING, profile_queries, results_context, results_queries
+
+
+def _evaluate_in_thread(queryset):
+    try:
+        return list(queryset)
+    finally:
+        # Worker threads see no request_finished signal, so apply
+        # CONN_MAX_AGE here instead
+        close_old_connections()
+
+
+async def evaluate(queryset):
+    """The rows of `queryset` as a list"""
+    if getattr(settings, 'RECORDS_ASYNC_PARALLEL_QUERIES', False):
+        return await sync_to_async(_evaluate_in_thread, thread_sensitive=False)(queryset)
+    return [row async for row in queryset]
+
+
+async def paginate(request, queryset, ordering, *querysets):
+    """The KeysetPage for `queryset`, followed by the rows of `querysets`,
+    all fetched concurrently"""
+    queryset, size, before, after = page_queryset(request, queryset, ordering)
+    rows, *others = await asyncio.gather(
+        evaluate(queryset), *(evaluate(other) for other in querysets)
+    )
+    return [build_page(request, rows, ordering, size, before, after), *others]
+
+
+@use_replica
+@cache_response
+async def student_profiles(request):
+    students, ordering, year_choices = profile_queries(request)
+    page, year_choices = await paginate(request, students, ordering, year_choices)
+
+    return render(request, 'records/student_profiles.html', {
+        'students': page.object_list,
+        'page': page,
+        'year_choices': year_choices,
+        'selected_year': request.GET.get('year', '')
+    })
+
+
+@use_replica
+@cache_response
+async def academic_results(request):
+    results, years, class_choices = results_queries(request)
+    page, years, class_choices = await paginate(
+        request, results, RECORD_ORDERING, years, class_choices
+    )
+    return render(request, 'records/academic_results.html', results_context(
+        request, page, years, class_choices
+    ))
+
+
+@use_replica
+@cache_response
+async def student_report(request, student_id):
+    try:
+        student = await StudentProfile.objects.aget(student_id=student_id)
+    except StudentProfile.DoesNotExist:
+        return render(request, 'records/404.html', {'message': 'Student not found'}, status=404)
+
+    academic_records, summaries = await asyncio.gather(
+        evaluate(AcademicRecord.objects.filter(student=student).order_by('academic_year', 'semester')),
+        evaluate(student.semester_summaries.order_by('academic_year', 'semester')),
+    )
+    return render(request, 'records/student_report.html', {
+        'student': student,
+        'academic_records': academic_records,
+        'summaries': summaries,
+        'subjects': ['Chinese', 'English', 'Mathematics', 'Science', 'conduct']
+    })
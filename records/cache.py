@@ -0,0 +1,161 @@
+"""Versioned caching for the records views and derived data.
+
+Everything is stored in the cache alias named by settings.RECORDS_CACHE_ALIAS
+and every key embeds the current data version. Any write to
+StudentProfile, StudentClassHistory or AcademicRecord bumps the version
+(see records.handlers). After that, earlier entries are never read again
+and expire on their own, so no explicit purge is needed.
+"""
+import hashlib
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse
+
+from .routers import max_lag, reading_from_replica
+
+VERSION_KEY = 'records:data-version'
+VERSION_TIME_KEY = 'records:data-version-time'
+DEFAULT_TIMEOUT = 60 * 60
+
+# CACHES with the records cache switched off, for timing the views and
+# counting their queries (override_settings(CACHES=NO_CACHE))
+NO_CACHE = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'records': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+}
+
+
+def records_cache():
+    return caches[getattr(settings, 'RECORDS_CACHE_ALIAS', 'default')]
+
+
+def cache_timeout():
+    return getattr(settings, 'RECORDS_CACHE_TIMEOUT', DEFAULT_TIMEOUT)
+
+
+def data_version():
+    cache = records_cache()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Start from the clock so an evicted counter never reuses old keys
+        cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def bump_data_version():
+    cache = records_cache()
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, time.time_ns(), timeout=None)
+    cache.set(VERSION_TIME_KEY, time.time(), timeout=None)
+
+
+def bump_data_version_on_commit(using=None):
+    """Bump the version once the current transaction commits.
+
+    A transaction that writes many rows bumps the version only once.
+    """
+    connection = transaction.get_connection(using)
+    if connection.in_atomic_block and any(
+        entry[1] is bump_data_version for entry in connection.run_on_commit
+    ):
+        return
+    transaction.on_commit(bump_data_version, using=using)
+
+
+def versioned_key(*parts):
+    return ':'.join(['records', str(data_version()), *map(str, parts)])
+
+
+def normalized_query(query_dict):
+    """Query string with empty values dropped and keys/values sorted"""
+    return '&'.join(
+        f'{key}={value}'
+        for key in sorted(query_dict)
+        for value in sorted(query_dict.getlist(key))
+        if value != ''
+    )
+
+
+def response_cache_key(view, request, args, kwargs):
+    signature = '|'.join([
+        repr(args), repr(sorted(kwargs.items())), normalized_query(request.GET)
+    ])
+    return versioned_key(
+        'view', view.__module__, view.__name__,
+        hashlib.sha256(signature.encode()).hexdigest(),
+    )
+
+
+def cached_response(cached):
+    content, content_type = cached
+    response = HttpResponse(content, content_type=content_type)
+    response['X-Records-Cache'] = 'hit'
+    return response
+
+
+def response_timeout():
+    """cache_timeout(), cut to the replica lag allowance for pages read from
+    a replica soon after a write, which may not have reached it yet"""
+    if reading_from_replica():
+        bumped = records_cache().get(VERSION_TIME_KEY)
+        if bumped is None or time.time() - bumped < max_lag():
+            return min(max_lag(), cache_timeout())
+    return cache_timeout()
+
+
+def cacheable(response):
+    return response.status_code == 200 and not response.streaming
+
+
+def cache_response(view):
+    """Serve successful GET responses of `view` from the records cache.
+
+    Entries are keyed on the view, its URL arguments and the normalised
+    query string, so every filter combination is cached separately.
+    Works for sync and async views.
+    """
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            if request.method != 'GET':
+                return await view(request, *args, **kwargs)
+
+            key = await sync_to_async(response_cache_key)(view, request, args, kwargs)
+            cache = records_cache()
+            cached = await cache.aget(key)
+            if cached is not None:
+                return cached_response(cached)
+
+            response = await view(request, *args, **kwargs)
+            if cacheable(response):
+                timeout = await sync_to_async(response_timeout)()
+                await cache.aset(key, (response.content, response['Content-Type']), timeout)
+                response['X-Records-Cache'] = 'miss'
+            return response
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method != 'GET':
+            return view(request, *args, **kwargs)
+
+        key = response_cache_key(view, request, args, kwargs)
+        cache = records_cache()
+        cached = cache.get(key)
+        if cached is not None:
+            return cached_response(cached)
+
+        response = view(request, *args, **kwargs)
+        if cacheable(response):
+            cache.set(key, (response.content, response['Content-Type']), response_timeout())
+            response['X-Records-Cache'] = 'miss'
+        return response
+    return wrapper
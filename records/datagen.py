@@ -0,0 +1,111 @@
+"""Seeded synthetic StudentProfile/StudentClassHistory/AcademicRecord data.
+
+The same seed and size always produce the same rows. Rows are written
+with bulk_create in batches, so generating millions of records holds
+only one batch in memory.
+"""
+import random
+from datetime import date, timedelta
+
+from django.db import transaction
+
+from .cache import bump_data_version
+from .models import AcademicRecord, StudentClassHistory, StudentProfile
+from .summaries import rebuild_summaries
+
+FIRST_NAMES = [
+    'Mia', 'Daniel', 'Ava', 'Ethan', 'Olivia', 'Lucas', 'Emma', 'Noah', 'Chloe',
+    'Liam', 'Sophia', 'Ryan', 'Grace', 'Jayden', 'Isabella', 'Aiden', 'Zoe',
+    'Nathan', 'Hannah', 'Marcus', 'Lily', 'Kevin', 'Ella', 'Jason', 'Ivy',
+]
+LAST_NAMES = [
+    'Sanchez', 'Kim', 'Mitchell', 'Brooks', 'Chan', 'Wong', 'Lee', 'Cheung',
+    'Lau', 'Ng', 'Ho', 'Leung', 'Tang', 'Lam', 'Yip', 'Chow', 'Tsang', 'Patel',
+    'Garcia', 'Nguyen', 'Smith', 'Johnson', 'Lopez', 'Martin', 'Clark',
+]
+STREAMS = 'ABCD'
+YEARS = [year for year, _ in AcademicRecord.ACADEMIC_YEAR_CHOICES]
+SEMESTERS = [semester for semester, _ in AcademicRecord.SEMESTER_CHOICES]
+SUBJECTS = ['Chinese', 'English', 'Mathematics', 'Science']
+CONDUCT_WEIGHTS = [('A', 3), ('B', 4), ('C', 2), ('D', 1)]
+BATCH_SIZE = 5000
+# One profile, one class per year and one record per semester per year
+ROWS_PER_STUDENT = 1 + len(YEARS) + len(YEARS) * len(SEMESTERS)
+
+
+def student_id(n):
+    return f'S{n:07d}'
+
+
+def score(rng, ability):
+    return max(0, min(100, round(rng.gauss(ability, 10))))
+
+
+def generate_students(count, seed=0):
+    """Yield (profile, class histories, academic records) for each student"""
+    rng = random.Random(seed)
+    conducts = [grade for grade, weight in CONDUCT_WEIGHTS for _ in range(weight)]
+    for n in range(1, count + 1):
+        first_form = rng.randint(1, 4)
+        stream = rng.choice(STREAMS)
+        ability = rng.gauss(68, 12)
+        profile = StudentProfile(
+            student_id=student_id(n),
+            first_name=rng.choice(FIRST_NAMES),
+            last_name=rng.choice(LAST_NAMES),
+            date_of_birth=date(2016 - first_form, 1, 1) + timedelta(days=rng.randint(0, 364)),
+            contact_number=str(rng.randint(20000000, 99999999)),
+            current_form_class=f'{first_form + len(YEARS) - 1}{stream}',
+            current_academic_year=YEARS[-1],
+        )
+        histories = [
+            StudentClassHistory(
+                student_id=profile.student_id,
+                academic_year=year,
+                form_class=f'{first_form + i}{stream}',
+                is_current=year == YEARS[-1],
+            )
+            for i, year in enumerate(YEARS)
+        ]
+        records = [
+            AcademicRecord(
+                student_id=profile.student_id,
+                academic_year=year,
+                semester=semester,
+                conduct=rng.choice(conducts),
+                **{subject: score(rng, ability) for subject in SUBJECTS},
+            )
+            for year in YEARS for semester in SEMESTERS
+        ]
+        yield profile, histories, records
+
+
+def generate_dataset(students, seed=0, batch_size=BATCH_SIZE, stdout=None):
+    """Insert a synthetic dataset of `students` students.
+
+    Each student gets one class history row per academic year and one
+    academic record per semester. Returns {model name: rows inserted}.
+    """
+    counts = {'StudentProfile': 0, 'StudentClassHistory': 0, 'AcademicRecord': 0}
+    batch = ([], [], [])
+
+    def flush():
+        for model, rows in zip((StudentProfile, StudentClassHistory, AcademicRecord), batch):
+            model.objects.bulk_create(rows, batch_size=batch_size)
+            counts[model.__name__] += len(rows)
+            rows.clear()
+        if stdout:
+            stdout.write(f"  ... {counts['StudentProfile']} students")
+
+    with transaction.atomic():
+        for profile, histories, records in generate_students(students, seed):
+            batch[0].append(profile)
+            batch[1].extend(histories)
+            batch[2].extend(records)
+            if len(batch[2]) >= batch_size:
+                flush()
+        flush()
+        # Bulk inserts skip the signal handlers; do their work once here
+        rebuild_summaries()
+    bump_data_version()
+    return counts
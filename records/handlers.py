@@ -0,0 +1,107 @@
+import threading
+
+from django.db import connection, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import bump_data_version_on_commit
+from .models import AcademicRecord, StudentClassHistory, StudentProfile
+from .signals import post_bulk_change
+from .summaries import schedule_refresh
+
+RECORD_MODELS = (StudentProfile, StudentClassHistory, AcademicRecord)
+SEMESTERS = [semester for semester, _ in AcademicRecord.SEMESTER_CHOICES]
+
+
+# Per thread: students whose class history rows were deleted in the
+# current transaction, refreshed together on commit
+_local = threading.local()
+
+
+@receiver(post_save, sender=StudentClassHistory)
+def sync_current_class(sender, instance, **kwargs):
+    """Keep StudentProfile.current_form_class/current_academic_year in sync"""
+    StudentProfile.objects.filter(pk=instance.student_id).refresh_current_class()
+
+
+def _deleted_students():
+    if not hasattr(_local, 'deleted_students'):
+        _local.deleted_students = set()
+    return _local.deleted_students
+
+
+def refresh_deleted_students():
+    student_ids = set(_deleted_students())
+    _deleted_students().clear()
+    if student_ids:
+        StudentProfile.objects.filter(pk__in=student_ids).refresh_current_class()
+
+
+@receiver(post_delete, sender=StudentClassHistory)
+def sync_deleted_class(sender, instance, origin=None, **kwargs):
+    """Refresh the students of deleted class history rows once, on commit,
+    so deleting a queryset costs one UPDATE rather than one per row"""
+    if isinstance(origin, StudentProfile) or getattr(origin, 'model', None) is StudentProfile:
+        return  # Cascading from the profile itself, which is being deleted
+    _deleted_students().add(instance.student_id)
+    if connection.in_atomic_block and any(
+        entry[1] is refresh_deleted_students for entry in connection.run_on_commit
+    ):
+        return
+    transaction.on_commit(refresh_deleted_students)
+
+
+@receiver(post_bulk_change, sender=StudentClassHistory)
+def sync_current_classes(sender, objs=None, **kwargs):
+    students = StudentProfile.objects.all()
+    if objs is not None:
+        students = students.filter(pk__in={obj.student_id for obj in objs})
+    students.refresh_current_class()
+
+
+@receiver(post_save, sender=StudentProfile)
+@receiver(post_save, sender=StudentClassHistory)
+@receiver(post_save, sender=AcademicRecord)
+@receiver(post_delete, sender=StudentProfile)
+@receiver(post_delete, sender=StudentClassHistory)
+@receiver(post_delete, sender=AcademicRecord)
+@receiver(post_bulk_change)
+def invalidate_cached_data(sender, **kwargs):
+    """Retire everything cached through records.cache once the write commits"""
+    if sender in RECORD_MODELS:
+        bump_data_version_on_commit()
+
+
+@receiver(post_save, sender=AcademicRecord)
+@receiver(post_delete, sender=AcademicRecord)
+def refresh_record_summary(sender, instance, **kwargs):
+    """Recompute the StudentSemesterSummary partition of a changed record"""
+    schedule_refresh([(instance.academic_year, instance.semester, instance.student_id)])
+
+
+@receiver(post_save, sender=StudentClassHistory)
+@receiver(post_delete, sender=StudentClassHistory)
+def refresh_class_summaries(sender, instance, **kwargs):
+    """A class change moves the student between class rank partitions"""
+    schedule_refresh([
+        (instance.academic_year, semester, instance.student_id) for semester in SEMESTERS
+    ])
+
+
+@receiver(post_bulk_change, sender=AcademicRecord)
+def refresh_record_summaries(sender, objs=None, **kwargs):
+    if objs is None:
+        schedule_refresh([None])
+    else:
+        schedule_refresh([(obj.academic_year, obj.semester, obj.student_id) for obj in objs])
+
+
+@receiver(post_bulk_change, sender=StudentClassHistory)
+def refresh_history_summaries(sender, objs=None, **kwargs):
+    if objs is None:
+        schedule_refresh([None])
+    else:
+        schedule_refresh([
+            (obj.academic_year, semester, obj.student_id)
+            for obj in objs for semester in SEMESTERS
+        ])
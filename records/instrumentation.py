@@ -0,0 +1,160 @@
+"""Per-request SQL, template and latency statistics.
+
+RequestStatsMiddleware (records.middleware) measures a sample of requests
+and adds each measurement to a bounded window kept per URL name. The
+windows live in process memory, so with several worker processes each one
+reports its own traffic. They are read back through the stats endpoint
+(views.request_stats).
+"""
+import re
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from contextvars import ContextVar
+
+from django.conf import settings
+
+DEFAULTS = {
+    # Fraction of requests measured, 0 disables the middleware
+    'SAMPLE_RATE': 0.01,
+    # Measurements kept per URL name for the percentiles
+    'WINDOW': 1000,
+    # Same statement this many times in one request counts as N+1
+    'DUPLICATE_THRESHOLD': 5,
+    # tracemalloc slows every allocation down, so peak memory is opt-in
+    'TRACE_MEMORY': False,
+    # Requests slower than this (ms) or with duplicates are logged
+    'SLOW_REQUEST_MS': 1000,
+    # Send sampled measurements to the client in a Server-Timing header;
+    # it reveals DB time and query counts, so only for debugging
+    'SERVER_TIMING': False,
+}
+METRICS = ('total_ms', 'db_ms', 'template_ms', 'queries', 'peak_memory_kb')
+PERCENTILES = (50, 95, 99)
+
+_IN_LIST = re.compile(r'\(\s*%s(?:\s*,\s*%s)*\s*\)')
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_SPACE = re.compile(r'\s+')
+
+
+def instrumentation_settings():
+    return {**DEFAULTS, **getattr(settings, 'RECORDS_INSTRUMENTATION', {})}
+
+
+def fingerprint(sql):
+    """`sql` with literals and IN lists collapsed, so repeats compare equal"""
+    sql = _IN_LIST.sub('(...)', sql)
+    sql = _LITERAL.sub('?', sql)
+    return _SPACE.sub(' ', sql).strip()
+
+
+def percentile(ordered, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not ordered:
+        return None
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class RequestMetrics:
+    """What one sampled request did"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.total_ms = 0.0
+        self.db_ms = 0.0
+        self.template_ms = 0.0
+        self.peak_memory_kb = None
+        self.memory_baseline = 0
+        self.statements = Counter()
+        self.template_depth = 0
+
+    @property
+    def queries(self):
+        return sum(self.statements.values())
+
+    def duplicates(self, threshold):
+        return {sql: count for sql, count in self.statements.items() if count >= threshold}
+
+    def record_query(self, sql, duration):
+        self.statements[fingerprint(sql)] += 1
+        self.db_ms += duration * 1000
+
+
+# The request being measured in this thread or task, if it is sampled. The
+# context is copied into sync_to_async threads, so queries the async views
+# run on worker threads are attributed to the right request.
+current_metrics = ContextVar('records_request_metrics', default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    """Execute wrapper installed on every connection (see records.middleware)"""
+    metrics = current_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.record_query(sql, time.perf_counter() - start)
+
+
+class RequestStats:
+    """Rolling per-URL-name windows of RequestMetrics"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.samples = defaultdict(deque)
+            self.requests = Counter()
+            self.duplicates = defaultdict(Counter)
+
+    def add(self, url_name, metrics, window, threshold):
+        sample = {
+            'total_ms': metrics.total_ms,
+            'db_ms': metrics.db_ms,
+            'template_ms': metrics.template_ms,
+            'queries': metrics.queries,
+            'peak_memory_kb': metrics.peak_memory_kb,
+        }
+        with self.lock:
+            samples = self.samples[url_name]
+            if samples.maxlen != window:
+                samples = self.samples[url_name] = deque(samples, maxlen=window)
+            samples.append(sample)
+            self.requests[url_name] += 1
+            for sql in metrics.duplicates(threshold):
+                self.duplicates[url_name][sql] += 1
+
+    def summary(self):
+        with self.lock:
+            samples = {name: list(window) for name, window in self.samples.items()}
+            requests = dict(self.requests)
+            duplicates = {name: counter.most_common(10) for name, counter in self.duplicates.items()}
+
+        result = {}
+        for url_name, window in sorted(samples.items()):
+            metrics = {}
+            for metric in METRICS:
+                values = sorted(s[metric] for s in window if s[metric] is not None)
+                if values:
+                    metrics[metric] = {
+                        f'p{pct}': round(percentile(values, pct), 2) for pct in PERCENTILES
+                    }
+            result[url_name] = {
+                'sampled_requests': requests[url_name],
+                'window': len(window),
+                'metrics': metrics,
+                # Statements repeated past the threshold, with how many
+                # sampled requests repeated them
+                'duplicate_queries': [
+                    {'sql': sql, 'requests': count} for sql, count in duplicates.get(url_name, [])
+                ],
+            }
+        return result
+
+
+request_stats = RequestStats()
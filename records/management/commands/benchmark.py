@@ -0,0 +1,193 @@
+import json
+import os
+import platform
+import statistics
+import tempfile
+import time
+from datetime import datetime
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+from clean_up import delete_records, purge
+from data_manager import DataManager
+from records.cache import NO_CACHE
+from records.datagen import generate_dataset, student_id
+from records.models import DATA_MODELS, StudentProfile
+
+# (name, url) of every records view; the cache is disabled while timing
+BENCHMARK_URLS = [
+    ('student_profiles', '/profiles/'),
+    ('student_profiles:year', '/profiles/?year=2023'),
+    ('student_profiles:id_search', '/profiles/?q={student_prefix}'),
+    ('student_profiles:name_search', '/profiles/?q=Sanchez'),
+    ('academic_results', '/academic-results/'),
+    ('academic_results:class', '/academic-results/?year=2023&form_class=3A'),
+    ('student_report', '/student/{student}/'),
+    ('class_rankings', '/rankings/?year=2023&semester=1&form_class=3A'),
+    ('manage_promotions', '/promotions/'),
+    ('analytics', '/analytics/'),
+    ('analytics_api', '/api/analytics/?group_by=academic_year,semester'),
+]
+
+# Differences below this many seconds are noise, never regressions
+NOISE_FLOOR = 0.005
+
+
+class Command(BaseCommand):
+    help = (
+        'Time the records views, DataManager import/export and clean_up deletes, '
+        'write the results as JSON and compare them against a baseline'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=1000,
+                            help='Generate this many students first (0 to use existing data)')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='Timed requests per view, the median is compared')
+        parser.add_argument('--output', default='benchmark-results.json',
+                            help='Where to write the results')
+        parser.add_argument('--baseline', help='Earlier results file to compare against')
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help='Allowed slowdown against the baseline (0.25 = 25%%)')
+        parser.add_argument('--skip-data-tools', action='store_true',
+                            help='Only time the views')
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['baseline']:
+            try:
+                with open(options['baseline']) as f:
+                    baseline = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Cannot read baseline {options['baseline']}: {e}")
+
+        results = {}
+        setup_test_environment()
+        try:
+            # Everything, including generated data, is rolled back afterwards
+            with transaction.atomic():
+                if options['students']:
+                    self.stdout.write(f"Generating {options['students']} students...")
+                    generate_dataset(options['students'], seed=options['seed'])
+                if connection.vendor in ('postgresql', 'sqlite'):
+                    with connection.cursor() as cursor:
+                        cursor.execute('ANALYZE')
+                dataset = {model.__name__: model.objects.count() for model in DATA_MODELS}
+                self.bench_views(results, options['repeat'])
+                if not options['skip_data_tools']:
+                    self.bench_data_tools(results)
+                transaction.set_rollback(True)
+        finally:
+            teardown_test_environment()
+
+        report = {
+            'meta': {
+                'created': datetime.now().isoformat(timespec='seconds'),
+                'database': connection.vendor,
+                'django': django.get_version(),
+                'python': platform.python_version(),
+                'students': options['students'],
+                'seed': options['seed'],
+                'repeat': options['repeat'],
+                'dataset': dataset,
+            },
+            'results': results,
+        }
+        with open(options['output'], 'w') as f:
+            json.dump(report, f, indent=2)
+        self.stdout.write(f"Results written to {options['output']}")
+
+        if baseline is not None:
+            regressions = self.compare(results, baseline, options['tolerance'])
+            if regressions:
+                raise CommandError(f'{regressions} benchmarks regressed by more than '
+                                   f"{options['tolerance']:.0%}")
+            self.stdout.write(self.style.SUCCESS('No regressions against the baseline'))
+
+    def bench_views(self, results, repeat):
+        client = Client()
+        values = {'student': student_id(1), 'student_prefix': student_id(1)[:5]}
+        with override_settings(CACHES=NO_CACHE):
+            for name, url in BENCHMARK_URLS:
+                url = url.format(**values)
+                # One untimed request warms up imports and template loading
+                if client.get(url).status_code != 200:
+                    raise CommandError(f'{url} did not return 200')
+                timings = []
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    client.get(url)
+                    timings.append(time.perf_counter() - start)
+                self.add_result(results, f'view:{name}', timings)
+
+    def bench_data_tools(self, results):
+        """Export every table, delete it with clean_up, import it back, then purge it"""
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = {model: os.path.join(tmp, f'{model.__name__.lower()}.csv') for model in DATA_MODELS}
+            for model in DATA_MODELS:
+                dm = self.data_manager(model)
+                start = time.perf_counter()
+                rows = dm.export_file(paths[model])
+                self.add_result(results, f'export:{model.__name__}', [time.perf_counter() - start], rows)
+
+            for model in reversed(DATA_MODELS):
+                start = time.perf_counter()
+                rows = delete_records(model)
+                self.add_result(results, f'delete:{model.__name__}', [time.perf_counter() - start], rows)
+
+            for model in DATA_MODELS:
+                dm = self.data_manager(model)
+                start = time.perf_counter()
+                stats = dm.import_file(paths[model])
+                self.add_result(results, f'import:{model.__name__}', [time.perf_counter() - start],
+                                stats['inserted'])
+
+            # The fast purge mode, emptying the profiles and everything below them
+            start = time.perf_counter()
+            deleted = purge([StudentProfile])
+            self.add_result(results, 'purge:StudentProfile', [time.perf_counter() - start],
+                            sum(deleted.values()))
+
+    def data_manager(self, model):
+        dm = DataManager()
+        dm.app_name = model._meta.app_label
+        dm.Model = model
+        return dm
+
+    def add_result(self, results, name, timings, rows=None):
+        result = {
+            'median_s': statistics.median(timings),
+            'min_s': min(timings),
+            'max_s': max(timings),
+            'runs': len(timings),
+        }
+        line = f"{name:<40} {result['median_s'] * 1000:>10.1f} ms"
+        if rows is not None:
+            result['rows'] = rows
+            result['rows_per_s'] = rows / max(result['median_s'], 1e-9)
+            line += f"  {rows:>10} rows {result['rows_per_s']:>12,.0f} rows/sec"
+        results[name] = result
+        self.stdout.write(line)
+
+    def compare(self, results, baseline, tolerance):
+        """Print current vs baseline medians and return the number of regressions"""
+        regressions = 0
+        self.stdout.write(f"\n{'benchmark':<40} {'baseline':>10} {'current':>10} {'change':>8}")
+        for name, result in results.items():
+            before = baseline.get('results', {}).get(name)
+            if before is None:
+                self.stdout.write(f"{name:<40} {'-':>10} {result['median_s'] * 1000:>8.1f}ms {'new':>8}")
+                continue
+            old, new = before['median_s'], result['median_s']
+            change = new / old - 1 if old else 0
+            line = f'{name:<40} {old * 1000:>8.1f}ms {new * 1000:>8.1f}ms {change:>+8.0%}'
+            if change > tolerance and new - old > NOISE_FLOOR:
+                regressions += 1
+                line = self.style.ERROR(line + '  REGRESSION')
+            self.stdout.write(line)
+        return regressions
@@ -0,0 +1,66 @@
+import os
+import tempfile
+import time
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from data_manager import DataManager
+
+
+class Command(BaseCommand):
+    help = 'Compare COPY and ORM import/export speed on PostgreSQL'
+
+    def add_arguments(self, parser):
+        parser.add_argument('model', help='Model label, e.g. records.AcademicRecord')
+        parser.add_argument('csv_file', help='CSV file to import')
+        parser.add_argument('--repeat', type=int, default=3,
+                            help='Runs per path, the best time is reported')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('COPY benchmarks need a PostgreSQL database')
+        try:
+            Model = apps.get_model(options['model'])
+        except (LookupError, ValueError) as e:
+            raise CommandError(str(e))
+        csv_file = os.path.abspath(options['csv_file'])
+        if not os.path.exists(csv_file):
+            raise CommandError(f'File not found: {csv_file}')
+
+        self.stdout.write(f"{'path':<6} {'direction':<8} {'rows':>10} {'seconds':>9} {'rows/sec':>12}")
+        for backend in ('orm', 'copy'):
+            dm = DataManager()
+            dm.Model = Model
+            dm.backend = backend
+            rows, seconds = self.best_of(options['repeat'], lambda: self.run_import(dm, csv_file))
+            self.report(backend, 'import', rows, seconds)
+            rows, seconds = self.best_of(options['repeat'], lambda: self.run_export(dm))
+            self.report(backend, 'export', rows, seconds)
+
+    def best_of(self, repeat, run):
+        results = [run() for _ in range(repeat)]
+        return min(results, key=lambda result: result[1])
+
+    def run_import(self, dm, csv_file):
+        """Import into an emptied table, rolling everything back afterwards"""
+        with transaction.atomic():
+            dm.Model.objects.all().delete()
+            start = time.perf_counter()
+            stats = dm.import_file(csv_file)
+            seconds = time.perf_counter() - start
+            transaction.set_rollback(True)
+        return stats['inserted'], seconds
+
+    def run_export(self, dm):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'export.csv')
+            start = time.perf_counter()
+            rows = dm.export_file(path)
+            return rows, time.perf_counter() - start
+
+    def report(self, backend, direction, rows, seconds):
+        self.stdout.write(
+            f'{backend:<6} {direction:<8} {rows:>10} {seconds:>9.3f} {rows / max(seconds, 1e-9):>12,.0f}'
+        )
@@ -0,0 +1,122 @@
+import json
+import os
+import tempfile
+import time
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from clean_up import purge
+from data_manager import DataManager
+from records.datagen import generate_dataset
+from records.models import DATA_MODELS, StudentProfile
+
+
+def default_workers():
+    """1, 2, 4, ... up to the number of CPUs, which is always included"""
+    cpus = os.cpu_count() or 1
+    counts = []
+    workers = 1
+    while workers < cpus:
+        counts.append(workers)
+        workers *= 2
+    return counts + [cpus]
+
+
+class Command(BaseCommand):
+    help = (
+        'Time DataManager parsing and imports with a growing number of parsing '
+        'processes and print the scaling curve'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=5000,
+                            help='Generate this many students first (0 to use existing data)')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--workers', default=','.join(map(str, default_workers())),
+                            help='Comma separated worker counts to time (default: 1, 2, 4, ... CPUs)')
+        parser.add_argument('--backend', choices=('auto', 'orm'), default='auto')
+        parser.add_argument('--output', default='import-scaling.json',
+                            help='Where to write the results')
+
+    def handle(self, *args, **options):
+        try:
+            worker_counts = [int(count) for count in options['workers'].split(',')]
+        except ValueError:
+            raise CommandError('--workers must be comma separated numbers')
+        if any(count < 1 for count in worker_counts):
+            raise CommandError('Worker counts must be at least 1')
+
+        results = []
+        # Everything, including generated data, is rolled back afterwards
+        with tempfile.TemporaryDirectory() as tmp, transaction.atomic():
+            if options['students']:
+                self.stdout.write(f"Generating {options['students']} students...")
+                generate_dataset(options['students'], seed=options['seed'])
+            paths = []
+            for model in DATA_MODELS:
+                path = os.path.join(tmp, f'{model.__name__.lower()}.csv')
+                self.data_manager(model, options).export_file(path)
+                paths.append((model, path))
+            rows = sum(model.objects.count() for model in DATA_MODELS)
+            if not rows:
+                raise CommandError('No data to import, use --students')
+
+            self.stdout.write(f"\n{'workers':>7} {'parse rows/s':>14} {'speedup':>8} "
+                              f"{'import rows/s':>14} {'speedup':>8}")
+            for workers in worker_counts:
+                results.append(self.run(paths, rows, workers, options))
+                first, last = results[0], results[-1]
+                self.stdout.write(
+                    f"{workers:>7} {last['parse_rows_per_s']:>14,.0f} "
+                    f"{last['parse_rows_per_s'] / first['parse_rows_per_s']:>7.2f}x "
+                    f"{last['import_rows_per_s']:>14,.0f} "
+                    f"{last['import_rows_per_s'] / first['import_rows_per_s']:>7.2f}x"
+                )
+            transaction.set_rollback(True)
+
+        report = {
+            'meta': {
+                'created': datetime.now().isoformat(timespec='seconds'),
+                'database': connection.vendor,
+                'cpus': os.cpu_count(),
+                'students': options['students'],
+                'rows': rows,
+            },
+            'results': results,
+        }
+        with open(options['output'], 'w') as f:
+            json.dump(report, f, indent=2)
+        self.stdout.write(f"Results written to {options['output']}")
+
+    def data_manager(self, model, options, workers=1):
+        dm = DataManager()
+        dm.app_name = model._meta.app_label
+        dm.Model = model
+        dm.backend = options['backend']
+        dm.workers = workers
+        return dm
+
+    def run(self, paths, rows, workers, options):
+        """Parse every file, then import them all, profiles first"""
+        start = time.perf_counter()
+        for model, path in paths:
+            self.data_manager(model, options, workers).parse_file(path)
+        parse_s = time.perf_counter() - start
+
+        sid = transaction.savepoint()
+        purge([StudentProfile])
+        start = time.perf_counter()
+        for model, path in paths:
+            self.data_manager(model, options, workers).import_file(path)
+        import_s = time.perf_counter() - start
+        transaction.savepoint_rollback(sid)
+
+        return {
+            'workers': workers,
+            'parse_s': parse_s,
+            'parse_rows_per_s': rows / max(parse_s, 1e-9),
+            'import_s': import_s,
+            'import_rows_per_s': rows / max(import_s, 1e-9),
+        }
@@ -0,0 +1,124 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import (
+    CaptureQueriesContext, override_settings, setup_test_environment,
+    teardown_test_environment,
+)
+
+from records.cache import NO_CACHE
+from records.datagen import generate_dataset, student_id
+
+HOT_TABLES = (
+    'records_studentprofile',
+    'records_studentclasshistory',
+    'records_academicrecord',
+    'records_studentsemestersummary',
+)
+
+# (url, problems allowed for it). The promotions page lists every current
+# student and /analytics/ aggregates every record by design, so they are
+# not checked here.
+CHECKED_URLS = [
+    ('/profiles/', set()),
+    ('/profiles/?year=2023', set()),
+    ('/profiles/?q={student_prefix}', set()),
+    # Relevance ranking sorts the matches; without pg_trgm it also scans
+    ('/profiles/?q=Sanchez', {'sort'} if connection.vendor == 'postgresql' else {'sort', 'scan'}),
+    ('/academic-results/', set()),
+    ('/academic-results/?year=2023', set()),
+    ('/academic-results/?year=2023&form_class=3A', set()),
+    ('/student/{student}/', set()),
+    ('/rankings/', set()),
+    ('/rankings/?year=2023&semester=1&form_class=3A', set()),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'EXPLAIN the queries behind each records view and fail if a sequential '
+        'scan or sort shows up on the records tables'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=20000,
+                            help='Generate this many students first (0 to use existing data)')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--keep', action='store_true',
+                            help='Keep the generated data instead of rolling it back')
+        parser.add_argument('--verbose-plans', action='store_true',
+                            help='Print every plan, not only failing ones')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        try:
+            with transaction.atomic():
+                if options['students']:
+                    self.stdout.write(f"Generating {options['students']} students...")
+                    generate_dataset(options['students'], seed=options['seed'])
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE')
+                failures = self.check_urls(options['verbose_plans'])
+                if not options['keep']:
+                    transaction.set_rollback(True)
+        finally:
+            teardown_test_environment()
+
+        if failures:
+            raise CommandError(f'{failures} queries scan or sort a records table')
+        self.stdout.write(self.style.SUCCESS('All query plans use indexes'))
+
+    def check_urls(self, verbose):
+        client = Client()
+        failures = 0
+        values = {'student': student_id(1), 'student_prefix': student_id(1)[:5]}
+        for url, allowed in CHECKED_URLS:
+            url = url.format(**values)
+            with override_settings(CACHES=NO_CACHE), CaptureQueriesContext(connection) as queries:
+                response = client.get(url)
+            if response.status_code != 200:
+                raise CommandError(f'{url} returned {response.status_code}')
+
+            selects = [q['sql'] for q in queries.captured_queries if q['sql'].startswith('SELECT')]
+            self.stdout.write(f'{url}: {len(selects)} queries')
+            for sql in selects:
+                plan = self.explain(sql)
+                problems = [
+                    message for kind, message in self.problems(plan) if kind not in allowed
+                ]
+                if problems or verbose:
+                    self.stdout.write(f'  {sql[:200]}')
+                    for line in plan:
+                        self.stdout.write(f'    {line}')
+                if problems:
+                    failures += 1
+                    for problem in problems:
+                        self.stdout.write(self.style.ERROR(f'  -> {problem}'))
+        return failures
+
+    def explain(self, sql):
+        """Plan lines for an already interpolated query"""
+        prefix = 'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' else 'EXPLAIN '
+        with connection.cursor() as cursor:
+            cursor.execute(prefix + sql)
+            rows = cursor.fetchall()
+        return [str(row[-1]) for row in rows]
+
+    def problems(self, plan):
+        """(kind, message) for every sequential scan or sort in `plan`"""
+        tables = '|'.join(HOT_TABLES)
+        if connection.vendor == 'postgresql':
+            seq_scan = re.compile(rf'Seq Scan on ({tables})\b')
+            sort = re.compile(r'(^|->\s+)(Incremental )?Sort\b')
+        else:
+            seq_scan = re.compile(rf'^SCAN ({tables})\b(?!.*USING (COVERING )?INDEX)')
+            sort = re.compile(r'USE TEMP B-TREE FOR (ORDER BY|DISTINCT|GROUP BY)')
+        found = []
+        for line in plan:
+            if seq_scan.search(line.strip()):
+                found.append(('scan', f'sequential scan: {line.strip()}'))
+            elif sort.search(line.strip()):
+                found.append(('sort', f'sort: {line.strip()}'))
+        return found
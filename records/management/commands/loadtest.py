@@ -0,0 +1,142 @@
+import http.client
+import itertools
+import json
+import threading
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from records.datagen import student_id
+from records.instrumentation import percentile
+
+DEFAULT_PATHS = [
+    '/profiles/',
+    '/profiles/?year=2023',
+    '/academic-results/',
+    '/academic-results/?year=2023&form_class=3A',
+    f'/student/{student_id(1)}/',
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Load-test running deployments of the site, e.g. the WSGI and the ASGI '
+        'server side by side, and compare throughput and tail latency'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('targets', nargs='+', metavar='NAME=URL',
+                            help='e.g. wsgi=http://127.0.0.1:8000 asgi=http://127.0.0.1:8001')
+        parser.add_argument('--path', action='append', dest='paths',
+                            help='Path to request, repeatable (default: the read views)')
+        parser.add_argument('--concurrency', type=int, default=32,
+                            help='Concurrent keep-alive connections')
+        parser.add_argument('--duration', type=float, default=15, help='Seconds per target')
+        parser.add_argument('--warmup', type=float, default=2,
+                            help='Seconds of untimed requests before measuring')
+        parser.add_argument('--no-cache', action='store_true',
+                            help='Add a unique query parameter so the response cache never hits')
+        parser.add_argument('--output', help='Also write the results as JSON')
+
+    def handle(self, *args, **options):
+        targets = []
+        for target in options['targets']:
+            name, sep, url = target.partition('=')
+            if not sep or not urlsplit(url).hostname:
+                raise CommandError(f'Expected NAME=URL, got {target!r}')
+            targets.append((name, url))
+        paths = options['paths'] or DEFAULT_PATHS
+
+        results = {}
+        for name, url in targets:
+            self.stdout.write(f"{name}: {options['concurrency']} connections for {options['duration']:.0f}s...")
+            self.run(url, paths, options['concurrency'], options['warmup'], options['no_cache'])
+            results[name] = self.run(url, paths, options['concurrency'], options['duration'], options['no_cache'])
+        self.report(results)
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+
+    def run(self, url, paths, concurrency, duration, no_cache):
+        """Request `paths` round robin from `concurrency` threads for `duration` seconds"""
+        parts = urlsplit(url)
+        prefix = parts.path.rstrip('/')
+        counter = itertools.count()
+        deadline = time.perf_counter() + duration
+        latencies, errors = [], []
+        lock = threading.Lock()
+
+        def worker():
+            connection = None
+            mine, failed = [], 0
+            while time.perf_counter() < deadline:
+                n = next(counter)
+                path = prefix + paths[n % len(paths)]
+                if no_cache:
+                    path += f"{'&' if '?' in path else '?'}_={n}"
+                start = time.perf_counter()
+                try:
+                    if connection is None:
+                        connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+                    connection.request('GET', path)
+                    response = connection.getresponse()
+                    response.read()
+                    if response.status != 200:
+                        failed += 1
+                        continue
+                except (OSError, http.client.HTTPException):
+                    failed += 1
+                    connection = None
+                    continue
+                mine.append(time.perf_counter() - start)
+            with lock:
+                latencies.extend(mine)
+                errors.append(failed)
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        latencies.sort()
+        result = {
+            'requests': len(latencies),
+            'errors': sum(errors),
+            'seconds': elapsed,
+            'requests_per_s': len(latencies) / elapsed,
+        }
+        for pct in (50, 95, 99):
+            value = percentile(latencies, pct)
+            result[f'p{pct}_ms'] = value * 1000 if value is not None else None
+        result['max_ms'] = latencies[-1] * 1000 if latencies else None
+        return result
+
+    def report(self, results):
+        self.stdout.write(
+            f"\n{'target':<10} {'requests':>9} {'errors':>7} {'req/s':>9} "
+            f"{'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}"
+        )
+        for name, result in results.items():
+            latencies = ' '.join(
+                f'{result[key]:>9.1f}' if result[key] is not None else f"{'-':>9}"
+                for key in ('p50_ms', 'p95_ms', 'p99_ms', 'max_ms')
+            )
+            self.stdout.write(
+                f"{name:<10} {result['requests']:>9} {result['errors']:>7} "
+                f"{result['requests_per_s']:>9.1f} {latencies}"
+            )
+        if len(results) > 1:
+            (base_name, base), *others = results.items()
+            for name, result in others:
+                if base['requests_per_s'] and base['p99_ms'] and result['p99_ms']:
+                    self.stdout.write(
+                        f"{name} vs {base_name}: throughput "
+                        f"{result['requests_per_s'] / base['requests_per_s'] - 1:+.0%}, "
+                        f"p99 {result['p99_ms'] / base['p99_ms'] - 1:+.0%}"
+                    )
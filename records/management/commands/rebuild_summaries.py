@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from records.models import StudentSemesterSummary
+from records.summaries import rebuild_summaries
+
+
+class Command(BaseCommand):
+    help = 'Recompute every StudentSemesterSummary row from the academic records'
+
+    def handle(self, *args, **options):
+        rebuild_summaries()
+        self.stdout.write(f'Rebuilt {StudentSemesterSummary.objects.count()} semester summaries')
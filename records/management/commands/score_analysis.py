@@ -0,0 +1,63 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from records.analytics import SUBJECTS
+
+
+class Command(BaseCommand):
+    help = 'Subject correlations, grade bands, cohort z-scores and outliers from the NumPy score matrix'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--year', type=int, help='Academic year, e.g. 2023')
+        parser.add_argument('--semester', choices=['1', '2'])
+        parser.add_argument('--form-class')
+        parser.add_argument('--outlier-z', type=float, help='|z| from which a score is an outlier')
+        parser.add_argument('--max-outliers', type=int)
+        parser.add_argument('--json', action='store_true', help='Print the full result as JSON')
+
+    def handle(self, *args, **options):
+        try:
+            from records.score_matrix import MAX_OUTLIERS, OUTLIER_Z, score_analysis
+        except ImportError:
+            raise CommandError('Score analysis needs NumPy installed')
+
+        start = time.perf_counter()
+        analysis = score_analysis(
+            options['year'], options['semester'], options['form_class'],
+            outlier_z=options['outlier_z'] or OUTLIER_Z,
+            max_outliers=options['max_outliers'] or MAX_OUTLIERS,
+        )
+        elapsed = time.perf_counter() - start
+        if options['json']:
+            self.stdout.write(json.dumps(analysis, indent=2))
+            return
+
+        self.stdout.write(f"{analysis['count']} records in {elapsed:.3f}s")
+        if not analysis['count']:
+            return
+        self.stdout.write(f"\n{'':<12}" + ''.join(f'{subject:>12}' for subject in SUBJECTS))
+        for label in ('mean', 'stddev', 'pass_rate'):
+            self.stdout.write(f'{label:<12}' + ''.join(
+                f"{analysis['subjects'][subject][label]:>12}" for subject in SUBJECTS
+            ))
+        for band in analysis['subjects'][SUBJECTS[0]]['bands']:
+            self.stdout.write(f'band {band:<7}' + ''.join(
+                f"{analysis['subjects'][subject]['bands'][band]:>12}" for subject in SUBJECTS
+            ))
+
+        self.stdout.write('\nCorrelations')
+        if analysis['correlations'] is None:
+            self.stdout.write('Need at least 2 records')
+        for subject, row in (analysis['correlations'] or {}).items():
+            self.stdout.write(f'{subject:<12}' + ''.join(
+                f"{'-' if value is None else value:>12}" for value in row.values()
+            ))
+
+        self.stdout.write(f"\nOutliers ({len(analysis['outliers'])})")
+        for outlier in analysis['outliers']:
+            self.stdout.write(
+                f"{outlier['student_id']:<10} {outlier['form_class'] or '-':<6} "
+                f"{outlier['subject']:<12} {outlier['score']:>4} z={outlier['z']:+.2f}"
+            )
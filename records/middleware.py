@@ -0,0 +1,168 @@
+import logging
+import random
+import time
+import tracemalloc
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.base import Template
+
+from .instrumentation import (
+    current_metrics, instrumentation_settings, record_query, request_stats, RequestMetrics,
+)
+from .routers import STICKY_COOKIE, replicas, sticky_seconds
+
+logger = logging.getLogger('records.instrumentation')
+
+# Requests to these URL names are never measured
+IGNORED_URL_NAMES = {'request_stats'}
+
+
+def _timed_render(render):
+    @wraps(render)
+    def wrapper(self, context):
+        metrics = current_metrics.get()
+        if metrics is None:
+            return render(self, context)
+        # {% include %} renders nested templates, only the outermost is timed
+        metrics.template_depth += 1
+        start = time.perf_counter()
+        try:
+            return render(self, context)
+        finally:
+            metrics.template_depth -= 1
+            if not metrics.template_depth:
+                metrics.template_ms += (time.perf_counter() - start) * 1000
+    wrapper.records_timed = True
+    return wrapper
+
+
+def install_query_recorder(connection, **kwargs):
+    # Connections are per thread, so this runs for each new one; the
+    # wrapper itself does nothing unless the current request is sampled
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def url_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return '<unresolved>'
+    return match.view_name or match._func_path
+
+
+class RequestStatsMiddleware:
+    """Record query count, DB time, duplicate queries, template time and
+    (optionally) peak memory for a sample of requests.
+
+    Works under WSGI and ASGI. Only the time spent producing the response
+    is measured; the body of a streaming response is generated after the
+    middleware returns.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        if not getattr(Template.render, 'records_timed', False):
+            Template.render = _timed_render(Template.render)
+        connection_created.connect(install_query_recorder, dispatch_uid='records_query_recorder')
+        for connection in connections.all(initialized_only=True):
+            install_query_recorder(connection)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        options = instrumentation_settings()
+        if random.random() >= options['SAMPLE_RATE']:
+            return self.get_response(request)
+        metrics, token = self.start(options)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return self.finish(request, response, metrics, options)
+
+    async def __acall__(self, request):
+        options = instrumentation_settings()
+        if random.random() >= options['SAMPLE_RATE']:
+            return await self.get_response(request)
+        metrics, token = self.start(options)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return self.finish(request, response, metrics, options)
+
+    def start(self, options):
+        metrics = RequestMetrics()
+        if options['TRACE_MEMORY']:
+            # Process-wide: concurrent requests inflate each other's peak
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            metrics.memory_baseline = tracemalloc.get_traced_memory()[0]
+        return metrics, current_metrics.set(metrics)
+
+    def finish(self, request, response, metrics, options):
+        metrics.total_ms = (time.perf_counter() - metrics.started) * 1000
+        if options['TRACE_MEMORY'] and tracemalloc.is_tracing():
+            metrics.peak_memory_kb = (tracemalloc.get_traced_memory()[1] - metrics.memory_baseline) / 1024
+
+        name = url_name(request)
+        if name not in IGNORED_URL_NAMES:
+            self.record(request, name, metrics, response, options)
+        return response
+
+    def record(self, request, name, metrics, response, options):
+        threshold = options['DUPLICATE_THRESHOLD']
+        request_stats.add(name, metrics, options['WINDOW'], threshold)
+        if options['SERVER_TIMING']:
+            response['Server-Timing'] = ', '.join([
+                f'db;dur={metrics.db_ms:.1f};desc="{metrics.queries} queries"',
+                f'template;dur={metrics.template_ms:.1f}',
+                f'total;dur={metrics.total_ms:.1f}',
+            ])
+
+        duplicates = metrics.duplicates(threshold)
+        if duplicates:
+            sql, count = max(duplicates.items(), key=lambda item: item[1])
+            logger.warning(
+                'Possible N+1 on %s %s: %d queries, repeated %dx: %s',
+                request.method, request.path, metrics.queries, count, sql,
+            )
+        elif metrics.total_ms >= options['SLOW_REQUEST_MS']:
+            logger.warning(
+                'Slow request %s %s: %.0f ms, %d queries, %.0f ms in the database',
+                request.method, request.path, metrics.total_ms, metrics.queries, metrics.db_ms,
+            )
+
+
+class ReplicaStickinessMiddleware:
+    """After a write, keep the client on the primary database for
+    RECORDS_REPLICA_STICKY_SECONDS so it reads its own changes (see
+    records.routers)."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.process_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.process_response(request, await self.get_response(request))
+
+    def process_response(self, request, response):
+        if replicas() and request.method not in ('GET', 'HEAD', 'OPTIONS', 'TRACE'):
+            response.set_cookie(STICKY_COOKIE, '1', max_age=sticky_seconds(), httponly=True, samesite='Lax')
+        return response
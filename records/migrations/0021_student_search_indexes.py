@@ -0,0 +1,40 @@
+from django.db import migrations
+
+# icontains/istartswith compile to UPPER(col::text) LIKE UPPER(...) on
+# PostgreSQL, so the indexes are built on that exact expression.
+TRIGRAM_COLUMNS = ('student_id', 'first_name', 'last_name')
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for column in TRIGRAM_COLUMNS:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS records_sp_{column}_trgm '
+            f'ON records_studentprofile USING gin (UPPER({column}::text) gin_trgm_ops)'
+        )
+    # Prefix path for ID lookups (istartswith)
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS records_sp_student_id_prefix '
+        'ON records_studentprofile (UPPER(student_id::text) text_pattern_ops)'
+    )
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for column in TRIGRAM_COLUMNS:
+        schema_editor.execute(f'DROP INDEX IF EXISTS records_sp_{column}_trgm')
+    schema_editor.execute('DROP INDEX IF EXISTS records_sp_student_id_prefix')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('records', '0020_add_missing_id'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
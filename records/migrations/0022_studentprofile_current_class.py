@@ -0,0 +1,54 @@
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_current_class(apps, schema_editor):
+    StudentClassHistory = apps.get_model('records', 'StudentClassHistory')
+    StudentProfile = apps.get_model('records', 'StudentProfile')
+
+    # Only the latest is_current row per student survives the new constraint
+    StudentClassHistory.objects.filter(is_current=True).filter(
+        Exists(StudentClassHistory.objects.filter(
+            student=OuterRef('student'),
+            is_current=True,
+            academic_year__gt=OuterRef('academic_year'),
+        ))
+    ).update(is_current=False)
+
+    current = StudentClassHistory.objects.filter(
+        student=OuterRef('pk'), is_current=True
+    ).order_by()
+    StudentProfile.objects.update(
+        current_form_class=Coalesce(Subquery(current.values('form_class')[:1]), Value('')),
+        current_academic_year=Subquery(current.values('academic_year')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('records', '0021_student_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='studentprofile',
+            name='current_form_class',
+            field=models.CharField(blank=True, default='', editable=False, max_length=10),
+        ),
+        migrations.AddField(
+            model_name='studentprofile',
+            name='current_academic_year',
+            field=models.PositiveSmallIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_current_class, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='studentclasshistory',
+            constraint=models.UniqueConstraint(
+                condition=models.Q(('is_current', True)),
+                fields=('student',),
+                name='records_one_current_class_per_student',
+            ),
+        ),
+    ]
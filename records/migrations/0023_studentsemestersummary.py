@@ -0,0 +1,33 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('records', '0022_studentprofile_current_class'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentSemesterSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('academic_year', models.PositiveSmallIntegerField(choices=[(2022, '2022-2023'), (2023, '2023-2024'), (2024, '2024-2025')])),
+                ('semester', models.CharField(choices=[('1', 'First Semester'), ('2', 'Second Semester')], max_length=1)),
+                ('form_class', models.CharField(blank=True, default='', max_length=10)),
+                ('total', models.PositiveSmallIntegerField()),
+                ('average', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('class_rank', models.PositiveIntegerField()),
+                ('year_rank', models.PositiveIntegerField()),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='semester_summaries', to='records.studentprofile')),
+            ],
+            options={
+                'verbose_name': 'Semester Summary',
+                'verbose_name_plural': 'Semester Summaries',
+                'ordering': ['academic_year', 'semester', 'form_class', 'class_rank'],
+                'indexes': [models.Index(fields=['academic_year', 'semester', 'form_class', 'class_rank'], name='records_summary_class_rank'), models.Index(fields=['academic_year', 'semester', 'year_rank'], name='records_summary_year_rank')],
+                'unique_together': {('student', 'academic_year', 'semester')},
+            },
+        ),
+    ]
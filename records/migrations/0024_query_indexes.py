@@ -0,0 +1,31 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('records', '0023_studentsemestersummary'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='studentprofile',
+            index=models.Index(fields=['current_form_class'], name='records_sp_current_class'),
+        ),
+        migrations.AddIndex(
+            model_name='studentclasshistory',
+            index=models.Index(fields=['form_class', 'academic_year'], name='records_sch_class_year'),
+        ),
+        migrations.AddIndex(
+            model_name='studentclasshistory',
+            index=models.Index(fields=['academic_year', 'form_class'], name='records_sch_year_class'),
+        ),
+        migrations.AddIndex(
+            model_name='academicrecord',
+            index=models.Index(fields=['student', 'academic_year', 'semester'], name='records_ar_student_term'),
+        ),
+        migrations.AddIndex(
+            model_name='academicrecord',
+            index=models.Index(fields=['academic_year', 'student', 'semester'], name='records_ar_year_student'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('records', '0024_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='academicrecord',
+            name=name,
+            field=models.PositiveSmallIntegerField(
+                default=0, validators=[django.core.validators.MaxValueValidator(100)]
+            ),
+        )
+        for name in ('Chinese', 'English', 'Mathematics', 'Science')
+    ]
@@ -0,0 +1,33 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('records', '0025_score_range'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=100)),
+                ('file_path', models.CharField(max_length=500)),
+                ('file_hash', models.CharField(max_length=64)),
+                ('file_size', models.BigIntegerField()),
+                ('merge', models.BooleanField(default=False)),
+                ('status', models.CharField(choices=[('running', 'Running'), ('failed', 'Failed'), ('finished', 'Finished')], default='running', max_length=10)),
+                ('byte_offset', models.BigIntegerField(default=0)),
+                ('line', models.BigIntegerField(default=1)),
+                ('stats', models.JSONField(default=dict)),
+                ('error', models.TextField(blank=True, default='')),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['-started_at'],
+                'indexes': [models.Index(fields=['file_path', 'model'], name='records_importjob_file')],
+            },
+        ),
+    ]
@@ -1,4 +1,22 @@
+from django.core.validators import MaxValueValidator
 from django.db import models
+from django.db.models import OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+class StudentProfileQuerySet(models.QuerySet):
+    def refresh_current_class(self):
+        """Copy each student's is_current class history row onto the profile"""
+        current = StudentClassHistory.objects.filter(
+            student=OuterRef('pk'), is_current=True
+        ).order_by()
+        return self.update(
+            current_form_class=Coalesce(
+                Subquery(current.values('form_class')[:1]), Value('')
+            ),
+            current_academic_year=Subquery(current.values('academic_year')[:1]),
+        )
+
 
 class StudentProfile(models.Model):
     student_id = models.CharField(max_length=20, primary_key=True)
@@ -6,10 +24,27 @@ class StudentProfile(models.Model):
     last_name = models.CharField(max_length=100)
     date_of_birth = models.DateField()
     contact_number = models.CharField(max_length=15) 
+    # Denormalised from the is_current StudentClassHistory row, kept in sync
+    # by records.handlers; read these instead of joining class_history
+    current_form_class = models.CharField(max_length=10, blank=True, default='', editable=False)
+    current_academic_year = models.PositiveSmallIntegerField(null=True, blank=True, editable=False)
+
+    objects = StudentProfileQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Admin current class filter and the promotions page
+            models.Index(fields=['current_form_class'], name='records_sp_current_class'),
+        ]
     
     def __str__(self):
         return f"{self.first_name} {self.last_name}"
 
+    def current_year_display(self):
+        if self.current_academic_year is None:
+            return ''
+        return f"{self.current_academic_year}-{self.current_academic_year + 1}"
+
 
 class StudentClassHistory(models.Model):
     ACADEMIC_YEAR_CHOICES = [
@@ -32,6 +67,19 @@ class StudentClassHistory(models.Model):
         unique_together = ('student', 'academic_year')
         ordering = ['student', '-academic_year']
         get_latest_by = 'academic_year'
+        constraints = [
+            # Also serves every is_current=True lookup as a partial index
+            models.UniqueConstraint(
+                fields=['student'], condition=Q(is_current=True),
+                name='records_one_current_class_per_student',
+            ),
+        ]
+        indexes = [
+            # form_class filters/choices, and the year-matched class join
+            models.Index(fields=['form_class', 'academic_year'], name='records_sch_class_year'),
+            # year_choices
+            models.Index(fields=['academic_year', 'form_class'], name='records_sch_year_class'),
+        ]
 
     def __str__(self):
         return f"{self.student} - {self.academic_year}: {self.form_class} {'(Current)' if self.is_current else ''}"
@@ -67,15 +115,21 @@ class AcademicRecord(models.Model):
         choices=ACADEMIC_YEAR_CHOICES
     )
     semester = models.CharField(max_length=1, choices=SEMESTER_CHOICES)
-    Chinese = models.PositiveSmallIntegerField(default=0)  # Score out of 100
-    English = models.PositiveSmallIntegerField(default=0)  # Score out of 100
-    Mathematics = models.PositiveSmallIntegerField(default=0)  # Score out of 100
-    Science = models.PositiveSmallIntegerField(default=0)
+    Chinese = models.PositiveSmallIntegerField(default=0, validators=[MaxValueValidator(100)])  # Score out of 100
+    English = models.PositiveSmallIntegerField(default=0, validators=[MaxValueValidator(100)])  # Score out of 100
+    Mathematics = models.PositiveSmallIntegerField(default=0, validators=[MaxValueValidator(100)])  # Score out of 100
+    Science = models.PositiveSmallIntegerField(default=0, validators=[MaxValueValidator(100)])
     conduct = models.CharField(max_length=1, choices=CONDUCT_CHOICES)
 
     class Meta:
         unique_together = ('student', 'semester', 'academic_year')
         ordering = ['student', 'academic_year', 'semester']
+        indexes = [
+            # Keyset order of academic_results and per-student reports
+            models.Index(fields=['student', 'academic_year', 'semester'], name='records_ar_student_term'),
+            # Year filters in keyset order, year_choices and per-semester aggregates
+            models.Index(fields=['academic_year', 'student', 'semester'], name='records_ar_year_student'),
+        ]
         verbose_name = 'Academic Record'
         verbose_name_plural = 'Academic Records'
     
@@ -84,3 +138,86 @@ class AcademicRecord(models.Model):
 
     def academic_year_display(self):
         return f"{self.academic_year}-{self.academic_year + 1}"    
+
+
+# The student data, in import order; deletes run the other way round
+DATA_MODELS = (StudentProfile, StudentClassHistory, AcademicRecord)
+
+
+class StudentSemesterSummary(models.Model):
+    """Per student and semester totals and ranks.
+
+    Derived from AcademicRecord and kept up to date by records.summaries;
+    never edit these rows by hand.
+    """
+    student = models.ForeignKey(StudentProfile, on_delete=models.CASCADE,
+                            related_name='semester_summaries',
+                            to_field='student_id')
+    academic_year = models.PositiveSmallIntegerField(
+        choices=AcademicRecord.ACADEMIC_YEAR_CHOICES
+    )
+    semester = models.CharField(max_length=1, choices=AcademicRecord.SEMESTER_CHOICES)
+    # Class for that academic year, blank if the student had no class history
+    form_class = models.CharField(max_length=10, blank=True, default='')
+    total = models.PositiveSmallIntegerField()
+    average = models.DecimalField(max_digits=5, decimal_places=2)
+    class_rank = models.PositiveIntegerField()
+    year_rank = models.PositiveIntegerField()
+
+    class Meta:
+        unique_together = ('student', 'academic_year', 'semester')
+        ordering = ['academic_year', 'semester', 'form_class', 'class_rank']
+        indexes = [
+            models.Index(fields=['academic_year', 'semester', 'form_class', 'class_rank'],
+                         name='records_summary_class_rank'),
+            models.Index(fields=['academic_year', 'semester', 'year_rank'],
+                         name='records_summary_year_rank'),
+        ]
+        verbose_name = 'Semester Summary'
+        verbose_name_plural = 'Semester Summaries'
+
+    def __str__(self):
+        return f"{self.student_id} - Semester {self.semester} ({self.academic_year}): {self.total}"
+
+    def academic_year_display(self):
+        return f"{self.academic_year}-{self.academic_year + 1}"
+
+
+class ImportJob(models.Model):
+    """One data_manager.py import of a CSV file.
+
+    Checkpointed in the same transaction as every chunk the import commits,
+    so byte_offset/line always point just past the last committed row and
+    an interrupted import can be resumed from there (--resume).
+    """
+    RUNNING = 'running'
+    FAILED = 'failed'
+    FINISHED = 'finished'
+    STATUS_CHOICES = [
+        (RUNNING, 'Running'),
+        (FAILED, 'Failed'),
+        (FINISHED, 'Finished'),
+    ]
+
+    model = models.CharField(max_length=100)  # Model label, e.g. records.AcademicRecord
+    file_path = models.CharField(max_length=500)
+    file_hash = models.CharField(max_length=64)  # SHA-256 of the whole file
+    file_size = models.BigIntegerField()
+    merge = models.BooleanField(default=False)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=RUNNING)
+    byte_offset = models.BigIntegerField(default=0)
+    line = models.BigIntegerField(default=1)
+    # inserted/updated/unchanged/duplicate/skipped counts so far
+    stats = models.JSONField(default=dict)
+    error = models.TextField(blank=True, default='')
+    started_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-started_at']
+        indexes = [
+            models.Index(fields=['file_path', 'model'], name='records_importjob_file'),
+        ]
+
+    def __str__(self):
+        return f"{self.model} from {self.file_path} ({self.get_status_display()})"
@@ -0,0 +1,155 @@
+"""Keyset (cursor) pagination for the records list views.
+
+Pages are addressed by the ordering values of the row at the edge of the
+previous page instead of an OFFSET, so the database can seek straight to
+page N through an index and every page costs the same as the first one.
+"""
+import base64
+import binascii
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def get_page_size(request):
+    """Page size from ?page_size=, falling back to settings.RECORDS_PAGE_SIZE"""
+    default = getattr(settings, 'RECORDS_PAGE_SIZE', DEFAULT_PAGE_SIZE)
+    try:
+        size = int(request.GET.get('page_size', default))
+    except (TypeError, ValueError):
+        size = default
+    return max(1, min(size, getattr(settings, 'RECORDS_MAX_PAGE_SIZE', MAX_PAGE_SIZE)))
+
+
+def encode_cursor(values):
+    data = json.dumps(list(values), separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+
+def decode_cursor(token, length):
+    """Decode a cursor, returning None for anything malformed"""
+    if not token:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+    except (ValueError, binascii.Error):
+        return None
+    if not isinstance(values, list) or len(values) != length:
+        return None
+    return values
+
+
+def keyset_filter(ordering, values, reverse=False):
+    """Q matching rows after `values` in `ordering` (before them if `reverse`).
+
+    For ordering (a, b, c) this is the expanded form of the row comparison
+    (a, b, c) > (x, y, z), which also handles mixed ASC/DESC keys.
+    """
+    condition = Q()
+    for i, field in enumerate(ordering):
+        name = field.lstrip('-')
+        descending = field.startswith('-')
+        lookup = 'lt' if descending != reverse else 'gt'
+        term = Q(**{f'{name}__{lookup}': values[i]})
+        for previous, value in zip(ordering[:i], values):
+            term &= Q(**{previous.lstrip('-'): value})
+        condition |= term
+    return condition
+
+
+def seek(queryset, ordering, values, reverse=False):
+    """`queryset` filtered with keyset_filter(), or None when the cursor
+    values don't fit the fields (a tampered cursor)"""
+    try:
+        return queryset.filter(keyset_filter(ordering, values, reverse))
+    except (TypeError, ValueError, ValidationError):
+        return None
+
+
+def reverse_ordering(ordering):
+    return [field[1:] if field.startswith('-') else f'-{field}' for field in ordering]
+
+
+def cursor_values(obj, ordering):
+    values = []
+    for field in ordering:
+        value = obj
+        for part in field.lstrip('-').split('__'):
+            value = getattr(value, part)
+        values.append(value)
+    return values
+
+
+class KeysetPage:
+    def __init__(self, request, object_list, ordering, has_next, has_previous):
+        self.object_list = object_list
+        self.has_next = has_next and bool(object_list)
+        self.has_previous = has_previous and bool(object_list)
+        self.next_query = self.previous_query = ''
+        if self.has_next:
+            self.next_query = self._query(request, 'after', cursor_values(object_list[-1], ordering))
+        if self.has_previous:
+            self.previous_query = self._query(request, 'before', cursor_values(object_list[0], ordering))
+
+    def _query(self, request, direction, values):
+        """Current query string with the cursor swapped for a new one"""
+        query = request.GET.copy()
+        query.pop('after', None)
+        query.pop('before', None)
+        query[direction] = encode_cursor(values)
+        return query.urlencode()
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def page_queryset(request, queryset, ordering):
+    """The sliced queryset for the requested page, and how to read its rows.
+
+    Returns (queryset, size, before, after); pass the evaluated rows on to
+    build_page(). This split lets async views evaluate the page
+    themselves (see records.async_views).
+    """
+    size = get_page_size(request)
+    before = decode_cursor(request.GET.get('before'), len(ordering))
+    after = decode_cursor(request.GET.get('after'), len(ordering))
+
+    # Cursors whose values don't fit the fields are ignored like malformed ones
+    if before is not None:
+        seeking = seek(queryset, ordering, before, reverse=True)
+        if seeking is not None:
+            return seeking.order_by(*reverse_ordering(ordering))[:size + 1], size, before, after
+        before = None
+    if after is not None:
+        seeking = seek(queryset, ordering, after)
+        if seeking is not None:
+            queryset = seeking
+        else:
+            after = None
+    return queryset.order_by(*ordering)[:size + 1], size, before, after
+
+
+def build_page(request, rows, ordering, size, before, after):
+    if before is not None:
+        has_previous = len(rows) > size
+        return KeysetPage(request, rows[:size][::-1], ordering, True, has_previous)
+    return KeysetPage(request, rows[:size], ordering, len(rows) > size, after is not None)
+
+
+def paginate(request, queryset, ordering):
+    """Return the KeysetPage selected by ?after= / ?before= for `queryset`.
+
+    `ordering` must make rows unique (end it with a unique key) and its
+    values must be JSON serialisable.
+    """
+    queryset, size, before, after = page_queryset(request, queryset, ordering)
+    return build_page(request, list(queryset), ordering, size, before, after)
+
@@ -0,0 +1,144 @@
+"""Cohort promotions.
+
+Suggestions for every student come from one query on the denormalised
+StudentProfile.current_form_class, and a whole cohort is applied in one
+transaction: a single UPDATE retires the current classes, a single
+bulk_create writes the new ones and one more UPDATE refreshes the
+profiles' current class columns.
+"""
+import re
+from collections import namedtuple
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import StudentClassHistory, StudentProfile
+from .signals import post_bulk_change
+
+# Leading form number plus the stream, e.g. 3A -> (3, 'A')
+FORM_CLASS_PATTERN = re.compile(r'^(\d+)(.*)$')
+DEFAULT_FINAL_FORM = 6
+
+Promotion = namedtuple(
+    'Promotion', 'student_id name from_class from_year to_class action'
+)
+
+
+def suggest_next_class(form_class):
+    """Next class for `form_class` (3A -> 4A); None after the final form"""
+    match = FORM_CLASS_PATTERN.match(form_class or '')
+    if not match:
+        return None
+    form = int(match.group(1)) + 1
+    if form > getattr(settings, 'RECORDS_FINAL_FORM', DEFAULT_FINAL_FORM):
+        return None
+    return f'{form}{match.group(2)}'
+
+
+def current_students():
+    """Students with a current class, read from the denormalised profile columns"""
+    return StudentProfile.objects.exclude(current_form_class='').order_by('student_id')
+
+
+def suggest_promotions():
+    """(student, suggested next class) for every student with a current class"""
+    return [
+        (student, suggest_next_class(student.current_form_class))
+        for student in current_students()
+    ]
+
+
+def parse_assignments(data):
+    """{student_id: new_class} from new_class_<student_id> form fields"""
+    return {
+        key[len('new_class_'):]: value.strip()
+        for key, value in data.items()
+        if key.startswith('new_class_') and value.strip()
+    }
+
+
+class PromotionPlan:
+    """Validated changes for one promotion, safe to show as a dry run"""
+
+    def __init__(self, to_year, promotions, unknown):
+        self.to_year = to_year
+        self.promotions = promotions
+        self.unknown = unknown
+
+    def __len__(self):
+        return len(self.promotions)
+
+    def __iter__(self):
+        return iter(self.promotions)
+
+    @property
+    def created(self):
+        return sum(1 for p in self.promotions if p.action == 'create')
+
+    @property
+    def updated(self):
+        return sum(1 for p in self.promotions if p.action == 'update')
+
+
+def plan_promotions(to_year, assignments):
+    """Work out what applying `assignments` for `to_year` would change.
+
+    Uses two queries whatever the cohort size and writes nothing.
+    """
+    names = {}
+    current = {}
+    for student_id, first, last, form_class, year in StudentProfile.objects.filter(
+        pk__in=assignments
+    ).values_list(
+        'student_id', 'first_name', 'last_name', 'current_form_class', 'current_academic_year'
+    ):
+        names[student_id] = f'{first} {last}'
+        if form_class:
+            current[student_id] = (form_class, year)
+    existing = set(
+        StudentClassHistory.objects.filter(
+            student_id__in=names, academic_year=to_year
+        ).values_list('student_id', flat=True)
+    )
+
+    promotions = [
+        Promotion(
+            student_id, names[student_id],
+            *current.get(student_id, (None, None)),
+            to_class=new_class,
+            action='update' if student_id in existing else 'create',
+        )
+        for student_id, new_class in sorted(assignments.items())
+        if student_id in names
+    ]
+    unknown = sorted(set(assignments) - set(names))
+    return PromotionPlan(to_year, promotions, unknown)
+
+
+def apply_promotions(plan):
+    """Apply a PromotionPlan atomically and return the number of students"""
+    if not plan.promotions:
+        return 0
+    student_ids = [p.student_id for p in plan]
+    with transaction.atomic():
+        StudentClassHistory.objects.filter(
+            student_id__in=student_ids, is_current=True
+        ).exclude(academic_year=plan.to_year).update(is_current=False)
+        # Re-running a promotion for the same year updates the class instead
+        promoted = StudentClassHistory.objects.bulk_create(
+            [
+                StudentClassHistory(
+                    student_id=p.student_id,
+                    academic_year=plan.to_year,
+                    form_class=p.to_class,
+                    is_current=True,
+                )
+                for p in plan
+            ],
+            update_conflicts=True,
+            unique_fields=['student', 'academic_year'],
+            update_fields=['form_class', 'is_current'],
+        )
+        # Refreshes the students' current class columns
+        post_bulk_change.send(sender=StudentClassHistory, objs=promoted)
+    return len(student_ids)
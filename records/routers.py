@@ -0,0 +1,177 @@
+"""Primary/replica routing for the read-only views.
+
+Only views decorated with @use_replica read from a replica; everything
+else (admin, promotions, DataManager, management commands) reads and
+writes the primary. Replicas are the DATABASES aliases listed in
+settings.RECORDS_REPLICAS. A request is kept on the primary when:
+
+* it is not a GET/HEAD,
+* the client wrote something within RECORDS_REPLICA_STICKY_SECONDS
+  (ReplicaStickinessMiddleware sets a cookie after every write), so
+  users always see their own changes,
+* no replica passed its health check in the last RECORDS_REPLICA_HEALTH_TTL
+  seconds (it could not connect, or on PostgreSQL it lagged more than
+  RECORDS_REPLICA_MAX_LAG seconds behind).
+"""
+import contextvars
+import random
+import threading
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+STICKY_COOKIE = 'records_primary'
+DEFAULT_STICKY_SECONDS = 15
+DEFAULT_HEALTH_TTL = 5
+DEFAULT_MAX_LAG = 30
+
+
+class ReadRouting:
+    """Replica choice for one request; made on its first read so every
+    query of the request sees the same replica"""
+
+    def __init__(self):
+        self.alias = None
+
+    def read_alias(self):
+        if self.alias is None:
+            self.alias = choose_replica()
+        return self.alias
+
+
+# Set while a @use_replica view runs
+read_routing = contextvars.ContextVar('records_read_routing', default=None)
+
+
+def replicas():
+    return getattr(settings, 'RECORDS_REPLICAS', [])
+
+
+def sticky_seconds():
+    return getattr(settings, 'RECORDS_REPLICA_STICKY_SECONDS', DEFAULT_STICKY_SECONDS)
+
+
+def max_lag():
+    return getattr(settings, 'RECORDS_REPLICA_MAX_LAG', DEFAULT_MAX_LAG)
+
+
+class ReplicaHealth:
+    """Per-process cache of replica health checks"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checked = {}
+
+    def is_healthy(self, alias):
+        ttl = getattr(settings, 'RECORDS_REPLICA_HEALTH_TTL', DEFAULT_HEALTH_TTL)
+        now = time.monotonic()
+        with self.lock:
+            checked = self.checked.get(alias)
+        if checked and now - checked[0] < ttl:
+            return checked[1]
+        healthy = self.check(alias)
+        with self.lock:
+            self.checked[alias] = (now, healthy)
+        return healthy
+
+    def check(self, alias):
+        connection = connections[alias]
+        try:
+            with connection.cursor() as cursor:
+                if connection.vendor == 'postgresql':
+                    # NULL on a primary, or on a replica that replayed nothing yet
+                    cursor.execute(
+                        'SELECT EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())'
+                    )
+                    lag = cursor.fetchone()[0]
+                    return lag is None or lag <= max_lag()
+                cursor.execute('SELECT 1')
+            return True
+        except DatabaseError:
+            return False
+
+    def reset(self):
+        with self.lock:
+            self.checked.clear()
+
+
+replica_health = ReplicaHealth()
+
+
+def choose_replica():
+    """A random healthy replica alias, or the primary if there is none"""
+    healthy = [alias for alias in replicas() if replica_health.is_healthy(alias)]
+    return random.choice(healthy) if healthy else DEFAULT_DB_ALIAS
+
+
+def reading_from_replica():
+    routing = read_routing.get()
+    return routing is not None and routing.alias not in (None, DEFAULT_DB_ALIAS)
+
+
+def wants_replica(request):
+    return (
+        bool(replicas())
+        and request.method in ('GET', 'HEAD')
+        and STICKY_COOKIE not in request.COOKIES
+    )
+
+
+def _bind_streaming(response, context):
+    """Generate a streaming body in `context`, after the view has returned"""
+    content = iter(response.streaming_content)
+
+    def generate():
+        while True:
+            try:
+                yield context.run(next, content)
+            except StopIteration:
+                return
+    response.streaming_content = generate()
+
+
+def use_replica(view):
+    """Let `view` read from a replica; it must not write"""
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            if not wants_replica(request):
+                return await view(request, *args, **kwargs)
+            token = read_routing.set(ReadRouting())
+            try:
+                return await view(request, *args, **kwargs)
+            finally:
+                read_routing.reset(token)
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not wants_replica(request):
+            return view(request, *args, **kwargs)
+        token = read_routing.set(ReadRouting())
+        try:
+            response = view(request, *args, **kwargs)
+            if response.streaming:
+                _bind_streaming(response, contextvars.copy_context())
+            return response
+        finally:
+            read_routing.reset(token)
+    return wrapper
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        routing = read_routing.get()
+        if routing is None:
+            return DEFAULT_DB_ALIAS
+        return routing.read_alias()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
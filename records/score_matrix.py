@@ -0,0 +1,223 @@
+"""Score analytics over a NumPy matrix of the four subject scores.
+
+load_matrix() reads one (academic_year, semester) slice of AcademicRecord
+in a single values_list pass into an (n, 4) array, alongside the student
+ids and the form class of each row. Slices are kept in memory, per
+process, under the records data version, so any record change invalidates
+them; only the version comes from the shared cache, the arrays are never
+pickled. Everything
+in score_analysis() is then vectorised over that array; filtering by
+form class is a boolean mask, not another query.
+
+NumPy is an optional dependency: importing this module raises
+ImportError without it.
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from django.db.models import OuterRef, Subquery
+
+from .analytics import GRADE_BANDS, PASS_MARK, PERCENTILES, SUBJECTS
+from .cache import data_version
+from .models import AcademicRecord, StudentClassHistory
+
+# Rows converted to arrays at a time while loading
+LOAD_CHUNK_SIZE = 50000
+# |z| within the form class from which a score counts as an outlier
+OUTLIER_Z = 2.5
+MAX_OUTLIERS = 50
+# Slices kept in memory per process, least recently used dropped first
+MEMO_SIZE = 8
+
+# Upper band edges for np.digitize, lowest band first
+_BAND_EDGES = np.array(sorted(low for _, low, _ in GRADE_BANDS)[1:])
+_BANDS_ASCENDING = [band for band, _, _ in sorted(GRADE_BANDS, key=lambda band: band[1])]
+
+# (academic_year, semester) -> (data version, ScoreMatrix)
+_memo = OrderedDict()
+_memo_lock = threading.Lock()
+
+
+class ScoreMatrix:
+    """Scores of one slice: `scores` is (n, len(SUBJECTS)), one row per
+    record, with `student_ids` and `form_classes` aligned to it"""
+
+    def __init__(self, scores, student_ids, form_classes):
+        self.scores = scores
+        self.student_ids = student_ids
+        self.form_classes = form_classes
+
+    def __len__(self):
+        return len(self.scores)
+
+    def select(self, mask):
+        return ScoreMatrix(self.scores[mask], self.student_ids[mask], self.form_classes[mask])
+
+
+def _query(academic_year, semester):
+    form_class = StudentClassHistory.objects.filter(
+        student=OuterRef('student'), academic_year=OuterRef('academic_year')
+    ).values('form_class')[:1]
+    records = AcademicRecord.objects.annotate(matrix_form_class=Subquery(form_class))
+    if academic_year:
+        records = records.filter(academic_year=academic_year)
+    if semester:
+        records = records.filter(semester=semester)
+    return records.order_by().values_list('student_id', 'matrix_form_class', *SUBJECTS)
+
+
+def _build_matrix(academic_year, semester):
+    scores, student_ids, form_classes = [], [], []
+    chunk = []
+
+    def flush():
+        if chunk:
+            ids, classes, *columns = zip(*chunk)
+            scores.append(np.column_stack(columns).astype(np.float64))
+            student_ids.append(np.array(ids, dtype=str))
+            form_classes.append(np.array([c or '' for c in classes], dtype=str))
+            chunk.clear()
+
+    for row in _query(academic_year, semester).iterator(chunk_size=LOAD_CHUNK_SIZE):
+        chunk.append(row)
+        if len(chunk) >= LOAD_CHUNK_SIZE:
+            flush()
+    flush()
+
+    if not scores:
+        return ScoreMatrix(np.empty((0, len(SUBJECTS))), np.array([], dtype=str), np.array([], dtype=str))
+    return ScoreMatrix(np.concatenate(scores), np.concatenate(student_ids), np.concatenate(form_classes))
+
+
+def load_matrix(academic_year=None, semester=None):
+    """The ScoreMatrix for one (academic_year, semester), kept until the records change"""
+    version = data_version()
+    if version is None:
+        # The records cache is switched off
+        return _build_matrix(academic_year, semester)
+    key = (academic_year, semester)
+    with _memo_lock:
+        memo = _memo.get(key)
+        if memo is not None and memo[0] == version:
+            _memo.move_to_end(key)
+            return memo[1]
+    matrix = _build_matrix(academic_year, semester)
+    with _memo_lock:
+        _memo[key] = (version, matrix)
+        _memo.move_to_end(key)
+        while len(_memo) > MEMO_SIZE:
+            _memo.popitem(last=False)
+    return matrix
+
+
+def correlations(scores):
+    """Pearson correlation between every pair of subjects"""
+    if len(scores) < 2:
+        return None
+    with np.errstate(invalid='ignore', divide='ignore'):
+        matrix = np.corrcoef(scores, rowvar=False)
+    return {
+        subject: {other: _round(matrix[i, j], 4) for j, other in enumerate(SUBJECTS)}
+        for i, subject in enumerate(SUBJECTS)
+    }
+
+
+def cohort_zscores(matrix):
+    """(z-scores, {form class: (means, stddevs)}) with each score standardised
+    against its form class; scores in a class with no spread get z = 0"""
+    classes, inverse = np.unique(matrix.form_classes, return_inverse=True)
+    counts = np.bincount(inverse, minlength=len(classes)).astype(np.float64)[:, None]
+
+    def group_sums(values):
+        return np.column_stack([
+            np.bincount(inverse, weights=values[:, i], minlength=len(classes))
+            for i in range(values.shape[1])
+        ])
+
+    means = group_sums(matrix.scores) / counts
+    deviations = matrix.scores - means[inverse]
+    stddevs = np.sqrt(group_sums(deviations ** 2) / counts)
+
+    spread = stddevs[inverse]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        zscores = np.where(spread > 0, deviations / spread, 0.0)
+    return zscores, {form_class: (means[i], stddevs[i]) for i, form_class in enumerate(classes)}
+
+
+def grade_distribution(scores):
+    """{subject: {band: count}} using the analytics GRADE_BANDS"""
+    bands = np.digitize(scores, _BAND_EDGES)
+    return {
+        subject: dict(zip(
+            _BANDS_ASCENDING[::-1],
+            np.bincount(bands[:, i], minlength=len(_BANDS_ASCENDING))[::-1].tolist(),
+        ))
+        for i, subject in enumerate(SUBJECTS)
+    }
+
+
+def outliers(matrix, zscores, threshold=OUTLIER_Z, limit=MAX_OUTLIERS):
+    """The `limit` scores furthest from their class mean, past `threshold`"""
+    rows, columns = np.nonzero(np.abs(zscores) >= threshold)
+    order = np.argsort(-np.abs(zscores[rows, columns]), kind='stable')[:limit]
+    return [
+        {
+            'student_id': str(matrix.student_ids[row]),
+            'form_class': str(matrix.form_classes[row]) or None,
+            'subject': SUBJECTS[column],
+            'score': int(matrix.scores[row, column]),
+            'z': _round(zscores[row, column], 2),
+        }
+        for row, column in zip(rows[order], columns[order])
+    ]
+
+
+def score_analysis(academic_year=None, semester=None, form_class=None,
+                   outlier_z=OUTLIER_Z, max_outliers=MAX_OUTLIERS):
+    """Correlations, distributions, cohort statistics and outliers for a filter"""
+    matrix = load_matrix(academic_year, semester)
+    if form_class:
+        matrix = matrix.select(matrix.form_classes == form_class)
+    scores = matrix.scores
+    result = {
+        'count': len(matrix),
+        'subjects': {},
+        'correlations': correlations(scores),
+        'cohorts': {},
+        'outliers': [],
+    }
+    if not len(matrix):
+        return result
+
+    means = scores.mean(axis=0)
+    stddevs = scores.std(axis=0)
+    percentiles = np.percentile(scores, PERCENTILES, axis=0)
+    passed = (scores >= PASS_MARK).sum(axis=0)
+    bands = grade_distribution(scores)
+    for i, subject in enumerate(SUBJECTS):
+        result['subjects'][subject] = {
+            'mean': _round(means[i], 2),
+            'stddev': _round(stddevs[i], 2),
+            'min': int(scores[:, i].min()),
+            'max': int(scores[:, i].max()),
+            'pass_rate': _round(passed[i] / len(matrix), 4),
+            'percentiles': {f'p{p}': _round(percentiles[j, i], 2) for j, p in enumerate(PERCENTILES)},
+            'bands': bands[subject],
+        }
+
+    zscores, cohorts = cohort_zscores(matrix)
+    result['cohorts'] = {
+        form_class or 'No class': {
+            subject: {'mean': _round(cohort_means[i], 2), 'stddev': _round(cohort_stddevs[i], 2)}
+            for i, subject in enumerate(SUBJECTS)
+        }
+        for form_class, (cohort_means, cohort_stddevs) in cohorts.items()
+    }
+    result['outliers'] = outliers(matrix, zscores, outlier_z, max_outliers)
+    return result
+
+
+def _round(value, digits):
+    value = float(value)
+    return None if np.isnan(value) else round(value, digits)
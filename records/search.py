@@ -0,0 +1,80 @@
+"""Student name and ID search.
+
+Every filter here is an icontains/istartswith on StudentProfile columns.
+On PostgreSQL those are served by the trigram GIN and pattern indexes
+created in migration 0021 and results are ranked by trigram similarity.
+Other databases run the same filters unindexed and rank by match type.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.db.models.functions import Concat, Greatest
+
+# Letters followed by digits, e.g. S0001 or S00: matched as an ID prefix
+ID_PREFIX_PATTERN = re.compile(r'^[A-Za-z]+\d+$')
+
+
+def is_id_prefix(query):
+    return bool(ID_PREFIX_PATTERN.match(query))
+
+
+def search_filter(query, prefix=''):
+    """Q matching students for `query`; `prefix` reaches StudentProfile via a relation.
+
+    ID-like queries use a prefix match on student_id. Anything else must
+    match every word in the student ID, first name or last name.
+    """
+    query = query.strip()
+    if is_id_prefix(query):
+        return Q(**{f'{prefix}student_id__istartswith': query})
+    condition = Q()
+    for term in query.split():
+        condition &= (
+            Q(**{f'{prefix}student_id__icontains': term}) |
+            name_filter(term, prefix)
+        )
+    return condition
+
+
+def name_filter(term, prefix=''):
+    """Q matching `term` inside a first or last name"""
+    return (
+        Q(**{f'{prefix}first_name__icontains': term}) |
+        Q(**{f'{prefix}last_name__icontains': term})
+    )
+
+
+def relevance(query):
+    """Expression scoring how well a StudentProfile row matches `query`"""
+    if connection.vendor == 'postgresql':
+        from django.contrib.postgres.search import TrigramSimilarity
+
+        return Greatest(
+            TrigramSimilarity('student_id', query),
+            TrigramSimilarity('first_name', query),
+            TrigramSimilarity('last_name', query),
+            TrigramSimilarity(Concat('first_name', Value(' '), 'last_name'), query),
+        )
+    return Case(
+        When(Q(student_id__iexact=query) | Q(first_name__iexact=query) |
+             Q(last_name__iexact=query), then=Value(3)),
+        When(Q(first_name__istartswith=query) | Q(last_name__istartswith=query),
+             then=Value(2)),
+        default=Value(1),
+        output_field=IntegerField(),
+    )
+
+
+def search_students(queryset, query):
+    """Filter a StudentProfile queryset by `query`.
+
+    Returns (queryset, ordering); the ordering is unique, so it can be
+    used for keyset pagination. ID prefix lookups are ordered by ID, and
+    everything else by relevance.
+    """
+    query = query.strip()
+    queryset = queryset.filter(search_filter(query))
+    if is_id_prefix(query):
+        return queryset, ['student_id']
+    return queryset.annotate(rank=relevance(query)), ['-rank', 'student_id']
@@ -0,0 +1,6 @@
+from django.dispatch import Signal
+
+# Sent after rows are written in bulk (bulk_create, update(), COPY), which
+# bypasses post_save. `sender` is the model class and `objs` the instances
+# that changed, or None when anything in the table may have changed.
+post_bulk_change = Signal()
@@ -0,0 +1,257 @@
+"""Maintenance of StudentSemesterSummary.
+
+A summary row holds one student's total, average and ranks for one
+semester. Its inputs are the AcademicRecord row itself, the student's
+class for that year and every other total in the same partition. So a
+change only recomputes the (academic_year, semester, form_class)
+partitions it touches, plus one pass over that semester's year ranks.
+Ranks use the RANK() window function, or the same ranking in Python on
+databases without window functions.
+
+Changes are refreshed once per transaction, on commit. Bulk imports
+commit every chunk, so they defer the refresh to the end of the file
+(deferred_refresh), and a large set of changes re-derives whole
+semesters instead of partitions.
+"""
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Exists, F, OuterRef, Subquery, Value, Window
+from django.db.models.functions import Coalesce, Rank
+
+from .analytics import SUBJECTS
+from .cache import bump_data_version_on_commit
+from .models import AcademicRecord, StudentClassHistory, StudentSemesterSummary
+
+# Per thread: (academic_year, semester, student_id) triples waiting for
+# commit, and how many deferred_refresh() blocks are open
+_local = threading.local()
+
+# More changes than this refresh every semester they touch in full
+TERM_REFRESH_CHANGES = 5000
+
+
+def semester_totals(academic_year, semester, form_classes=None):
+    """(student_id, form_class, total, class_rank) for one semester"""
+    year_class = StudentClassHistory.objects.filter(
+        student=OuterRef('student'), academic_year=OuterRef('academic_year')
+    ).order_by().values('form_class')[:1]
+    total = F(SUBJECTS[0])
+    for subject in SUBJECTS[1:]:
+        total = total + F(subject)
+
+    records = AcademicRecord.objects.filter(
+        academic_year=academic_year, semester=semester
+    ).annotate(
+        form_class=Coalesce(Subquery(year_class), Value('')),
+        total=total,
+    ).order_by()
+    if form_classes is not None:
+        records = records.filter(form_class__in=form_classes)
+
+    if connection.features.supports_over_clause:
+        records = records.annotate(class_rank=Window(
+            Rank(), partition_by=[F('form_class')], order_by=F('total').desc()
+        ))
+        return list(records.values_list('student_id', 'form_class', 'total', 'class_rank'))
+    rows = list(records.values_list('student_id', 'form_class', 'total'))
+    ranks = rank_by_total(rows, partition=lambda row: row[1], total=lambda row: row[2])
+    return [row + (rank,) for row, rank in zip(rows, ranks)]
+
+
+def rank_by_total(rows, partition, total):
+    """SQL RANK() over (PARTITION BY partition ORDER BY total DESC), in Python"""
+    groups = defaultdict(list)
+    for i, row in enumerate(rows):
+        groups[partition(row)].append(i)
+    ranks = [None] * len(rows)
+    for indexes in groups.values():
+        indexes.sort(key=lambda i: -total(rows[i]))
+        for position, i in enumerate(indexes, 1):
+            previous = indexes[position - 2] if position > 1 else None
+            if previous is not None and total(rows[previous]) == total(rows[i]):
+                ranks[i] = ranks[previous]
+            else:
+                ranks[i] = position
+    return ranks
+
+
+def refresh_semester(academic_year, semester, form_classes=None):
+    """Recompute the summaries of some (or all) classes in one semester"""
+    rows = semester_totals(academic_year, semester, form_classes)
+    with transaction.atomic():
+        stale = StudentSemesterSummary.objects.filter(
+            academic_year=academic_year, semester=semester
+        )
+        if form_classes is not None:
+            # Also drop rows of students who have moved into these classes
+            stale = stale.filter(form_class__in=form_classes) | stale.filter(
+                student_id__in=[row[0] for row in rows]
+            )
+        stale.delete()
+        StudentSemesterSummary.objects.bulk_create([
+            StudentSemesterSummary(
+                student_id=student_id,
+                academic_year=academic_year,
+                semester=semester,
+                form_class=form_class,
+                total=total,
+                average=(Decimal(total) / len(SUBJECTS)).quantize(Decimal('0.01')),
+                class_rank=class_rank,
+                year_rank=0,
+            )
+            for student_id, form_class, total, class_rank in rows
+        ])
+        refresh_year_ranks(academic_year, semester)
+
+
+def supports_update_from():
+    """Whether UPDATE ... FROM (subquery) works: PostgreSQL and SQLite 3.33+"""
+    if connection.vendor == 'sqlite':
+        return connection.Database.sqlite_version_info >= (3, 33)
+    return connection.vendor == 'postgresql'
+
+
+def refresh_year_ranks(academic_year, semester):
+    """Re-rank a semester across all classes, writing only ranks that moved"""
+    if supports_update_from():
+        # One statement, without reading the semester into Python
+        qn = connection.ops.quote_name
+        opts = StudentSemesterSummary._meta
+        table, pk = qn(opts.db_table), qn(opts.pk.column)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {table} SET year_rank = ranked.rank FROM ('
+                f'SELECT {pk}, RANK() OVER (ORDER BY total DESC) AS rank FROM {table} '
+                f'WHERE academic_year = %s AND semester = %s'
+                f') AS ranked WHERE {table}.{pk} = ranked.{pk} AND {table}.year_rank <> ranked.rank',
+                [academic_year, semester],
+            )
+        return
+
+    summaries = StudentSemesterSummary.objects.filter(
+        academic_year=academic_year, semester=semester
+    ).order_by()
+    if connection.features.supports_over_clause:
+        rows = list(summaries.annotate(
+            rank=Window(Rank(), order_by=F('total').desc())
+        ).values_list('pk', 'year_rank', 'rank'))
+    else:
+        rows = list(summaries.values_list('pk', 'year_rank', 'total'))
+        ranks = rank_by_total(rows, partition=lambda row: None, total=lambda row: row[2])
+        rows = [(pk, year_rank, rank) for (pk, year_rank, _), rank in zip(rows, ranks)]
+    moved = [
+        StudentSemesterSummary(pk=pk, year_rank=rank)
+        for pk, year_rank, rank in rows if year_rank != rank
+    ]
+    StudentSemesterSummary.objects.bulk_update(moved, ['year_rank'], batch_size=1000)
+
+
+def refresh_students(changes):
+    """Refresh the partitions touched by (academic_year, semester, student_id) changes"""
+    # Summaries left without a record, e.g. after a record moved semester
+    orphans = StudentSemesterSummary.objects.filter(
+        student_id__in={student_id for _, _, student_id in changes}
+    ).exclude(Exists(AcademicRecord.objects.filter(
+        student=OuterRef('student'),
+        academic_year=OuterRef('academic_year'),
+        semester=OuterRef('semester'),
+    ))).values_list('academic_year', 'semester', 'student_id')
+
+    students_by_term = defaultdict(set)
+    for academic_year, semester, student_id in set(changes) | set(orphans):
+        students_by_term[(academic_year, semester)].add(student_id)
+
+    for (academic_year, semester), student_ids in students_by_term.items():
+        # Both the classes the students are in now and the ones their
+        # existing summaries were filed under
+        classes = dict(StudentClassHistory.objects.filter(
+            academic_year=academic_year, student_id__in=student_ids
+        ).values_list('student_id', 'form_class'))
+        form_classes = set(classes.values()) | set(
+            StudentSemesterSummary.objects.filter(
+                academic_year=academic_year, semester=semester, student_id__in=student_ids
+            ).values_list('form_class', flat=True)
+        )
+        if student_ids - set(classes):
+            form_classes.add('')
+        refresh_semester(academic_year, semester, form_classes)
+
+
+def refresh_terms(terms):
+    """Recompute whole (academic_year, semester) terms"""
+    for academic_year, semester in sorted(terms):
+        refresh_semester(academic_year, semester)
+
+
+def rebuild_summaries():
+    """Recompute every summary from scratch"""
+    with transaction.atomic():
+        StudentSemesterSummary.objects.all().delete()
+        terms = AcademicRecord.objects.order_by(
+            'academic_year', 'semester'
+        ).values_list('academic_year', 'semester').distinct()
+        for academic_year, semester in terms:
+            refresh_semester(academic_year, semester)
+
+
+def _pending():
+    if not hasattr(_local, 'pending'):
+        _local.pending = set()
+    return _local.pending
+
+
+def pop_pending():
+    """Take the changes queued in this thread, e.g. to hand them to another"""
+    changes = set(_pending())
+    _pending().clear()
+    return changes
+
+
+def flush_pending():
+    changes = pop_pending()
+    if None in changes:
+        rebuild_summaries()
+    elif len(changes) > TERM_REFRESH_CHANGES:
+        refresh_terms({(academic_year, semester) for academic_year, semester, _ in changes})
+    elif changes:
+        refresh_students(changes)
+    if changes:
+        # The records' own bump ran first; pages cached in between hold
+        # the old summaries
+        bump_data_version_on_commit()
+
+
+def schedule_refresh(changes):
+    """Queue (academic_year, semester, student_id) changes until commit.
+
+    A None entry stands for a change of unknown extent and rebuilds
+    everything. All changes made in one transaction are refreshed
+    together, once; inside deferred_refresh() they wait for its end.
+    """
+    _pending().update(changes)
+    if getattr(_local, 'deferred', 0):
+        return
+    if connection.in_atomic_block and any(
+        entry[1] is flush_pending for entry in connection.run_on_commit
+    ):
+        return
+    transaction.on_commit(flush_pending)
+
+
+@contextmanager
+def deferred_refresh():
+    """Refresh everything scheduled inside the block once, when it ends
+    (on commit if a transaction is still open), instead of after every
+    transaction it commits. Also runs if the block fails, for what it
+    committed."""
+    _local.deferred = getattr(_local, 'deferred', 0) + 1
+    try:
+        yield
+    finally:
+        _local.deferred -= 1
+        if not _local.deferred and _pending():
+            schedule_refresh(())
@@ -0,0 +1,97 @@
+"""Data version bumps retiring cached pages and analytics (user-010)"""
+import io
+import os
+import tempfile
+from contextlib import redirect_stdout
+from datetime import date
+
+from django.db import transaction
+from django.test import TransactionTestCase, override_settings
+
+from data_manager import DataManager
+from records.cache import data_version, records_cache
+from records.datagen import generate_dataset
+from records.models import AcademicRecord, StudentProfile
+from records.signals import post_bulk_change
+
+LOCMEM = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'records': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'records-cache'},
+}
+
+
+@override_settings(CACHES=LOCMEM, RECORDS_REPLICAS=[])
+class DataVersionTests(TransactionTestCase):
+    """Commits are real here, so the on_commit bumps run as in production"""
+
+    def setUp(self):
+        records_cache().clear()
+        generate_dataset(3)
+
+    def get(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def assertRecomputed(self, url, write):
+        self.get(url)
+        self.assertEqual(self.get(url)['X-Records-Cache'], 'hit')
+        version = data_version()
+        write()
+        self.assertNotEqual(data_version(), version)
+        response = self.get(url)
+        self.assertEqual(response['X-Records-Cache'], 'miss')
+        return response
+
+    def test_orm_save(self):
+        student = StudentProfile.objects.order_by('pk').first()
+
+        def write():
+            student.last_name = 'Renamed'
+            student.save()
+        response = self.assertRecomputed(f'/profiles/?q={student.pk}', write)
+        self.assertContains(response, 'Renamed')
+
+    def test_bulk_create_with_post_bulk_change(self):
+        def write():
+            with transaction.atomic():
+                created = StudentProfile.objects.bulk_create([StudentProfile(
+                    student_id='NEW1', first_name='Bulk', last_name='Created',
+                    date_of_birth=date(2012, 1, 1), contact_number='12345678',
+                )])
+                post_bulk_change.send(sender=StudentProfile, objs=created)
+        response = self.assertRecomputed('/profiles/?q=NEW1', write)
+        self.assertContains(response, 'NEW1')
+
+    def test_data_manager_import(self):
+        dm = DataManager()
+        dm.Model = AcademicRecord
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'records.csv')
+            dm.export_file(path)
+            with open(path) as f:
+                lines = f.readlines()
+            header = lines[0].rstrip('\n').split(',')
+            row = lines[1].rstrip('\n').split(',')
+            row[header.index('Chinese')] = '0' if row[header.index('Chinese')] != '0' else '1'
+            with open(path, 'w') as f:
+                f.writelines([lines[0], ','.join(row) + '\n'])
+
+            def write():
+                with redirect_stdout(io.StringIO()):
+                    stats = dm.import_file(path, merge=True)
+                self.assertEqual(stats['updated'], 1)
+            url = '/api/analytics/?group_by=academic_year,semester'
+            before = self.get(url).json()
+            self.assertRecomputed('/academic-results/', write)
+
+        # The analytics payload is recomputed, not served from the cache
+        self.assertNotEqual(self.get(url).json(), before)
+
+    def test_rolled_back_write_keeps_the_version(self):
+        version = data_version()
+        with transaction.atomic():
+            StudentProfile.objects.update(last_name='Rolled back')
+            post_bulk_change.send(sender=StudentProfile, objs=None)
+            transaction.set_rollback(True)
+        self.assertEqual(data_version(), version)
@@ -0,0 +1,88 @@
+"""clean_up.py purges (user-018)"""
+import io
+from contextlib import redirect_stdout
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from clean_up import count_rows, parse_args, purge, purge_order, run
+from records.cache import NO_CACHE
+from records.datagen import generate_dataset
+from records.models import DATA_MODELS, AcademicRecord, StudentClassHistory, StudentProfile
+from records.signals import post_bulk_change
+
+
+@override_settings(CACHES=NO_CACHE)
+class PurgeTests(TestCase):
+    def setUp(self):
+        generate_dataset(3)
+
+    def run_clean_up(self, *argv):
+        with redirect_stdout(io.StringIO()) as out:
+            code = run(parse_args(argv))
+        return code, out.getvalue()
+
+    def test_dependents_come_first(self):
+        ordered = purge_order([StudentProfile])
+        self.assertEqual(ordered[-1], StudentProfile)
+        self.assertLess(ordered.index(AcademicRecord), ordered.index(StudentProfile))
+        self.assertLess(ordered.index(StudentClassHistory), ordered.index(StudentProfile))
+        self.assertEqual(purge_order([AcademicRecord]), [AcademicRecord])
+
+    def test_count_rows_in_one_query(self):
+        with self.assertNumQueries(1):
+            counts = count_rows(DATA_MODELS)
+        self.assertEqual(counts, {StudentProfile: 3, StudentClassHistory: 9, AcademicRecord: 18})
+        self.assertEqual(count_rows([]), {})
+
+    def test_purge_in_batches(self):
+        receiver = mock.Mock()
+        post_bulk_change.connect(receiver)
+        self.addCleanup(post_bulk_change.disconnect, receiver)
+
+        # Batches of 4 rows, so every table takes several DELETEs
+        deleted = purge([StudentProfile], batch_size=4)
+
+        self.assertEqual(
+            {model: deleted[model] for model in DATA_MODELS},
+            {StudentProfile: 3, StudentClassHistory: 9, AcademicRecord: 18},
+        )
+        self.assertFalse(any(count_rows(list(deleted)).values()))
+        self.assertEqual({call.kwargs['sender'] for call in receiver.call_args_list}, set(deleted))
+        self.assertTrue(all(call.kwargs['objs'] is None for call in receiver.call_args_list))
+
+    def test_purge_leaves_other_models(self):
+        purge([AcademicRecord])
+        self.assertEqual(count_rows(DATA_MODELS), {StudentProfile: 3, StudentClassHistory: 9, AcademicRecord: 0})
+
+    def test_dry_run_deletes_nothing(self):
+        code, out = self.run_clean_up('--model', 'records.StudentProfile', '--purge', '--dry-run')
+        self.assertEqual(code, 0)
+        self.assertIn('records.AcademicRecord', out)
+        self.assertEqual(StudentProfile.objects.count(), 3)
+
+    def test_purge_from_the_command_line(self):
+        code, out = self.run_clean_up('--model', 'records.StudentClassHistory', '--purge', '--yes')
+        self.assertEqual(code, 0)
+        self.assertIn('Deleted 9 records from 1 tables', out)
+        self.assertFalse(StudentClassHistory.objects.exists())
+        # Profiles lose the class they were showing
+        self.assertFalse(StudentProfile.objects.exclude(current_form_class='').exists())
+
+    def test_delete_without_purge_refreshes_profiles_once(self):
+        with CaptureQueriesContext(connection) as queries, \
+                self.captureOnCommitCallbacks(execute=True):
+            code, out = self.run_clean_up('--model', 'records.StudentClassHistory', '--yes')
+
+        self.assertEqual(code, 0)
+        self.assertIn('Deleted 9 records from 1 tables', out)
+        profile_updates = [q for q in queries if q['sql'].startswith('UPDATE "records_studentprofile"')]
+        self.assertEqual(len(profile_updates), 1)
+        self.assertFalse(StudentProfile.objects.exclude(current_form_class='').exists())
+
+    def test_unknown_model(self):
+        code, out = self.run_clean_up('--model', 'records.Missing', '--yes')
+        self.assertEqual(code, 1)
+        self.assertIn('Error: ', out)
@@ -0,0 +1,459 @@
+"""DataManager imports: validation, constraints, merges, resume and batches"""
+import csv
+import gzip
+import io
+import os
+import tempfile
+from contextlib import redirect_stdout
+from datetime import date
+from unittest import mock, skipUnless
+
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+
+import data_manager
+from data_manager import (
+    DataManager, ImportFileError, ImportSource, batch_entries, field_converter, import_batch, import_levels,
+    parse_args, run, run_batch, split_ranges,
+)
+from records.cache import NO_CACHE
+from records.datagen import generate_dataset
+from records.models import DATA_MODELS, AcademicRecord, ImportJob, StudentClassHistory, StudentProfile
+
+
+@override_settings(CACHES=NO_CACHE)
+class ImportTestCase(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = tmp.name
+
+    def write_csv(self, name, header, rows):
+        path = os.path.join(self.tmp, name)
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            writer.writerows(rows)
+        return path
+
+    def data_manager(self, model):
+        dm = DataManager()
+        dm.app_name = model._meta.app_label
+        dm.Model = model
+        return dm
+
+    def import_file(self, model, path, **kwargs):
+        with redirect_stdout(io.StringIO()):
+            return self.data_manager(model).import_file(path, **kwargs)
+
+    def error_rows(self, model, path):
+        with open(self.data_manager(model).error_report_path(path), newline='') as f:
+            return list(csv.DictReader(f))
+
+    def create_students(self, *student_ids):
+        StudentProfile.objects.bulk_create(
+            StudentProfile(student_id=student_id, first_name='First', last_name='Last',
+                           date_of_birth=date(2012, 1, 1), contact_number='12345678')
+            for student_id in student_ids
+        )
+
+
+CREATED = '2025-04-10 11:46:06+00:00'
+
+
+class ExportTests(ImportTestCase):
+    """Streamed exports (user-002)"""
+
+    def test_command_line_export_reports_throughput(self):
+        generate_dataset(2)
+        path = os.path.join(self.tmp, 'records.csv.gz')
+        with redirect_stdout(io.StringIO()) as out:
+            code = run(parse_args(['--model', 'records.AcademicRecord', '--export', path]))
+
+        self.assertEqual(code, 0)
+        self.assertRegex(out.getvalue(), rf'^Exported 12 records to {path} in [\d.]+s \([\d,]+ rows/sec\)')
+        with gzip.open(path, 'rt', newline='') as f:
+            self.assertEqual(len(list(csv.DictReader(f))), 12)
+
+
+class ConversionTests(ImportTestCase):
+    """Per-column converters and the error report (user-021)"""
+    HEADER = ['student', 'id', 'academic_year', 'semester', 'Chinese', 'English', 'Mathematics', 'Science', 'conduct']
+
+    def converter(self, model, name):
+        return field_converter(model._meta.get_field(name))
+
+    def assertRejects(self, convert, value, message):
+        with self.assertRaisesMessage(ValueError, message):
+            convert(value)
+
+    def test_choices(self):
+        year = self.converter(AcademicRecord, 'academic_year')
+        self.assertEqual(year('2023'), 2023)
+        self.assertRejects(year, '2030', "'2030' is not one of 2022, 2023, 2024")
+        self.assertRejects(year, '2023.0', "'2023.0' is not one of")
+        semester = self.converter(AcademicRecord, 'semester')
+        self.assertEqual(semester('2'), '2')
+        self.assertRejects(semester, '3', "'3' is not one of 1, 2")
+
+    def test_score_bounds(self):
+        score = self.converter(AcademicRecord, 'Mathematics')
+        self.assertEqual([score('0'), score('100')], [0, 100])
+        self.assertRejects(score, '101', '101 is outside 0-100')
+        self.assertRejects(score, '-1', '-1 is outside 0-100')
+        self.assertRejects(score, 'A+', "'A+' is not an integer")
+
+    def test_dates(self):
+        birth = self.converter(StudentProfile, 'date_of_birth')
+        self.assertEqual(birth('2012-02-29'), date(2012, 2, 29))
+        for value in ('2013-02-29', '29/02/2012', ''):
+            self.assertRejects(birth, value, f"'{value}' is not a YYYY-MM-DD date")
+
+    def test_text_length_and_booleans(self):
+        self.assertRejects(self.converter(StudentProfile, 'contact_number'), '1' * 16,
+                           'is longer than 15 characters')
+        current = self.converter(StudentClassHistory, 'is_current')
+        self.assertEqual([current('true'), current('0')], [True, False])
+        self.assertRejects(current, 'yes', "'yes' is not a boolean")
+
+    def test_error_report_rows(self):
+        self.create_students('S1')
+        path = self.write_csv('records.csv', self.HEADER, [
+            ['S1', 1, 2023, 1, 70, 80, 90, 60, 'A'],
+            ['S1', 2, 2030, 3, 70, 80, 101, 60, 'A'],
+            ['S9', 3, 2023, 2, 70, 80, 90, 60, 'A'],
+            ['S1', 4, 2024, 1, 70],
+        ])
+        stats = self.import_file(AcademicRecord, path)
+
+        self.assertEqual((stats['inserted'], stats['skipped']), (1, 3))
+        errors = self.error_rows(AcademicRecord, path)
+        self.assertEqual([row['line'] for row in errors], ['3', '4', '5'])
+        self.assertEqual(errors[0]['errors'], "academic_year: '2030' is not one of 2022, 2023, 2024; "
+                                              "semester: '3' is not one of 1, 2; "
+                                              "Mathematics: 101 is outside 0-100")
+        self.assertEqual(errors[1]['errors'], "student: StudentProfile 'S9' not found")
+        self.assertIn('expected 9 columns', errors[2]['errors'])
+        # The rejected row follows, as it was read, ready to be fixed and imported again
+        self.assertEqual([errors[0][name] for name in self.HEADER],
+                         ['S1', '2', '2030', '3', '70', '80', '101', '60', 'A'])
+
+
+class CurrentClassImportTests(ImportTestCase):
+    """One is_current class history row per student (user-008)"""
+    HEADER = ['student', 'academic_year', 'form_class', 'created_at', 'is_current']
+
+    def setUp(self):
+        super().setUp()
+        self.create_students('S1', 'S2')
+
+    def test_second_current_row_in_file_is_rejected(self):
+        path = self.write_csv('history.csv', self.HEADER, [
+            ['S1', 2023, '1A', CREATED, 'True'],
+            ['S1', 2024, '2A', CREATED, 'True'],
+            ['S2', 2024, '2B', CREATED, 'True'],
+        ])
+        stats = self.import_file(StudentClassHistory, path)
+
+        self.assertEqual(stats['inserted'], 2)
+        self.assertEqual(stats['skipped'], 1)
+        [error] = self.error_rows(StudentClassHistory, path)
+        self.assertEqual(error['line'], '3')
+        self.assertIn("student 'S1' already has a row with is_current=True on line 2", error['errors'])
+        self.assertEqual(StudentProfile.objects.get(pk='S1').current_form_class, '1A')
+
+    def test_imported_current_row_replaces_existing_one(self):
+        StudentClassHistory.objects.create(student_id='S1', academic_year=2023, form_class='1A', is_current=True)
+        path = self.write_csv('history.csv', self.HEADER, [['S1', 2024, '2A', CREATED, 'True']])
+        stats = self.import_file(StudentClassHistory, path)
+
+        self.assertEqual(stats['inserted'], 1)
+        self.assertEqual(
+            list(StudentClassHistory.objects.filter(student='S1', is_current=True).values_list('academic_year', flat=True)),
+            [2024],
+        )
+        self.assertEqual(StudentProfile.objects.get(pk='S1').current_form_class, '2A')
+
+    def test_merge_moves_current_row(self):
+        StudentClassHistory.objects.create(student_id='S1', academic_year=2023, form_class='1A', is_current=True)
+        path = self.write_csv('history.csv', self.HEADER, [
+            ['S1', 2024, '2A', CREATED, 'True'],
+            ['S1', 2023, '1A', CREATED, 'False'],
+        ])
+        stats = self.import_file(StudentClassHistory, path, merge=True)
+
+        self.assertEqual((stats['inserted'], stats['updated'], stats['skipped']), (1, 1, 0))
+        self.assertEqual(
+            dict(StudentClassHistory.objects.filter(student='S1').values_list('academic_year', 'is_current')),
+            {2023: False, 2024: True},
+        )
+
+    def test_merge_duplicate_of_current_row_is_not_a_clash(self):
+        path = self.write_csv('history.csv', self.HEADER, [
+            ['S1', 2024, '2A', CREATED, 'True'],
+            ['S1', 2024, '2B', CREATED, 'True'],
+        ])
+        stats = self.import_file(StudentClassHistory, path, merge=True)
+
+        self.assertEqual((stats['inserted'], stats['duplicate'], stats['skipped']), (1, 1, 0))
+        self.assertEqual(StudentClassHistory.objects.get(student='S1').form_class, '2B')
+
+
+class MergeImportTests(ImportTestCase):
+    """Upserts on the natural key (user-004)"""
+
+    def setUp(self):
+        super().setUp()
+        generate_dataset(2)
+        self.path = os.path.join(self.tmp, 'records.csv')
+        self.data_manager(AcademicRecord).export_file(self.path)
+        with open(self.path, newline='') as f:
+            self.rows = list(csv.DictReader(f))
+
+    def rewrite(self, rows):
+        return self.write_csv('records.csv', list(rows[0]), [row.values() for row in rows])
+
+    def test_unchanged_file_changes_nothing(self):
+        stats = self.import_file(AcademicRecord, self.path, merge=True)
+        self.assertEqual((stats['inserted'], stats['updated'], stats['unchanged']), (0, 0, 12))
+
+    def test_counts_inserted_updated_and_duplicate_rows(self):
+        changed = self.rows[0]
+        changed['Chinese'] = str((int(changed['Chinese']) + 1) % 100)
+        AcademicRecord.objects.filter(pk=self.rows[1]['id']).delete()
+        # The second copy of the last row supersedes the first
+        duplicate = {**self.rows[-1], 'conduct': 'C' if self.rows[-1]['conduct'] != 'C' else 'A'}
+        self.rewrite([*self.rows, duplicate])
+
+        # Two rows to a chunk, so the duplicate lands in a later chunk
+        with mock.patch.object(DataManager.iter_chunks, '__defaults__', (2,)):
+            stats = self.import_file(AcademicRecord, self.path, merge=True)
+
+        self.assertEqual(
+            (stats['inserted'], stats['updated'], stats['unchanged'], stats['duplicate'], stats['skipped']),
+            (1, 2, 10, 0, 0),
+        )
+        self.assertTrue(AcademicRecord.objects.filter(pk=self.rows[1]['id']).exists())
+        record = AcademicRecord.objects.get(pk=changed['id'])
+        self.assertEqual(record.Chinese, int(changed['Chinese']))
+        self.assertEqual(AcademicRecord.objects.get(pk=self.rows[-1]['id']).conduct, duplicate['conduct'])
+        self.assertEqual(AcademicRecord.objects.count(), 12)
+
+    def test_duplicates_within_a_chunk_keep_the_last_row(self):
+        last = self.rows[-1]
+        self.rewrite([*self.rows, {**last, 'English': '0'}, {**last, 'English': '1'}])
+        stats = self.import_file(AcademicRecord, self.path, merge=True)
+
+        self.assertEqual((stats['updated'], stats['duplicate']), (1, 2))
+        self.assertEqual(AcademicRecord.objects.get(pk=last['id']).English, 1)
+
+
+class ResumeImportTests(ImportTestCase):
+    """Checkpointed imports resumed after a failure (user-022)"""
+
+    def setUp(self):
+        super().setUp()
+        generate_dataset(2)
+        path = os.path.join(self.tmp, 'export.csv')
+        self.data_manager(AcademicRecord).export_file(path)
+        with open(path, newline='') as f:
+            rows = list(csv.reader(f))
+        # An invalid row in the first chunk, to check the error report survives
+        rows.insert(2, [*rows[1][:-1], 'Z'])
+        self.path = self.write_csv('records.csv', rows[0], rows[1:])
+        AcademicRecord.objects.all().delete()
+
+    def fail_third_chunk(self):
+        checkpoint = DataManager.checkpoint
+        calls = []
+
+        def fail(dm, *args):
+            calls.append(args)
+            if len(calls) == 3:
+                raise RuntimeError('connection lost')
+            checkpoint(dm, *args)
+        return mock.patch.object(DataManager, 'checkpoint', fail)
+
+    def test_resume_continues_after_the_last_checkpoint(self):
+        with mock.patch.object(DataManager.iter_chunks, '__defaults__', (3,)):
+            with self.fail_third_chunk(), self.assertRaisesMessage(RuntimeError, 'connection lost'):
+                self.import_file(AcademicRecord, self.path)
+
+            job = ImportJob.objects.get()
+            self.assertEqual((job.status, job.line, job.stats), (ImportJob.FAILED, 7, {'inserted': 5, 'skipped': 1}))
+            self.assertEqual(job.error, 'RuntimeError: connection lost')
+            self.assertEqual(AcademicRecord.objects.count(), 5)
+
+            stats = self.import_file(AcademicRecord, self.path, resume=True)
+
+        self.assertEqual((stats['inserted'], stats['skipped']), (12, 1))
+        self.assertEqual(AcademicRecord.objects.count(), 12)
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImportJob.FINISHED)
+        self.assertEqual(job.byte_offset, os.path.getsize(self.path))
+        self.assertEqual([row['line'] for row in self.error_rows(AcademicRecord, self.path)], ['3'])
+
+    def test_resume_needs_an_unfinished_job(self):
+        with self.assertRaisesMessage(ImportFileError, 'No unfinished import'):
+            self.import_file(AcademicRecord, self.path, resume=True)
+        self.import_file(AcademicRecord, self.path)
+        with self.assertRaisesMessage(ImportFileError, 'No unfinished import'):
+            self.import_file(AcademicRecord, self.path, resume=True)
+
+    def test_changed_file_is_not_resumed(self):
+        with mock.patch.object(DataManager.iter_chunks, '__defaults__', (3,)), \
+                self.fail_third_chunk(), self.assertRaises(RuntimeError):
+            self.import_file(AcademicRecord, self.path)
+        with open(self.path, 'a') as f:
+            f.write('\n')
+        with self.assertRaisesMessage(ImportFileError, 'changed since import job'):
+            self.import_file(AcademicRecord, self.path, resume=True)
+
+
+class ParallelImportTests(ImportTestCase):
+    """Byte ranges for the parsing workers (user-023)"""
+    HEADER = ['student_id', 'first_name', 'last_name', 'date_of_birth', 'contact_number']
+
+    def setUp(self):
+        super().setUp()
+        # Quoted newlines, some after an escaped quote, in every other row
+        self.rows = [
+            [f'S{i}', f'Line one\n"{i}" "" line two\n' if i % 2 else f'Ann {i}', 'Lee', '2012-01-01', '12345678']
+            for i in range(20)
+        ]
+        self.path = self.write_csv('students.csv', self.HEADER, self.rows)
+        with ImportSource(self.path) as source:
+            self.offset = source.offset
+            self.expected = list(source)
+
+    def test_ranges_never_split_a_quoted_field(self):
+        for size in (1, 7, 64, 10 ** 6):
+            with self.subTest(size=size):
+                ranges = list(split_ranges(self.path, self.offset, 1, size))
+                self.assertEqual(ranges[0][0], self.offset)
+                self.assertEqual(ranges[-1][1], os.path.getsize(self.path))
+                parsed = []
+                for (start, end, line), following in zip(ranges, [*ranges[1:], None]):
+                    if following:
+                        self.assertEqual(end, following[0])
+                    with ImportSource(self.path, start, line, end) as source:
+                        parsed.extend(source)
+                # Same rows and line numbers as reading the file in one go
+                self.assertEqual(parsed, self.expected)
+
+    def test_ranges_from_a_checkpoint(self):
+        _, row = self.expected[4]
+        line, _ = self.expected[3]
+        with ImportSource(self.path) as source:
+            for _ in zip(range(4), source):
+                pass
+            offset = source.offset
+        start, _, range_line = next(split_ranges(self.path, offset, line, 1))
+        with ImportSource(self.path, start, range_line) as source:
+            self.assertEqual(next(iter(source))[1], row)
+        self.assertEqual(list(split_ranges(self.path, os.path.getsize(self.path), 99)), [])
+
+    def test_import_with_workers(self):
+        dm = self.data_manager(StudentProfile)
+        dm.workers = 2
+        # Ranges of about 100 bytes, so both workers get some
+        with mock.patch.object(split_ranges, '__defaults__', (100,)), redirect_stdout(io.StringIO()):
+            stats = dm.import_file(self.path)
+
+        self.assertEqual(stats['inserted'], 20)
+        self.assertEqual(StudentProfile.objects.get(pk='S3').first_name, 'Line one\n"3" "" line two\n')
+
+
+@skipUnless(connection.vendor == 'postgresql', 'COPY needs PostgreSQL')
+class CopyImportTests(ImportTestCase):
+    """COPY imports, several batches to a file (user-022)"""
+
+    def setUp(self):
+        super().setUp()
+        generate_dataset(3)
+        self.path = os.path.join(self.tmp, 'records.csv')
+        self.data_manager(AcademicRecord).export_file(self.path)
+        AcademicRecord.objects.all().delete()
+
+    def small_batches(self):
+        # Chunks of 2 rows, grouped into COPY batches of at least 4
+        return mock.patch.object(DataManager.iter_chunks, '__defaults__', (2,)), \
+            mock.patch.object(data_manager, 'COPY_CHUNK_SIZE', 4)
+
+    def test_batches_inside_a_transaction(self):
+        chunks, batches = self.small_batches()
+        with chunks, batches, transaction.atomic():
+            stats = self.import_file(AcademicRecord, self.path)
+            self.assertEqual(stats['inserted'], 18)
+        self.assertEqual(AcademicRecord.objects.count(), 18)
+
+    def test_merge_batches_inside_a_transaction(self):
+        chunks, batches = self.small_batches()
+        with chunks, batches, transaction.atomic():
+            self.import_file(AcademicRecord, self.path)
+            stats = self.import_file(AcademicRecord, self.path, merge=True)
+        self.assertEqual((stats['inserted'], stats['unchanged']), (0, 18))
+
+
+class BatchImportTests(ImportTestCase):
+    """Several models from one directory, in foreign key order (user-024)"""
+
+    def setUp(self):
+        super().setUp()
+        generate_dataset(3)
+        for model in DATA_MODELS:
+            self.data_manager(model).export_file(os.path.join(self.tmp, f'{model._meta.model_name}.csv'))
+
+    def run_batch(self, *argv):
+        with redirect_stdout(io.StringIO()) as out:
+            code = run_batch(parse_args(['--batch', self.tmp, *argv]))
+        return code, out.getvalue()
+
+    def test_levels_follow_foreign_keys(self):
+        self.assertEqual(
+            import_levels([AcademicRecord, StudentClassHistory, StudentProfile]),
+            [[StudentProfile], [AcademicRecord, StudentClassHistory]],
+        )
+
+    def test_foreign_key_cycle_is_an_error(self):
+        dependencies = {StudentProfile: {AcademicRecord}, AcademicRecord: {StudentProfile}}
+        with mock.patch.object(data_manager, 'model_dependencies', return_value=dependencies), \
+                self.assertRaisesMessage(ImportFileError, 'cycle between records.AcademicRecord, records.StudentProfile'):
+            import_levels([StudentProfile, AcademicRecord])
+
+    def test_entries_from_directory_and_manifest(self):
+        with open(os.path.join(self.tmp, 'notes.csv'), 'w') as f:
+            f.write('text\n')
+        with redirect_stdout(io.StringIO()):
+            entries = batch_entries(self.tmp)
+        self.assertEqual([(model, merge) for model, _, merge in entries],
+                         [(AcademicRecord, None), (StudentClassHistory, None), (StudentProfile, None)])
+
+        manifest = os.path.join(self.tmp, 'batch.json')
+        with open(manifest, 'w') as f:
+            f.write('[{"model": "records.StudentProfile", "file": "studentprofile.csv", "merge": true}]')
+        self.assertEqual(batch_entries(manifest),
+                         [(StudentProfile, os.path.join(self.tmp, 'studentprofile.csv'), True)])
+
+    def test_replace_reloads_every_model(self):
+        code, out = self.run_batch('--replace')
+        self.assertEqual(code, 0, out)
+        self.assertEqual((StudentProfile.objects.count(), StudentClassHistory.objects.count(),
+                          AcademicRecord.objects.count()), (3, 9, 18))
+
+    def test_dependents_of_a_failed_model_are_not_loaded(self):
+        self.write_csv('studentprofile.csv', ['student_id'], [['S9']])
+        with redirect_stdout(io.StringIO()):
+            results = import_batch(batch_entries(self.tmp), replace=True)
+
+        self.assertIsInstance(results[StudentProfile], ImportFileError)
+        self.assertEqual(str(results[AcademicRecord]), 'Not loaded, records.StudentProfile failed')
+        self.assertEqual(str(results[StudentClassHistory]), 'Not loaded, records.StudentProfile failed')
+        self.assertFalse(ImportJob.objects.filter(model='records.AcademicRecord').exists())
+
+    def test_atomic_database_error_exits_with_1(self):
+        # Inserting the rows already there breaks the primary keys
+        code, out = self.run_batch('--atomic')
+        self.assertEqual(code, 1)
+        self.assertIn('Error: ', out)
+        self.assertEqual(AcademicRecord.objects.count(), 18)
@@ -0,0 +1,40 @@
+"""Denormalised current class kept in sync on delete (user-008)"""
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from records.cache import NO_CACHE
+from records.datagen import generate_dataset
+from records.handlers import refresh_deleted_students
+from records.models import StudentClassHistory, StudentProfile
+
+
+@override_settings(CACHES=NO_CACHE)
+class DeletedClassSyncTests(TestCase):
+    def setUp(self):
+        generate_dataset(5)
+
+    def test_queryset_delete_refreshes_profiles_once(self):
+        with CaptureQueriesContext(connection) as queries, \
+                self.captureOnCommitCallbacks(execute=True):
+            StudentClassHistory.objects.all().delete()
+
+        updates = [q['sql'] for q in queries if q['sql'].startswith('UPDATE "records_studentprofile"')]
+        self.assertEqual(len(updates), 1)
+        self.assertFalse(StudentProfile.objects.exclude(current_form_class='').exists())
+
+    def test_deleting_the_current_row_clears_only_that_student(self):
+        current = StudentClassHistory.objects.filter(is_current=True).order_by('student_id')
+        first, second = current[0], current[1]
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+
+        self.assertEqual(StudentProfile.objects.get(pk=first.student_id).current_form_class, '')
+        self.assertEqual(StudentProfile.objects.get(pk=second.student_id).current_form_class, second.form_class)
+
+    def test_profile_delete_cascades_without_refreshing(self):
+        student = StudentProfile.objects.first()
+        with self.captureOnCommitCallbacks() as callbacks:
+            student.delete()
+        self.assertFalse(StudentClassHistory.objects.filter(student_id=student.pk).exists())
+        self.assertNotIn(refresh_deleted_students, callbacks)
@@ -0,0 +1,34 @@
+"""Request instrumentation defaults (user-013)"""
+from django.test import TestCase, override_settings
+
+from records.cache import NO_CACHE
+from records.instrumentation import DEFAULTS, request_stats
+
+MEASURE_ALL = {'SAMPLE_RATE': 1.0}
+
+
+@override_settings(CACHES=NO_CACHE, RECORDS_REPLICAS=[])
+class ServerTimingTests(TestCase):
+    def setUp(self):
+        request_stats.reset()
+        self.addCleanup(request_stats.reset)
+
+    def test_defaults_are_cheap_and_private(self):
+        self.assertLessEqual(DEFAULTS['SAMPLE_RATE'], 0.05)
+        self.assertFalse(DEFAULTS['SERVER_TIMING'])
+
+    @override_settings(RECORDS_INSTRUMENTATION=MEASURE_ALL)
+    def test_no_header_unless_enabled(self):
+        response = self.client.get('/profiles/')
+        self.assertNotIn('Server-Timing', response)
+        # Still measured for /stats/requests/
+        self.assertIn('student_profiles', request_stats.summary())
+
+    @override_settings(RECORDS_INSTRUMENTATION={**MEASURE_ALL, 'SERVER_TIMING': True})
+    def test_header_when_enabled(self):
+        response = self.client.get('/profiles/')
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ queries", template;dur=')
+
+    @override_settings(RECORDS_INSTRUMENTATION={'SAMPLE_RATE': 0, 'SERVER_TIMING': True})
+    def test_unsampled_requests_get_no_header(self):
+        self.assertNotIn('Server-Timing', self.client.get('/profiles/'))
@@ -0,0 +1,89 @@
+"""Keyset pagination boundaries (user-005)"""
+from urllib.parse import parse_qs
+
+from django.test import RequestFactory, TestCase, override_settings
+
+from records.datagen import generate_dataset
+from records.models import AcademicRecord
+from records.pagination import decode_cursor, encode_cursor, paginate
+
+ORDERING = ['student_id', '-academic_year', 'semester']
+
+
+def keys(page):
+    return [(row.student_id, row.academic_year, row.semester) for row in page]
+
+
+@override_settings(RECORDS_PAGE_SIZE=4, RECORDS_MAX_PAGE_SIZE=10)
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        # 12 records: three full pages of 4
+        generate_dataset(2)
+        cls.expected = sorted(
+            AcademicRecord.objects.values_list('student_id', 'academic_year', 'semester'),
+            key=lambda row: (row[0], -row[1], row[2]),
+        )
+
+    def page(self, query=''):
+        return paginate(RequestFactory().get(f'/?{query}'), AcademicRecord.objects.all(), ORDERING)
+
+    def walk(self, direction, page):
+        pages = [page]
+        while getattr(page, f'has_{direction}'):
+            page = self.page(getattr(page, f'{direction}_query'))
+            pages.append(page)
+        return pages
+
+    def test_forward_walk_returns_each_row_once(self):
+        pages = self.walk('next', self.page())
+        self.assertEqual([len(page) for page in pages], [4, 4, 4])
+        self.assertEqual([key for page in pages for key in keys(page)], self.expected)
+        self.assertFalse(pages[0].has_previous)
+        # An exact multiple of the page size ends without an empty page
+        self.assertFalse(pages[-1].has_next)
+
+    def test_backward_walk_returns_the_same_pages(self):
+        forward = self.walk('next', self.page())
+        backward = self.walk('previous', forward[-1])
+        self.assertEqual([keys(page) for page in backward[::-1]], [keys(page) for page in forward])
+        self.assertFalse(backward[-1].has_previous)
+        self.assertTrue(backward[-1].has_next)
+
+    def test_partial_last_page(self):
+        pages = self.walk('next', self.page('page_size=5'))
+        self.assertEqual([len(page) for page in pages], [5, 5, 2])
+        self.assertEqual(keys(pages[-1]), self.expected[-2:])
+
+    def test_cursor_past_the_end_is_an_empty_page(self):
+        last = list(self.expected[-1])
+        page = self.page(f'after={encode_cursor(last)}')
+        self.assertEqual(len(page), 0)
+        self.assertFalse(page.has_next)
+        self.assertFalse(page.has_previous)
+
+    def test_cursor_between_rows(self):
+        # Starts after the cursor even when no row has exactly its values
+        student, year, _ = self.expected[0]
+        page = self.page(f'after={encode_cursor([student, year + 1, ""])}')
+        self.assertEqual(keys(page)[0], self.expected[0])
+
+    def test_other_parameters_survive_in_the_links(self):
+        page = self.page('page_size=4&q=S')
+        self.assertEqual(parse_qs(page.next_query)['q'], ['S'])
+        self.assertEqual(parse_qs(page.next_query)['page_size'], ['4'])
+
+    def test_page_size_is_clamped(self):
+        self.assertEqual(len(self.page('page_size=0')), 1)
+        self.assertEqual(len(self.page('page_size=1000')), 10)
+        self.assertEqual(len(self.page('page_size=x')), 4)
+
+    def test_cursor_values_of_the_wrong_type_return_the_first_page(self):
+        for direction in ('after', 'before'):
+            token = encode_cursor(['S0001', 'not a year', '1'])
+            self.assertEqual(keys(self.page(f'{direction}={token}')), self.expected[:4])
+
+    def test_malformed_cursor_returns_the_first_page(self):
+        for token in ('not-base64!', encode_cursor(['S0001']), encode_cursor({'a': 1})):
+            self.assertIsNone(decode_cursor(token, len(ORDERING)))
+            self.assertEqual(keys(self.page(f'after={token}')), self.expected[:4])
@@ -0,0 +1,90 @@
+"""Cohort promotions: suggestions, preview and apply (user-007)"""
+from datetime import date
+
+from django.test import TestCase, override_settings
+
+from records.cache import NO_CACHE
+from records.models import StudentClassHistory, StudentProfile
+from records.promotions import apply_promotions, plan_promotions, suggest_next_class, suggest_promotions
+
+
+@override_settings(CACHES=NO_CACHE, RECORDS_FINAL_FORM=6)
+class PromotionTests(TestCase):
+    def setUp(self):
+        for student_id, form_class in (('S1', '3A'), ('S2', '6B'), ('S3', None)):
+            StudentProfile.objects.create(
+                student_id=student_id, first_name='First', last_name=student_id,
+                date_of_birth=date(2012, 1, 1), contact_number='12345678',
+            )
+            if form_class:
+                StudentClassHistory.objects.create(
+                    student_id=student_id, academic_year=2023, form_class=form_class, is_current=True,
+                )
+
+    def current_classes(self):
+        return dict(StudentClassHistory.objects.filter(is_current=True).values_list('student_id', 'form_class'))
+
+    def test_suggest_next_class(self):
+        self.assertEqual(suggest_next_class('3A'), '4A')
+        self.assertEqual(suggest_next_class('5'), '6')
+        self.assertIsNone(suggest_next_class('6B'))
+        self.assertIsNone(suggest_next_class('K1'))
+        self.assertIsNone(suggest_next_class(''))
+
+    def test_suggestions_cover_students_with_a_class(self):
+        self.assertEqual(
+            [(student.student_id, suggestion) for student, suggestion in suggest_promotions()],
+            [('S1', '4A'), ('S2', None)],
+        )
+
+    def test_plan_writes_nothing(self):
+        with self.assertNumQueries(2):
+            plan = plan_promotions(2024, {'S1': '4A', 'S3': '1C', 'S9': '2A'})
+
+        self.assertEqual(
+            [(p.student_id, p.from_class, p.from_year, p.to_class, p.action) for p in plan],
+            [('S1', '3A', 2023, '4A', 'create'), ('S3', None, None, '1C', 'create')],
+        )
+        self.assertEqual(plan.unknown, ['S9'])
+        self.assertEqual((plan.created, plan.updated), (2, 0))
+        self.assertEqual(StudentClassHistory.objects.count(), 2)
+
+    def test_apply_moves_the_current_class(self):
+        self.assertEqual(apply_promotions(plan_promotions(2024, {'S1': '4A', 'S3': '1C'})), 2)
+
+        self.assertEqual(self.current_classes(), {'S1': '4A', 'S2': '6B', 'S3': '1C'})
+        self.assertFalse(StudentClassHistory.objects.get(student='S1', academic_year=2023).is_current)
+        self.assertEqual(
+            dict(StudentProfile.objects.values_list('student_id', 'current_form_class')),
+            {'S1': '4A', 'S2': '6B', 'S3': '1C'},
+        )
+
+    def test_reapplying_a_year_updates_the_class(self):
+        apply_promotions(plan_promotions(2024, {'S1': '4A'}))
+        plan = plan_promotions(2024, {'S1': '4B'})
+        self.assertEqual((plan.created, plan.updated), (0, 1))
+        apply_promotions(plan)
+
+        self.assertEqual(StudentClassHistory.objects.filter(student='S1').count(), 2)
+        self.assertEqual(self.current_classes()['S1'], '4B')
+        self.assertEqual(StudentProfile.objects.get(pk='S1').current_form_class, '4B')
+
+    def test_empty_plan_is_a_no_op(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(apply_promotions(plan_promotions(2024, {'S9': '1A'})), 0)
+
+    def test_preview_then_apply_through_the_view(self):
+        data = {'to_year': '2024', 'new_class_S1': '4A', 'new_class_S2': ''}
+        response = self.client.post('/promotions/', {**data, 'action': 'preview'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([p.student_id for p in response.context['plan']], ['S1'])
+        self.assertEqual(self.current_classes(), {'S1': '3A', 'S2': '6B'})
+
+        response = self.client.post('/promotions/', {**data, 'action': 'apply'})
+        self.assertRedirects(response, '/promotions/', fetch_redirect_response=False)
+        self.assertEqual(self.current_classes(), {'S1': '4A', 'S2': '6B'})
+
+    def test_missing_year_is_rejected(self):
+        response = self.client.post('/promotions/', {'new_class_S1': '4A', 'action': 'apply'})
+        self.assertRedirects(response, '/promotions/', fetch_redirect_response=False)
+        self.assertEqual(self.current_classes(), {'S1': '3A', 'S2': '6B'})
@@ -0,0 +1,252 @@
+"""Query-count regression tests.
+
+Every records URL, the admin changelists, the async views and DataManager
+import/export run against a small and a larger generated dataset, and must
+run the same number of queries on both. A failure lists the statements
+(fingerprinted as in records.instrumentation) whose count changed, which is
+where an N+1 came back.
+"""
+import io
+import os
+import re
+import tempfile
+from collections import Counter
+from contextlib import redirect_stdout
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from clean_up import delete_records, purge, purge_order
+from data_manager import DataManager
+from records import async_views
+from records.cache import NO_CACHE
+from records.datagen import YEARS, generate_dataset, student_id
+from records.instrumentation import fingerprint
+from records.models import DATA_MODELS, AcademicRecord, ImportJob, StudentClassHistory, StudentProfile
+
+# Students generated for the two runs; LARGE fills more than one results page
+SMALL = 3
+LARGE = 10
+
+# Every route of records/urls.py, formatted with the dataset's values
+RECORDS_URLS = [
+    '/profiles/',
+    '/profiles/?year={year}',
+    '/profiles/?q={student}',
+    '/profiles/?q={last_name}',
+    '/academic-results/',
+    '/academic-results/?year={year}&form_class={form_class}',
+    '/academic-results/?student_name={last_name}',
+    '/academic-results/download/',
+    '/academic-results/download/?format=xlsx&year={year}',
+    '/student/{student}/',
+    '/rankings/?year={year}&semester=1&form_class={form_class}',
+    '/promotions/',
+    '/analytics/',
+    '/analytics/?year={year}&semester=1&form_class={form_class}',
+    '/api/analytics/?group_by=academic_year,semester',
+    '/api/analytics/scores/',
+    '/api/analytics/scores/?year={year}&form_class={form_class}',
+    '/api/academic-records/',
+    '/api/academic-records/?format=json&limit=20',
+    '/stats/requests/',
+]
+
+ADMIN_URLS = [
+    '/admin/records/studentprofile/',
+    '/admin/records/studentprofile/?current_class={form_class}&year={year}',
+    '/admin/records/studentprofile/?q={last_name}',
+    '/admin/records/academicrecord/',
+    '/admin/records/academicrecord/?academic_year={year}&semester=1',
+    '/admin/records/academicrecord/?q={student}',
+    '/admin/records/importjob/',
+]
+
+# Captured SQL has its parameters filled in, so IN lists are literals
+_VALUE_LIST = re.compile(r'\(\?(?:, \?)*\)')
+# Rows of a multi-row INSERT
+_REPEATED_ROWS = re.compile(r'(\([^()]*\))(?:, \1)+')
+_SAVEPOINT = re.compile(r'"s\d+_x\d+"')
+
+
+def statement(sql):
+    """fingerprint() of a captured query, with value lists, inserted rows
+    and savepoint names collapsed as well"""
+    sql = _REPEATED_ROWS.sub(r'\1, ...', _VALUE_LIST.sub('(...)', fingerprint(sql)))
+    return _SAVEPOINT.sub('"?"', sql)
+
+
+def dataset_values():
+    """Values for the URL templates; student 1 exists at both sizes"""
+    student = StudentProfile.objects.get(student_id=student_id(1))
+    return {
+        'student': student.student_id,
+        'last_name': student.last_name,
+        'year': YEARS[-1],
+        'form_class': StudentClassHistory.objects.get(
+            student=student, academic_year=YEARS[-1]
+        ).form_class,
+    }
+
+
+def read_response(response):
+    if response.streaming:
+        return b''.join(response.streaming_content)
+    return response.content
+
+
+@override_settings(CACHES=NO_CACHE, RECORDS_ASYNC_PARALLEL_QUERIES=False, RECORDS_REPLICAS=[])
+class QueryCountTestCase(TestCase):
+    """assertConstantQueries() runs a function at both dataset sizes"""
+
+    def query_counts(self, students, run, prepare):
+        with transaction.atomic():
+            generate_dataset(students)
+            values = prepare(students)
+            with CaptureQueriesContext(connection) as queries:
+                # Summary refreshes run on commit; count them too
+                with self.captureOnCommitCallbacks(execute=True):
+                    run(values)
+            transaction.set_rollback(True)
+        return Counter(statement(query['sql']) for query in queries.captured_queries)
+
+    def assertConstantQueries(self, run, prepare=lambda students: dataset_values()):
+        # The first run fills per-process caches (content types, templates)
+        self.query_counts(SMALL, run, prepare)
+        small = self.query_counts(SMALL, run, prepare)
+        large = self.query_counts(LARGE, run, prepare)
+        if small == large:
+            return
+        changed = [
+            f'  {small[sql]} -> {large[sql]}: {sql}'
+            for sql in dict.fromkeys([*small, *large]) if small[sql] != large[sql]
+        ]
+        self.fail(
+            f'{sum(small.values())} queries with {SMALL} students, '
+            f'{sum(large.values())} with {LARGE}:\n' + '\n'.join(changed)
+        )
+
+
+class ViewQueryCountTests(QueryCountTestCase):
+    def setUp(self):
+        # /stats/requests/ is for staff only
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'x'))
+
+    def get(self, url):
+        def run(values):
+            response = self.client.get(url.format(**values))
+            read_response(response)
+            self.assertEqual(response.status_code, 200)
+        return run
+
+    def test_records_urls(self):
+        for url in RECORDS_URLS:
+            with self.subTest(url=url):
+                self.assertConstantQueries(self.get(url))
+
+    def test_admin_changelists(self):
+        def with_jobs(students):
+            ImportJob.objects.bulk_create(
+                ImportJob(model='records.AcademicRecord', file_path=f'/tmp/{n}.csv',
+                          file_hash='', file_size=0)
+                for n in range(students)
+            )
+            return dataset_values()
+
+        for url in ADMIN_URLS:
+            with self.subTest(url=url):
+                self.assertConstantQueries(self.get(url), with_jobs)
+
+
+class AsyncViewQueryCountTests(QueryCountTestCase):
+    """The async views run their queries on this thread's connection when
+    RECORDS_ASYNC_PARALLEL_QUERIES is off, so they are counted too"""
+
+    def get(self, view, url, **kwargs):
+        def run(values):
+            request = RequestFactory().get(url.format(**values))
+            response = async_to_sync(view)(request, **{k: v.format(**values) for k, v in kwargs.items()})
+            self.assertEqual(response.status_code, 200)
+        return run
+
+    def test_async_views(self):
+        for view, url, kwargs in [
+            (async_views.student_profiles, '/profiles/?year={year}', {}),
+            (async_views.academic_results, '/academic-results/?year={year}', {}),
+            (async_views.student_report, '/student/{student}/', {'student_id': '{student}'}),
+        ]:
+            with self.subTest(view=view.__name__):
+                self.assertConstantQueries(self.get(view, url, **kwargs))
+
+
+class DataManagerQueryCountTests(QueryCountTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.paths = {model: os.path.join(tmp.name, f'{model._meta.model_name}.csv') for model in DATA_MODELS}
+
+    def assertConstantQueries(self, run, prepare=lambda students: {}):
+        # Keep the import progress lines out of the test output
+        with redirect_stdout(io.StringIO()):
+            super().assertConstantQueries(run, prepare)
+
+    def data_manager(self, model):
+        dm = DataManager()
+        dm.app_name = model._meta.app_label
+        dm.Model = model
+        return dm
+
+    def test_export(self):
+        def run(values):
+            for model in DATA_MODELS:
+                self.data_manager(model).export_file(self.paths[model])
+        self.assertConstantQueries(run)
+
+    def test_import(self):
+        def export_and_purge(students):
+            for model in DATA_MODELS:
+                self.data_manager(model).export_file(self.paths[model])
+            purge([StudentProfile])
+
+        def run(values):
+            for model in DATA_MODELS:
+                stats = self.data_manager(model).import_file(self.paths[model])
+                self.assertFalse(stats['skipped'])
+        self.assertConstantQueries(run, export_and_purge)
+
+    def test_merge_import(self):
+        def export(students):
+            for model in DATA_MODELS:
+                self.data_manager(model).export_file(self.paths[model])
+
+        def run(values):
+            for model in DATA_MODELS:
+                stats = self.data_manager(model).import_file(self.paths[model], merge=True)
+                self.assertFalse(stats['skipped'])
+        self.assertConstantQueries(run, export)
+
+    def test_replace_import(self):
+        # What [R]eplace and --replace do: delete the model's rows, then import
+        def export(students):
+            for model in DATA_MODELS:
+                self.data_manager(model).export_file(self.paths[model])
+
+        def run(values):
+            for model in (StudentClassHistory, AcademicRecord):
+                dm = self.data_manager(model)
+                dm.Model.objects.all().delete()
+                stats = dm.import_file(self.paths[model])
+                self.assertFalse(stats['skipped'])
+        self.assertConstantQueries(run, export)
+
+
+class CleanUpQueryCountTests(QueryCountTestCase):
+    def test_delete_records(self):
+        # clean_up.py without --purge
+        def run(values):
+            for model in purge_order([StudentProfile]):
+                delete_records(model)
+        self.assertConstantQueries(run)
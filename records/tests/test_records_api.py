@@ -0,0 +1,96 @@
+"""Streaming academic records API (user-015)"""
+import json
+
+from django.test import TestCase, override_settings
+
+from records.datagen import generate_dataset
+from records.models import AcademicRecord
+from records.pagination import encode_cursor
+
+URL = '/api/academic-records/'
+
+
+@override_settings(RECORDS_REPLICAS=[])
+class AcademicRecordsApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        generate_dataset(3)
+        cls.expected = list(AcademicRecord.objects.order_by(
+            'student_id', 'academic_year', 'semester'
+        ).values_list('student_id', 'academic_year', 'semester'))
+
+    def get(self, **params):
+        response = self.client.get(URL, params)
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        return response, body.decode()
+
+    def ndjson(self, **params):
+        response, body = self.get(**params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        return [json.loads(line) for line in body.splitlines()]
+
+    def test_fields_projection(self):
+        rows = self.ndjson(fields='student_id,Mathematics,last_name')
+        self.assertEqual(len(rows), len(self.expected))
+        self.assertEqual(list(rows[0]), ['student_id', 'Mathematics', 'last_name'])
+
+    def test_unknown_field(self):
+        response, body = self.get(fields='student_id,password')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(json.loads(body)['error'], 'Unknown fields: password')
+
+    def test_following_next_cursor_to_the_end(self):
+        seen = []
+        params = {'limit': 4, 'fields': 'student_id,academic_year,semester'}
+        for _ in range(len(self.expected)):
+            rows = self.ndjson(**params)
+            if 'next_cursor' not in rows[-1]:
+                seen.extend(rows)
+                break
+            seen.extend(rows[:-1])
+            params['after'] = rows[-1]['next_cursor']
+        else:
+            self.fail('next_cursor never ran out')
+
+        # 18 records in pages of 4, without duplicates or gaps
+        self.assertEqual([(row['student_id'], row['academic_year'], row['semester']) for row in seen],
+                         self.expected)
+
+    def test_exact_last_page_has_no_cursor(self):
+        rows = self.ndjson(limit=len(self.expected))
+        self.assertEqual(len(rows), len(self.expected))
+        self.assertNotIn('next_cursor', rows[-1])
+
+    def test_tampered_cursor(self):
+        for cursor in ('garbage!', encode_cursor(['S0001', 2022]), encode_cursor(['S0001', 'x', '1'])):
+            with self.subTest(cursor=cursor):
+                response, body = self.get(after=cursor)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(json.loads(body), {'error': 'Invalid cursor'})
+
+    def test_out_of_range_limit(self):
+        for limit in ('0', '-5', 'ten'):
+            with self.subTest(limit=limit):
+                response, _ = self.get(limit=limit)
+                self.assertEqual(response.status_code, 400)
+
+    def test_json_body_is_valid(self):
+        response, body = self.get(format='json', limit=5, fields='student_id,conduct')
+        self.assertEqual(response['Content-Type'], 'application/json')
+        data = json.loads(body)
+        self.assertEqual(len(data['results']), 5)
+        self.assertIsNotNone(data['next_cursor'])
+
+        response, body = self.get(format='json', after=data['next_cursor'])
+        data = json.loads(body)
+        self.assertEqual(len(data['results']), len(self.expected) - 5)
+        self.assertIsNone(data['next_cursor'])
+
+    def test_empty_json_result(self):
+        _, body = self.get(format='json', year=1999)
+        self.assertEqual(json.loads(body), {'results': [], 'next_cursor': None})
+
+    def test_unknown_format(self):
+        response, _ = self.get(format='xml')
+        self.assertEqual(response.status_code, 400)
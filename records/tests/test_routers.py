@@ -0,0 +1,105 @@
+"""Replica routing (user-019), against a second SQLite alias"""
+import os
+import tempfile
+
+from django.db import DEFAULT_DB_ALIAS, connections, router
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from records.middleware import ReplicaStickinessMiddleware
+from records.models import StudentProfile
+from records.routers import STICKY_COOKIE, read_routing, replica_health, use_replica
+
+
+def read_alias():
+    # Where the router sends a read, without running it
+    return StudentProfile.objects.all().db
+
+
+@use_replica
+def read_view(request):
+    first = read_alias()
+    return HttpResponse(f'{first} {read_alias()}')
+
+
+@use_replica
+def write_view(request):
+    return HttpResponse(router.db_for_write(StudentProfile))
+
+
+@use_replica
+def streaming_view(request):
+    return StreamingHttpResponse(read_alias() for _ in range(2))
+
+
+@override_settings(RECORDS_REPLICAS=['replica'], RECORDS_REPLICA_HEALTH_TTL=60)
+class ReplicaRouterTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Added after the test runner set up its databases, so the aliases
+        # are left alone and can connect
+        tmp = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(tmp.cleanup)
+        # 'broken' cannot connect: its directory does not exist
+        for alias, name in (('replica', 'replica.sqlite3'), ('broken', os.path.join('missing', 'db.sqlite3'))):
+            connections.settings[alias] = {
+                **connections.settings[DEFAULT_DB_ALIAS], 'NAME': os.path.join(tmp.name, name),
+            }
+            cls.addClassCleanup(cls.remove_alias, alias)
+
+    @staticmethod
+    def remove_alias(alias):
+        connections[alias].close()
+        del connections[alias]
+        del connections.settings[alias]
+
+    def setUp(self):
+        replica_health.reset()
+        self.addCleanup(replica_health.reset)
+        self.factory = RequestFactory()
+
+    def get(self, view, cookies=None):
+        request = self.factory.get('/')
+        request.COOKIES.update(cookies or {})
+        return view(request)
+
+    def test_replica_views_read_from_the_replica(self):
+        self.assertEqual(self.get(read_view).content, b'replica replica')
+        self.assertEqual(read_alias(), DEFAULT_DB_ALIAS)
+        self.assertIsNone(read_routing.get())
+
+    def test_writes_use_the_primary(self):
+        self.assertEqual(self.get(write_view).content, b'default')
+
+    def test_write_sets_the_sticky_cookie(self):
+        middleware = ReplicaStickinessMiddleware(lambda request: HttpResponse())
+        response = middleware(self.factory.post('/'))
+        self.assertEqual(response.cookies[STICKY_COOKIE]['max-age'], 15)
+        self.assertNotIn(STICKY_COOKIE, middleware(self.factory.get('/')).cookies)
+
+    def test_sticky_client_reads_from_the_primary(self):
+        self.assertEqual(self.get(read_view, {STICKY_COOKIE: '1'}).content, b'default default')
+
+    def test_streaming_body_keeps_the_routing(self):
+        response = self.get(streaming_view)
+        self.assertIsNone(read_routing.get())
+        self.assertEqual(b''.join(response.streaming_content), b'replicareplica')
+
+    @override_settings(RECORDS_REPLICAS=['broken'])
+    def test_unhealthy_replica_falls_back_to_the_primary(self):
+        self.assertEqual(self.get(read_view).content, b'default default')
+        self.assertEqual(replica_health.checked['broken'][1], False)
+
+    @override_settings(RECORDS_REPLICAS=['broken', 'replica'])
+    def test_only_healthy_replicas_are_chosen(self):
+        for _ in range(5):
+            self.assertEqual(self.get(read_view).content, b'replica replica')
+
+    def test_health_is_cached(self):
+        self.get(read_view)
+        checked_at, _ = replica_health.checked['replica']
+        replica_health.checked['replica'] = (checked_at, False)
+        self.assertEqual(self.get(read_view).content, b'default default')
+        replica_health.reset()
+        self.assertEqual(self.get(read_view).content, b'replica replica')
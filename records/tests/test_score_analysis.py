@@ -0,0 +1,107 @@
+"""score_analysis command and the NumPy score matrix on tiny selections"""
+import io
+from datetime import date
+from unittest import mock, skipUnless
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from records.cache import NO_CACHE, VERSION_KEY, bump_data_version, records_cache
+from records.models import AcademicRecord, StudentClassHistory, StudentProfile
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+LOCMEM = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'records': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'score-matrix'},
+}
+
+
+def create_records():
+    for student_id, form_class, score in [('S1', '1A', 60), ('S2', '1B', 80)]:
+        StudentProfile.objects.create(student_id=student_id, first_name='First', last_name='Last',
+                                      date_of_birth=date(2012, 1, 1), contact_number='12345678')
+        StudentClassHistory.objects.create(student_id=student_id, academic_year=2023,
+                                           form_class=form_class, is_current=True)
+        AcademicRecord.objects.create(student_id=student_id, academic_year=2023, semester='1',
+                                      Chinese=score, English=score, Mathematics=score,
+                                      Science=score, conduct='A')
+
+
+@skipUnless(numpy, 'Score analysis needs NumPy')
+@override_settings(CACHES=NO_CACHE)
+class ScoreAnalysisCommandTests(TestCase):
+    def setUp(self):
+        create_records()
+
+    def score_analysis(self, *args):
+        out = io.StringIO()
+        call_command('score_analysis', *args, stdout=out)
+        return out.getvalue()
+
+    def test_no_records(self):
+        output = self.score_analysis('--year', '2022')
+        self.assertTrue(output.startswith('0 records'))
+
+    def test_one_record(self):
+        output = self.score_analysis('--form-class', '1A')
+        self.assertTrue(output.startswith('1 records'))
+        self.assertIn('Correlations\nNeed at least 2 records', output)
+
+    def test_one_record_as_json(self):
+        output = self.score_analysis('--form-class', '1A', '--json')
+        self.assertIn('"correlations": null', output)
+
+    def test_two_records(self):
+        output = self.score_analysis()
+        self.assertTrue(output.startswith('2 records'))
+        self.assertNotIn('Need at least 2 records', output)
+
+
+@skipUnless(numpy, 'Score analysis needs NumPy')
+@override_settings(CACHES=LOCMEM)
+class ScoreMatrixMemoTests(TestCase):
+    """Matrices stay in this process; the shared cache only holds the version"""
+
+    def setUp(self):
+        from records import score_matrix
+        self.score_matrix = score_matrix
+        records_cache().clear()
+        score_matrix._memo.clear()
+        self.addCleanup(score_matrix._memo.clear)
+        create_records()
+
+    def build_calls(self, *slices):
+        with mock.patch.object(self.score_matrix, '_build_matrix', wraps=self.score_matrix._build_matrix) as build:
+            matrices = [self.score_matrix.load_matrix(*slice_) for slice_ in slices]
+        return build.call_count, matrices
+
+    def test_slices_are_kept_until_the_version_moves(self):
+        calls, (first, second, other) = self.build_calls((2023, '1'), (2023, '1'), (2023, '2'))
+        self.assertEqual(calls, 2)
+        self.assertIs(first, second)
+        self.assertEqual(len(first), 2)
+        self.assertEqual(len(other), 0)
+
+        bump_data_version()
+        calls, (third,) = self.build_calls((2023, '1'))
+        self.assertEqual(calls, 1)
+        self.assertIsNot(third, first)
+
+    def test_matrices_are_not_stored_in_the_shared_cache(self):
+        self.score_matrix.load_matrix(2023, '1')
+        self.assertEqual(list(records_cache()._cache), [records_cache().make_key(VERSION_KEY)])
+
+    def test_least_recently_used_slices_are_dropped(self):
+        with mock.patch.object(self.score_matrix, 'MEMO_SIZE', 2):
+            calls, _ = self.build_calls((2023, '1'), (2023, '2'), (2023, '1'), (2024, '1'), (2023, '1'))
+            self.assertEqual(calls, 3)
+            self.assertEqual(list(self.score_matrix._memo), [(2024, '1'), (2023, '1')])
+
+    def test_no_memo_with_the_cache_switched_off(self):
+        with override_settings(CACHES=NO_CACHE):
+            calls, _ = self.build_calls((2023, '1'), (2023, '1'))
+        self.assertEqual(calls, 2)
@@ -0,0 +1,125 @@
+"""StudentSemesterSummary maintenance around imports and the records cache"""
+import io
+import os
+import tempfile
+from contextlib import redirect_stdout
+from unittest import mock, skipUnless
+
+from django.db import transaction
+from django.test import TransactionTestCase, override_settings
+
+from clean_up import purge
+from data_manager import DataManager, batch_entries, import_batch
+from records import summaries
+from records.analytics import SUBJECTS
+from records.cache import data_version
+from records.datagen import generate_dataset
+from records.models import DATA_MODELS, AcademicRecord, StudentSemesterSummary
+
+LOCMEM = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'records': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'summaries'},
+}
+
+
+def summary_rows():
+    return sorted(StudentSemesterSummary.objects.values_list(
+        'student_id', 'academic_year', 'semester', 'form_class', 'total', 'class_rank', 'year_rank'
+    ))
+
+
+@override_settings(CACHES=LOCMEM)
+class SummaryRefreshTests(TransactionTestCase):
+    """Commits are real here, so on_commit refreshes run as in production"""
+
+    def setUp(self):
+        generate_dataset(4)
+
+    def test_import_refreshes_once_after_the_file(self):
+        expected = summary_rows()
+        dm = DataManager()
+        dm.Model = AcademicRecord
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'records.csv')
+            dm.export_file(path)
+            purge([AcademicRecord])
+            self.assertEqual(summary_rows(), [])
+
+            # Five rows per committed chunk
+            with mock.patch.object(DataManager.iter_chunks, '__defaults__', (5,)), \
+                    mock.patch('records.summaries.flush_pending', wraps=summaries.flush_pending) as flush, \
+                    redirect_stdout(io.StringIO()):
+                stats = dm.import_file(path)
+
+        self.assertEqual(stats['inserted'], 24)
+        self.assertEqual(flush.call_count, 1)
+        self.assertEqual(summary_rows(), expected)
+
+    def test_large_change_sets_refresh_whole_terms(self):
+        expected = summary_rows()
+        StudentSemesterSummary.objects.all().delete()
+        changes = set(AcademicRecord.objects.values_list('academic_year', 'semester', 'student_id'))
+        with mock.patch.object(summaries, 'TERM_REFRESH_CHANGES', 1), \
+                mock.patch('records.summaries.refresh_students') as refresh_students:
+            summaries.schedule_refresh(changes)
+        refresh_students.assert_not_called()
+        self.assertEqual(summary_rows(), expected)
+
+    def test_data_version_moves_after_summaries_are_written(self):
+        versions = []
+        refresh_students = summaries.refresh_students
+
+        def refresh(changes):
+            refresh_students(changes)
+            versions.append(data_version())
+
+        record = AcademicRecord.objects.first()
+        record.Chinese = 0 if record.Chinese else 1
+        with mock.patch('records.summaries.refresh_students', side_effect=refresh):
+            with transaction.atomic():
+                record.save()
+
+        # Anything cached while the summaries were being written is retired
+        self.assertEqual(len(versions), 1)
+        self.assertNotEqual(data_version(), versions[0])
+
+    def test_batch_refreshes_once_after_the_last_model(self):
+        expected = summary_rows()
+        with tempfile.TemporaryDirectory() as tmp:
+            for model in DATA_MODELS:
+                dm = DataManager()
+                dm.Model = model
+                dm.export_file(os.path.join(tmp, f'{model._meta.model_name}.csv'))
+
+            with mock.patch('records.summaries.flush_pending', wraps=summaries.flush_pending) as flush, \
+                    redirect_stdout(io.StringIO()):
+                results = import_batch(batch_entries(tmp), replace=True)
+
+        self.assertEqual(results[AcademicRecord]['inserted'], 24)
+        self.assertEqual(flush.call_count, 1)
+        self.assertEqual(summary_rows(), expected)
+
+    def test_year_ranks_match_a_rebuild(self):
+        record = AcademicRecord.objects.order_by('pk').first()
+        for subject in SUBJECTS:
+            setattr(record, subject, 100)
+        record.save()
+        ranked = summary_rows()
+        summaries.rebuild_summaries()
+        self.assertEqual(ranked, summary_rows())
+        self.assertEqual(StudentSemesterSummary.objects.get(
+            student_id=record.student_id, academic_year=record.academic_year, semester=record.semester,
+        ).year_rank, 1)
+
+        # Same ranks without UPDATE ... FROM
+        StudentSemesterSummary.objects.update(year_rank=0)
+        with mock.patch.object(summaries, 'supports_update_from', return_value=False):
+            for academic_year, semester in set(AcademicRecord.objects.values_list('academic_year', 'semester')):
+                summaries.refresh_year_ranks(academic_year, semester)
+        self.assertEqual(ranked, summary_rows())
+
+    @skipUnless(summaries.supports_update_from(), 'needs UPDATE ... FROM')
+    def test_year_ranks_are_not_read_into_python(self):
+        record = AcademicRecord.objects.order_by('pk').first()
+        with self.assertNumQueries(1):
+            summaries.refresh_year_ranks(record.academic_year, record.semester)
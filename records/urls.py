@@ -1,9 +1,20 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
+
+# Under ASGI the read views are served by their async versions
+read_views = async_views if settings.RECORDS_ASYNC_VIEWS else views
 
 urlpatterns = [
-    path('profiles/', views.student_profiles, name='student_profiles'),
-    path('academic-results/', views.academic_results, name='academic_results'),
-    path('student/<str:student_id>/', views.student_report, name='student_report'),
+    path('profiles/', read_views.student_profiles, name='student_profiles'),
+    path('academic-results/', read_views.academic_results, name='academic_results'),
+    path('academic-results/download/', views.academic_results_download, name='academic_results_download'),
+    path('student/<str:student_id>/', read_views.student_report, name='student_report'),
+    path('rankings/', views.class_rankings, name='class_rankings'),
     path('promotions/', views.manage_promotions, name='manage_promotions'),
+    path('analytics/', views.analytics, name='analytics'),
+    path('api/analytics/', views.analytics_api, name='analytics_api'),
+    path('api/analytics/scores/', views.score_analysis_api, name='score_analysis_api'),
+    path('api/academic-records/', views.academic_records_api, name='academic_records_api'),
+    path('stats/requests/', views.request_stats, name='request_stats'),
 ]
\ No newline at end of file
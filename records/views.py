@@ -1,29 +1,43 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from django.db.models import Q, F
-from .models import StudentProfile, AcademicRecord, StudentClassHistory
+from django.db.models import Exists, OuterRef, Prefetch
+from .models import StudentProfile, AcademicRecord, StudentClassHistory, StudentSemesterSummary
+from .analytics import GROUP_FIELDS, SUBJECTS, subject_statistics
+from .cache import cache_response
+from .exports import EXPORT_FORMATS, export_response
+from .instrumentation import instrumentation_settings, request_stats as request_stats_registry
+from .pagination import decode_cursor, encode_cursor, paginate, seek
+from .routers import use_replica
+from .promotions import apply_promotions, parse_assignments, plan_promotions, suggest_promotions
+from .search import name_filter, search_students
 from django.contrib import messages
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from datetime import datetime
 
 
-def student_profiles(request):
+def profile_queries(request):
+    """Querysets behind student_profiles: (students, ordering, year_choices)"""
     query = request.GET.get('q', '')
     selected_year = request.GET.get('year', '')
     
-    students = StudentProfile.objects.prefetch_related('class_history').all()
+    # The current class is denormalised onto the profile; class history is
+    # only needed when a specific year is asked for
+    students = StudentProfile.objects.all()
+    ordering = ['student_id']
     
     if query:
-        students = students.filter(
-            Q(student_id__icontains=query) |
-            Q(first_name__icontains=query) |
-            Q(last_name__icontains=query)
-        )
+        students, ordering = search_students(students, query)
     
     if selected_year:
         try:
             selected_year_int = int(selected_year)
             students = students.filter(
                 class_history__academic_year=selected_year_int
-            ).distinct()
+            ).distinct().prefetch_related(Prefetch(
+                'class_history',
+                queryset=StudentClassHistory.objects.filter(academic_year=selected_year_int),
+            ))
         except (ValueError, TypeError):
             # Handle invalid year input
             pass
@@ -31,21 +45,63 @@ def student_profiles(request):
     year_choices = StudentClassHistory.objects.values_list(
         'academic_year', flat=True
     ).distinct().order_by('academic_year')
+    return students, ordering, year_choices
+
+@use_replica
+@cache_response
+def student_profiles(request):
+    students, ordering, year_choices = profile_queries(request)
+    page = paginate(request, students, ordering)
     
     return render(request, 'records/student_profiles.html', {
-        'students': students,
+        'students': page.object_list,
+        'page': page,
         'year_choices': year_choices,
-        'selected_year': selected_year
+        'selected_year': request.GET.get('year', '')
     })
 
-def academic_results(request):
-    # Get distinct values for filters
-    year_choices = [
-        (year, f"{year}-{year+1}") 
-        for year in AcademicRecord.objects.order_by('academic_year')
-            .values_list('academic_year', flat=True)
-            .distinct()
-    ]
+# Unique ordering of academic records, used for keyset pagination
+RECORD_ORDERING = ['student_id', 'academic_year', 'semester']
+
+# Fields the records API can return, mapped to their ORM paths
+API_FIELDS = {
+    'student_id': 'student_id',
+    'first_name': 'student__first_name',
+    'last_name': 'student__last_name',
+    'academic_year': 'academic_year',
+    'semester': 'semester',
+    'Chinese': 'Chinese',
+    'English': 'English',
+    'Mathematics': 'Mathematics',
+    'Science': 'Science',
+    'conduct': 'conduct',
+}
+API_FORMATS = {'ndjson': 'application/x-ndjson', 'json': 'application/json'}
+# Rows per database fetch and per chunk written to the client
+API_CHUNK_SIZE = 2000
+
+
+def filter_academic_records(results, year=None, form_class=None, student_name=None):
+    """Apply the academic_results filters to an AcademicRecord queryset"""
+    if year:
+        results = results.filter(academic_year=year)
+    if form_class:
+        # A semi-join keeps the rows in index order, unlike join + distinct()
+        results = results.filter(Exists(StudentClassHistory.objects.filter(
+            student=OuterRef('student'),
+            academic_year=OuterRef('academic_year'),
+            form_class=form_class,
+        )))
+    if student_name:
+        for term in student_name.split():
+            results = results.filter(name_filter(term, prefix='student__'))
+    return results
+
+def results_queries(request):
+    """Querysets behind academic_results: (results, years, class_choices)"""
+    years = AcademicRecord.objects.order_by('academic_year').values_list(
+        'academic_year', flat=True
+    ).distinct()
     
     class_choices = StudentClassHistory.objects.values_list(
         'form_class', flat=True
@@ -56,86 +112,308 @@ def academic_results(request):
         'student'
     ).prefetch_related(
         'student__class_history'
-    ).order_by('student__student_id', 'academic_year', 'semester')
+    )
     
     # Filtering logic
-    year = request.GET.get('year')
-    form_class = request.GET.get('form_class')
-    student_name = request.GET.get('student_name')
-    
-    if year:
-        results = results.filter(academic_year=int(year))
-    if form_class:
-        results = results.filter(
-            student__class_history__form_class=form_class,
-            student__class_history__academic_year=F('academic_year')
-        ).distinct()
-    if student_name:
-        results = results.filter(
-            Q(student__first_name__icontains=student_name) |
-            Q(student__last_name__icontains=student_name)
-        )
+    try:
+        year = int(request.GET.get('year') or 0) or None
+    except ValueError:
+        year = None
+    results = filter_academic_records(
+        results, year, request.GET.get('form_class'), request.GET.get('student_name')
+    )
+    return results, years, class_choices
+
+def results_context(request, page, years, class_choices):
+    # Filters for the download links, without the page cursor
+    download_query = request.GET.copy()
+    for key in ('after', 'before', 'page_size', 'format'):
+        download_query.pop(key, None)
+    download_query = download_query.urlencode()
     
-    return render(request, 'records/academic_results.html', {
-        'results': results,
-        'year_choices': year_choices,
+    return {
+        'results': page.object_list,
+        'page': page,
+        'download_query': f'{download_query}&' if download_query else '',
+        'year_choices': [(year, f"{year}-{year+1}") for year in years],
         'class_choices': class_choices,
         'subjects': ['Chinese', 'English', 'Mathematics', 'Science', 'conduct']
-    })
+    }
+
+@use_replica
+@cache_response
+def academic_results(request):
+    results, years, class_choices = results_queries(request)
+    # Sorted in the database; student_id is the raw FK column, so no join
+    page = paginate(request, results, RECORD_ORDERING)
+    return render(request, 'records/academic_results.html', results_context(
+        request, page, years, class_choices
+    ))
 
+@use_replica
+def academic_results_download(request):
+    """The academic_results rows matching the current filters, as CSV or XLSX"""
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        fmt = 'csv'
+    try:
+        year = int(request.GET.get('year') or 0) or None
+    except ValueError:
+        year = None
+    results = filter_academic_records(
+        AcademicRecord.objects.all(), year,
+        request.GET.get('form_class'), request.GET.get('student_name'),
+    )
+    try:
+        return export_response(results, fmt)
+    except ImportError:
+        return HttpResponse('XLSX export needs openpyxl installed, use format=csv instead.',
+                            content_type='text/plain', status=501)
+
+@use_replica
+@cache_response
 def student_report(request, student_id):
     try:
         student = StudentProfile.objects.get(student_id=student_id)
         academic_records = AcademicRecord.objects.filter(student=student).order_by('academic_year', 'semester')
+        summaries = student.semester_summaries.order_by('academic_year', 'semester')
         
         return render(request, 'records/student_report.html', {
             'student': student,
             'academic_records': academic_records,
+            'summaries': summaries,
             'subjects': ['Chinese', 'English', 'Mathematics', 'Science', 'conduct']
         })
     except StudentProfile.DoesNotExist:
         return render(request, 'records/404.html', {'message': 'Student not found'}, status=404)
 
+@use_replica
+@cache_response
+def class_rankings(request):
+    terms = list(StudentSemesterSummary.objects.order_by(
+        '-academic_year', '-semester'
+    ).values_list('academic_year', 'semester').distinct())
+    class_choices = StudentClassHistory.objects.values_list(
+        'form_class', flat=True
+    ).distinct().order_by('form_class')
+    
+    # Latest semester unless one is picked
+    try:
+        term = (int(request.GET['year']), request.GET['semester'])
+    except (KeyError, ValueError):
+        term = terms[0] if terms else (None, None)
+    form_class = request.GET.get('form_class', '')
+    
+    # Both orderings are served by the summary rank indexes
+    rankings = StudentSemesterSummary.objects.select_related('student').filter(
+        academic_year=term[0], semester=term[1]
+    )
+    if form_class:
+        rankings = rankings.filter(form_class=form_class)
+        ordering = ['class_rank', 'student_id']
+    else:
+        ordering = ['year_rank', 'student_id']
+    page = paginate(request, rankings, ordering)
+    
+    return render(request, 'records/class_rankings.html', {
+        'rankings': page.object_list,
+        'page': page,
+        'terms': terms,
+        'term': term,
+        'class_choices': class_choices,
+        'form_class': form_class,
+    })
+
 def manage_promotions(request):
+    plan = None
+    assignments = {}
     if request.method == 'POST':
-        to_year = request.POST.get('to_year')
-        for student in StudentProfile.objects.all():
-            new_class = request.POST.get(f'new_class_{student.student_id}')
-            if new_class:
-                # Create new class history record
-                StudentClassHistory.objects.create(
-                    student=student,
-                    academic_year=to_year,
-                    form_class=new_class,
-                    is_current=True
-                )
-                # Mark previous records as not current
-                StudentClassHistory.objects.filter(
-                    student=student
-                ).exclude(
-                    academic_year=to_year
-                ).update(is_current=False)
-        
-        messages.success(request, 'Promotions applied successfully!')
-        return redirect('manage_promotions')
+        try:
+            to_year = int(request.POST.get('to_year'))
+        except (TypeError, ValueError):
+            messages.error(request, 'Please choose the year to promote into.')
+            return redirect('manage_promotions')
+
+        assignments = parse_assignments(request.POST)
+        plan = plan_promotions(to_year, assignments)
+        if request.POST.get('action') == 'apply':
+            count = apply_promotions(plan)
+            messages.success(request, f'Promotions applied successfully for {count} students!')
+            return redirect('manage_promotions')
+        # Otherwise fall through and show the plan as a dry run
     
     # Get distinct years from class history
     year_choices = StudentClassHistory.objects.values_list(
         'academic_year', flat=True
     ).distinct().order_by('academic_year')
     
-    # Get students with their current class info
-    students = StudentProfile.objects.prefetch_related(
-        'class_history'
-    ).annotate(
-        current_class=F('class_history__form_class'),
-        current_year=F('class_history__academic_year')
-    ).filter(
-        class_history__is_current=True
-    ).distinct()
+    # Current class and suggested next class for every student, in one query
+    students = [
+        {
+            'profile': profile,
+            'new_class': assignments.get(profile.student_id, suggestion or ''),
+        }
+        for profile, suggestion in suggest_promotions()
+    ]
     
     return render(request, 'records/manage_promotion.html', {
         'students': students,
         'year_choices': year_choices,
-        'next_year': datetime.now().year + 1
-    })
\ No newline at end of file
+        'next_year': datetime.now().year + 1,
+        'plan': plan,
+    })
+
+
+def _analytics_filters(request):
+    """subject_statistics() arguments from the query string"""
+    try:
+        academic_year = int(request.GET.get('year', ''))
+    except ValueError:
+        academic_year = None
+    group_by = [field for field in request.GET.get('group_by', '').split(',') if field in GROUP_FIELDS]
+    return {
+        'academic_year': academic_year,
+        'semester': request.GET.get('semester') or None,
+        'form_class': request.GET.get('form_class') or None,
+        'group_by': group_by or GROUP_FIELDS,
+    }
+
+def _score_analysis(filters):
+    """score_matrix.score_analysis() for the filters, or None without NumPy"""
+    try:
+        from .score_matrix import score_analysis
+    except ImportError:
+        return None
+    return score_analysis(filters['academic_year'], filters['semester'], filters['form_class'])
+
+@use_replica
+def analytics(request):
+    filters = _analytics_filters(request)
+    year_choices = AcademicRecord.objects.values_list(
+        'academic_year', flat=True
+    ).distinct().order_by('academic_year')
+    class_choices = StudentClassHistory.objects.values_list(
+        'form_class', flat=True
+    ).distinct().order_by('form_class')
+    
+    return render(request, 'records/analytics.html', {
+        'groups': subject_statistics(**filters),
+        'group_by': filters['group_by'],
+        'analysis': _score_analysis(filters),
+        'year_choices': year_choices,
+        'class_choices': class_choices,
+        'semester_choices': AcademicRecord.SEMESTER_CHOICES,
+        'subjects': SUBJECTS,
+    })
+
+@use_replica
+def analytics_api(request):
+    filters = _analytics_filters(request)
+    return JsonResponse({
+        'group_by': filters['group_by'],
+        'groups': subject_statistics(**filters),
+    })
+
+@use_replica
+def score_analysis_api(request):
+    """Correlations, grade bands, cohort statistics and outliers as JSON"""
+    analysis = _score_analysis(_analytics_filters(request))
+    if analysis is None:
+        return JsonResponse({'error': 'Score analysis needs NumPy installed'}, status=501)
+    return JsonResponse(analysis)
+
+def _stream_records(rows, columns, fields, limit, fmt):
+    """Serialise value tuples from `rows` as NDJSON lines or one JSON object.
+
+    When `limit` rows have been written and more exist, a continuation
+    cursor follows: as a final {"next_cursor": ...} line for NDJSON, as
+    the "next_cursor" member for JSON.
+    """
+    encode = DjangoJSONEncoder(separators=(',', ':')).encode
+    positions = [columns.index(API_FIELDS[field]) for field in fields]
+    key_positions = [columns.index(field) for field in RECORD_ORDERING]
+    if fmt == 'json':
+        yield '{"results":['
+
+    chunk = []
+    count = 0
+    last = next_cursor = None
+    for row in rows:
+        if count == limit:
+            next_cursor = encode_cursor([last[i] for i in key_positions])
+            break
+        item = encode({field: row[i] for field, i in zip(fields, positions)})
+        if fmt == 'ndjson':
+            chunk.append(item + '\n')
+        else:
+            chunk.append(',' + item if count else item)
+        last = row
+        count += 1
+        if len(chunk) >= API_CHUNK_SIZE:
+            yield ''.join(chunk)
+            chunk = []
+    yield ''.join(chunk)
+
+    if fmt == 'json':
+        yield f'],"next_cursor":{encode(next_cursor)}}}'
+    elif next_cursor:
+        yield encode({'next_cursor': next_cursor}) + '\n'
+
+@use_replica
+def academic_records_api(request):
+    """Stream filtered academic records as NDJSON (default) or JSON.
+
+    Accepts the academic_results filters (year, form_class, student_name)
+    plus fields=<comma list>, limit=<rows>, after=<next_cursor> and
+    format=ndjson|json. Rows are read as tuples from a server-side cursor,
+    so memory use does not grow with the result size.
+    """
+    fmt = request.GET.get('format', 'ndjson')
+    if fmt not in API_FORMATS:
+        return JsonResponse({'error': f"format must be one of {', '.join(API_FORMATS)}"}, status=400)
+    fields = [field for field in request.GET.get('fields', '').split(',') if field] or list(API_FIELDS)
+    unknown = [field for field in fields if field not in API_FIELDS]
+    if unknown:
+        return JsonResponse({
+            'error': f"Unknown fields: {', '.join(unknown)}",
+            'fields': list(API_FIELDS),
+        }, status=400)
+    try:
+        year = int(request.GET.get('year') or 0) or None
+        limit = int(request.GET['limit']) if request.GET.get('limit') else None
+    except ValueError:
+        return JsonResponse({'error': 'year and limit must be integers'}, status=400)
+    if limit is not None and limit < 1:
+        return JsonResponse({'error': 'limit must be positive'}, status=400)
+
+    records = filter_academic_records(
+        AcademicRecord.objects.all(), year,
+        request.GET.get('form_class'), request.GET.get('student_name'),
+    )
+    if request.GET.get('after'):
+        after = decode_cursor(request.GET['after'], len(RECORD_ORDERING))
+        if after is not None:
+            records = seek(records, RECORD_ORDERING, after)
+        if after is None or records is None:
+            return JsonResponse({'error': 'Invalid cursor'}, status=400)
+
+    # The ordering columns are always read, to build the next cursor
+    columns = list(dict.fromkeys([API_FIELDS[field] for field in fields] + RECORD_ORDERING))
+    rows = records.order_by(*RECORD_ORDERING).values_list(*columns)
+    if limit is not None:
+        # One extra row tells whether a next page exists
+        rows = rows[:limit + 1]
+    return StreamingHttpResponse(
+        _stream_records(rows.iterator(chunk_size=API_CHUNK_SIZE), columns, fields, limit, fmt),
+        content_type=API_FORMATS[fmt],
+    )
+
+@staff_member_required
+def request_stats(request):
+    """p50/p95/p99 request metrics per URL name; POST clears them"""
+    if request.method == 'POST':
+        request_stats_registry.reset()
+    return JsonResponse({
+        'sample_rate': instrumentation_settings()['SAMPLE_RATE'],
+        'urls': request_stats_registry.summary(),
+    })
@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'studentrecords.settings')
+# Serve the read views with their async versions (records.async_views)
+os.environ.setdefault('RECORDS_ASYNC_VIEWS', '1')
 
 application = get_asgi_application()
@@ -43,6 +43,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'records.middleware.RequestStatsMiddleware',
+    'records.middleware.ReplicaStickinessMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -83,9 +85,56 @@ DATABASES = {
         'USER': 'postgres',
         'PASSWORD': '1234',
         'HOST': 'localhost',
+        # Seconds to keep a connection open between requests; 0 closes it
+        # after each one (see RECORDS_ASYNC_PARALLEL_QUERIES below)
+        'CONN_MAX_AGE': int(os.getenv('RECORDS_CONN_MAX_AGE', '0')),
     }
 }
 
+# Read replicas for the read-only views (see records.routers). Each host in
+# RECORDS_REPLICA_HOSTS becomes an alias with the primary's other settings.
+# To try it locally, add an alias pointing at a copy of a SQLite database
+# and list it in RECORDS_REPLICAS.
+RECORDS_REPLICAS = []
+for number, host in enumerate(filter(None, os.getenv('RECORDS_REPLICA_HOSTS', '').split(',')), 1):
+    DATABASES[f'replica{number}'] = {**DATABASES['default'], 'HOST': host.strip(), 'TEST': {'MIRROR': 'default'}}
+    RECORDS_REPLICAS.append(f'replica{number}')
+
+DATABASE_ROUTERS = ['records.routers.ReplicaRouter']
+# Clients read from the primary for this long after a write of their own
+RECORDS_REPLICA_STICKY_SECONDS = 15
+# Seconds a replica health check is trusted, and the replication lag
+# (PostgreSQL only) past which a replica counts as unhealthy
+RECORDS_REPLICA_HEALTH_TTL = 5
+RECORDS_REPLICA_MAX_LAG = 30
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# The records views and analytics cache into the 'records' alias. Local
+# memory suits a single process; set RECORDS_CACHE_BACKEND=file to share
+# the cache between the worker processes of one host.
+
+RECORDS_CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'records': {
+        'BACKEND': RECORDS_CACHE_BACKENDS[os.getenv('RECORDS_CACHE_BACKEND', 'locmem')],
+        'LOCATION': os.getenv('RECORDS_CACHE_LOCATION', os.path.join(BASE_DIR, '.cache', 'records')),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+
+RECORDS_CACHE_ALIAS = 'records'
+# Entries are invalidated by data version, this only bounds their lifetime
+RECORDS_CACHE_TIMEOUT = 60 * 60
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -134,4 +183,35 @@ INTERNAL_IPS = [
     # ...
     "127.0.0.1",
     # ...
-]
\ No newline at end of file
+]
+# Rows per page on the student profile and academic result lists
+RECORDS_PAGE_SIZE = 50
+
+# Highest form number; promotion suggestions stop after it (6A -> none)
+RECORDS_FINAL_FORM = 6
+
+# Serve the read views from records.async_views; studentrecords/asgi.py
+# turns this on, so WSGI and ASGI deployments share one settings module
+RECORDS_ASYNC_VIEWS = os.getenv('RECORDS_ASYNC_VIEWS', '') == '1'
+# Let async views run independent queries on separate threads and
+# connections. Off by default: with CONN_MAX_AGE = 0 every parallel query
+# opens and closes its own connection. To turn it on, also set
+# RECORDS_CONN_MAX_AGE (e.g. 60) so the worker threads keep theirs; each
+# ASGI process then holds up to one connection per thread of its default
+# executor, min(32, CPUs + 4), plus its request thread, which has to fit
+# within the server's max_connections across all processes.
+RECORDS_ASYNC_PARALLEL_QUERIES = os.getenv('RECORDS_ASYNC_PARALLEL_QUERIES', '') == '1'
+
+# Request instrumentation (records.middleware.RequestStatsMiddleware), read
+# back at /stats/requests/. A 1% sample keeps the overhead negligible; set
+# RECORDS_STATS_SAMPLE_RATE=1 to measure every request while profiling.
+# The Server-Timing header shows clients the DB time and query count, so
+# it is only sent with RECORDS_STATS_SERVER_TIMING=1.
+RECORDS_INSTRUMENTATION = {
+    'SAMPLE_RATE': float(os.getenv('RECORDS_STATS_SAMPLE_RATE', '0.01')),
+    'WINDOW': 1000,
+    'DUPLICATE_THRESHOLD': 5,
+    'TRACE_MEMORY': os.getenv('RECORDS_STATS_TRACE_MEMORY', '') == '1',
+    'SLOW_REQUEST_MS': 1000,
+    'SERVER_TIMING': os.getenv('RECORDS_STATS_SERVER_TIMING', '') == '1',
+}